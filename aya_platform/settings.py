@@ -26,9 +26,14 @@ INSTALLED_APPS = [
     # Наши приложения
     'users.apps.UsersConfig',
     'events.apps.EventsConfig',
+    'core.apps.CoreConfig',
 ]
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',  # первыми: время ответа включает остальные middleware
+    'core.timing.TimingMiddleware',
+    'core.profiler.SlowRequestProfilerMiddleware',  # отключен, пока SLOW_REQUEST_PROFILER = False
+    'core.slow_queries.SlowQueryLogMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -38,11 +43,24 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Подсчет запросов к БД и поиск N+1 (core/querycount.py) — только при разработке.
+# Предупреждение пишется, если один и тот же запрос повторился столько раз
+# или всего запросов больше QUERY_COUNT_WARN
+QUERY_COUNT_REPEAT_THRESHOLD = 3
+QUERY_COUNT_WARN = 50
+if DEBUG:
+    MIDDLEWARE.insert(0, 'core.querycount.QueryCountMiddleware')
+
+# Server-Timing и лог core.timing (core/timing.py): доля замеряемых запросов.
+# Вне выборки накладные расходы — одна проверка, поэтому можно держать на сервере
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get('AYA_SERVER_TIMING_SAMPLE_RATE', 1.0 if DEBUG else 0.1))
+
 ROOT_URLCONF = 'aya_platform.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендера для Server-Timing (core/timing.py)
+        'BACKEND': 'core.timing.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'], # Указываем папку с шаблонами
         'APP_DIRS': True,
         'OPTIONS': {
@@ -52,6 +70,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'users.context_processors.notifications_processor', # Наш процессор уведомлений
+                'users.context_processors.site_contacts_processor', # Контакты в футере
             ],
         },
     },
@@ -67,6 +86,37 @@ DATABASES = {
     }
 }
 
+# Профиль SQLite для сервера: AYA_DB_PROFILE=production.
+# - WAL: читатели не ждут писателя, писатель не ждет читателей.
+# - synchronous=NORMAL: в WAL это безопасно при сбое процесса;
+#   при сбое питания можно потерять последние транзакции, но не повредить базу.
+# - mmap и кэш страниц: чтение без лишних системных вызовов.
+# - timeout: сколько ждать занятую базу вместо ошибки "database is locked".
+# - IMMEDIATE: транзакция сразу берет блокировку записи. Иначе две транзакции
+#   "прочитал, потом записал" упираются друг в друга, и SQLite отвечает
+#   ошибкой, не дожидаясь timeout.
+# - CONN_MAX_AGE: соединение (и прагмы) живет между запросами.
+# WAL не работает на сетевых файловых системах — там оставляйте профиль по умолчанию.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -20000,  # в КиБ (минус — размер, а не число страниц)
+    'temp_store': 'MEMORY',
+}
+DATABASE_PROFILE = os.environ.get('AYA_DB_PROFILE', 'default')
+if DATABASE_PROFILE == 'production':
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Выполняется при открытии каждого соединения
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    })
+
 # Локализация
 LANGUAGE_CODE = 'ru-ru'
 TIME_ZONE = 'Asia/Dushanbe'
@@ -93,8 +143,125 @@ MEDIA_URL = '/media/'
 # Папка на диске для медиа-файлов
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Уменьшенные копии картинок (core/images.py): ширины для srcset,
+# размер квадратной миниатюры и качество сжатия
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+IMAGE_THUMBNAIL_SIZE = 400
+IMAGE_VARIANT_QUALITY = 82
+
+# Массовая загрузка фото в отчет (events/gallery.py): файлы сначала пишутся
+# во временную папку, затем в фоне уменьшаются пулом процессов
+# (PHOTO_UPLOAD_WORKERS = 0 — обрабатывать в том же процессе)
+PHOTO_UPLOAD_SPOOL_DIR = os.path.join(BASE_DIR, 'upload_spool')
+PHOTO_UPLOAD_MAX_SIZE = 2048
+PHOTO_UPLOAD_WORKERS = 2
+PHOTO_UPLOAD_BATCH_SIZE = 20
+
+# Django по умолчанию принимает не больше 100 файлов за запрос
+DATA_UPLOAD_MAX_NUMBER_FILES = 500
+
 # --- КОНЕЦ НАСТРОЕК ФАЙЛОВ ---
 
+# Кэш. Версии кэшированных страниц и карточек меняют сигналы в том процессе,
+# где прошло изменение, поэтому кэш должен быть общим для всех воркеров:
+# по умолчанию — файлы в CACHE_DIR, на сервере можно redis
+# (AYA_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache,
+# AYA_CACHE_LOCATION=redis://127.0.0.1:6379). Кэш в памяти процесса
+# (locmem) без DEBUG не пропускает проверка core/checks.py.
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
+CACHE_BACKEND = os.environ.get('AYA_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get('AYA_CACHE_LOCATION', CACHE_DIR),
+    }
+}
+if CACHE_BACKEND.endswith('.FileBasedCache'):
+    # При переполнении удаляется треть файлов — держим запас (по умолчанию 300)
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 20000}
+
+# Карточки списка мероприятий (events/fragments.py), секунд.
+# Устаревать по времени им не нужно — при изменениях меняется версия ключа
+EVENT_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Страницы для гостей (core/page_cache.py), секунд. Сбрасываются сигналами,
+# срок — только страховка
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Курсорная пагинация списков (волонтеры, управление пользователями).
+# Размер страницы можно переопределить параметром ?page_size=, но не выше максимума.
+PAGINATION_PAGE_SIZE = 24
+PAGINATION_MAX_PAGE_SIZE = 100
+
+# Фоновые задачи (core/tasks.py): 'thread' — пул потоков в процессе,
+# 'queue' — очередь в БД (нужен воркер `python manage.py run_tasks`), 'sync' — сразу
+BACKGROUND_TASKS_MODE = os.environ.get('AYA_BACKGROUND_TASKS_MODE', 'thread')
+BACKGROUND_TASKS_WORKERS = 2
+BACKGROUND_TASKS_MAX_ATTEMPTS = 3
+# Задача в статусе «Выполняется» дольше этого срока считается брошенной
+# (воркер упал) и возвращается в очередь. Должен быть больше самой долгой задачи.
+BACKGROUND_TASKS_LEASE_SECONDS = 15 * 60
+
+# Тесты: задачи выполняются сразу, файлы пишутся во временный каталог (core/test_runner.py)
+TEST_RUNNER = 'core.test_runner.AyaTestRunner'
+
+# Адрес сайта для ссылок вне запроса (QR-коды профилей и т.п.)
+SITE_BASE_URL = os.environ.get('AYA_SITE_BASE_URL', 'http://127.0.0.1:8000')
+
+# Рассылка уведомлений: сколько строк вставлять одним bulk_create
+NOTIFICATIONS_BATCH_SIZE = 500
+
+# Журнал действий (users/audit.py): записи копятся в памяти процесса и пишутся
+# пачкой — по достижении размера или возраста самой старой записи (в секундах)
+AUDIT_LOG_BUFFER_SIZE = 50
+AUDIT_LOG_FLUSH_INTERVAL = 2
+AUDIT_LOG_MAX_BUFFER = 5000
+
+# Архив журнала (users/audit_archive.py): записи старше N дней переносятся
+# в помесячные сжатые файлы (`python manage.py archive_audit_log`)
+AUDIT_LOG_ARCHIVE_DIR = os.path.join(BASE_DIR, 'audit_archive')
+AUDIT_LOG_ARCHIVE_AFTER_DAYS = 180
+
+# Метрики для Prometheus (core/metrics.py): счетчики каждого процесса лежат
+# в своем файле в этом каталоге, /metrics их складывает. Каталог — общий
+# для всех воркеров сайта. Если задан токен, /metrics требует заголовок
+# Authorization: Bearer <токен>; без токена /metrics работает только при DEBUG
+METRICS_DIR = os.environ.get('AYA_METRICS_DIR', os.path.join(BASE_DIR, 'metrics'))
+METRICS_TOKEN = os.environ.get('AYA_METRICS_TOKEN', '')
+
+# Профилировщик медленных запросов (core/profiler.py): стек запроса снимается
+# раз в INTERVAL мс, и если запрос дольше порога, снимки пишутся в каталог
+# (хранятся последние KEEP файлов). Сводка: python manage.py profile_report
+SLOW_REQUEST_PROFILER = os.environ.get('AYA_SLOW_REQUEST_PROFILER', '') == '1'
+SLOW_REQUEST_THRESHOLD_MS = int(os.environ.get('AYA_SLOW_REQUEST_THRESHOLD_MS', 500))
+SLOW_REQUEST_SAMPLE_INTERVAL_MS = 5
+SLOW_REQUEST_PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+SLOW_REQUEST_PROFILE_KEEP = 500
+
+# Журнал медленных SQL-запросов (core/slow_queries.py): запросы дольше порога
+# с планом выполнения, последние LOG_SIZE штук (в кэше).
+# Страница: Панель администратора -> Медленные запросы
+SLOW_QUERY_THRESHOLD_MS = int(os.environ.get('AYA_SLOW_QUERY_THRESHOLD_MS', 100))
+SLOW_QUERY_LOG_SIZE = 200
+
+# Логи приложений — в stderr (его собирает сервер приложений). INFO нужен
+# для строк core.timing и core.querycount; AYA_LOG_LEVEL=WARNING их скроет
+LOG_LEVEL = os.environ.get('AYA_LOG_LEVEL', 'INFO')
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '{asctime} {levelname} {name}: {message}', 'style': '{'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        app: {'handlers': ['console'], 'level': LOG_LEVEL, 'propagate': False}
+        for app in ('core', 'users', 'events')
+    },
+}
+
 # Настройки входа/выхода
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
@@ -4,9 +4,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 import os # <-- ИСПРАВЛЕНИЕ: ДОБАВЛЕНА ЭТА СТРОКА
+from core.views import metrics_view
 
 urlpatterns = [
     path('superadmin/', admin.site.urls), 
+    path('metrics', metrics_view, name='metrics'),
     path('events/', include('events.urls')),
     path('', include('users.urls')),
 ]
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Регистрируем обработчики сигналов (варианты картинок и т.д.) и проверки настроек
+        from . import checks, signals  # noqa: F401
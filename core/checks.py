@@ -0,0 +1,24 @@
+# core/checks.py
+"""
+Проверки настроек (manage.py check, migrate, runserver).
+
+Кэш страниц, карточек и фасетов сбрасывается сменой версии в кэше. Если
+кэш у каждого процесса свой (locmem), версию меняет только тот воркер,
+который обработал изменение, а остальные продолжают отдавать старое.
+"""
+from django.conf import settings
+from django.core import checks
+
+PROCESS_LOCAL_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if settings.DEBUG or backend != PROCESS_LOCAL_CACHE:
+        return []
+    return [checks.Error(
+        f"Кэш по умолчанию ({backend}) не общий для процессов: версии кэша разойдутся между воркерами.",
+        hint="Укажите общий кэш: AYA_CACHE_BACKEND (файлы или redis), см. CACHES в settings.py.",
+        id='core.E001',
+    )]
@@ -0,0 +1,168 @@
+# core/images.py
+"""
+Уменьшенные копии загруженных картинок (фото профилей, обложки, галереи).
+
+Для каждого оригинала, например event_gallery/IMG_1.jpg, рядом создаются:
+    variants/event_gallery/IMG_1/320.webp, 320.jpg, 640.webp, ... 1280.jpg
+    variants/event_gallery/IMG_1/thumb.webp, thumb.jpg  — квадратная миниатюра
+Имена вычисляются из имени оригинала, поэтому в БД ничего хранить не нужно:
+шаблонный тег {% responsive_image %} сам собирает srcset.
+thumb.jpg пишется последним и служит признаком "все варианты готовы".
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.dispatch import Signal
+
+from .tasks import enqueue, task
+
+FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+
+# Варианты файла name готовы: кэши страниц с этой картинкой пора сбросить
+variants_generated = Signal()
+
+
+def variant_dir(name):
+    stem, _ext = os.path.splitext(name)
+    return f'variants/{stem}'
+
+
+def variant_name(name, label, ext):
+    return f'{variant_dir(name)}/{label}.{ext}'
+
+
+def has_variants(name, storage=None):
+    return bool(name) and (storage or default_storage).exists(variant_name(name, 'thumb', 'jpg'))
+
+
+def _encode(image, pil_format):
+    buffer = BytesIO()
+    options = {'quality': settings.IMAGE_VARIANT_QUALITY}
+    if pil_format == 'JPEG':
+        options.update(optimize=True, progressive=True)
+    image.save(buffer, format=pil_format, **options)
+    return buffer.getvalue()
+
+
+def _store(storage, path, data):
+    # Имена вариантов фиксированы: старый файл удаляем, иначе хранилище добавит суффикс
+    if storage.exists(path):
+        storage.delete(path)
+    storage.save(path, ContentFile(data))
+
+
+def render_variants(image):
+    """
+    По открытому PIL-изображению возвращает список (label, ext, bytes).
+    Метаданные (EXIF с геопозицией и т.п.) в варианты не попадают.
+    """
+    from PIL import ImageOps
+
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    rendered = []
+    for width in settings.IMAGE_VARIANT_WIDTHS:
+        resized = image.copy()
+        # thumbnail() не увеличивает маленькие картинки
+        resized.thumbnail((width, width * 4))
+        for ext, pil_format in FORMATS:
+            rendered.append((str(width), ext, _encode(resized, pil_format)))
+
+    size = settings.IMAGE_THUMBNAIL_SIZE
+    thumb = ImageOps.fit(image, (size, size))
+    for ext, pil_format in FORMATS:
+        rendered.append(('thumb', ext, _encode(thumb, pil_format)))
+    return rendered
+
+
+def prepare_upload(path, max_size):
+    """
+    Готовит загруженное фото к публикации: поворачивает по EXIF, уменьшает
+    до max_size по большей стороне, убирает метаданные и сразу рисует варианты.
+    Возвращает (jpeg_bytes, [(label, ext, bytes), ...]).
+    Не обращается к БД — предназначена для пула процессов.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original)
+        image.load()
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.thumbnail((max_size, max_size))
+    return _encode(image, 'JPEG'), render_variants(image)
+
+
+def try_prepare_upload(path, max_size):
+    """prepare_upload для пула процессов: ошибку возвращает, а не выбрасывает."""
+    try:
+        return path, prepare_upload(path, max_size), None
+    except Exception as exc:
+        return path, None, repr(exc)
+
+
+def store_variants(name, rendered, storage=None):
+    """Записывает готовые варианты для файла name; признак готовности — последним."""
+    storage = storage or default_storage
+    rendered = sorted(rendered, key=lambda item: (item[0], item[1]) == ('thumb', 'jpg'))
+    for label, ext, data in rendered:
+        _store(storage, variant_name(name, label, ext), data)
+    return len(rendered)
+
+
+def generate_variants(name, storage=None):
+    """Создает все варианты для файла name в хранилище. Возвращает их количество."""
+    from PIL import Image
+
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        image.load()
+    return store_variants(name, render_variants(image), storage)
+
+
+def delete_variants(name, storage=None):
+    storage = storage or default_storage
+    directory = variant_dir(name)
+    try:
+        _dirs, files = storage.listdir(directory)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for file_name in files:
+        storage.delete(f'{directory}/{file_name}')
+
+
+@task
+def generate_image_variants(name):
+    if name and default_storage.exists(name):
+        generate_variants(name)
+        variants_generated.send(sender=generate_image_variants, name=name)
+
+
+# --- ОБРАБОТЧИКИ СИГНАЛОВ ---
+# Модель -> поле с картинкой, для которого нужны варианты
+IMAGE_FIELDS = {
+    'users.User': 'photo',
+    'events.Event': 'cover_image',
+    'events.EventPhoto': 'image',
+}
+
+
+def image_saved(sender, instance, update_fields=None, **kwargs):
+    field = IMAGE_FIELDS[sender._meta.label]
+    if update_fields is not None and field not in update_fields:
+        return
+    name = getattr(instance, field).name
+    if name and not has_variants(name):
+        enqueue(generate_image_variants, name)
+
+
+def image_deleted(sender, instance, **kwargs):
+    name = getattr(instance, IMAGE_FIELDS[sender._meta.label]).name
+    if name:
+        delete_variants(name)
@@ -0,0 +1,129 @@
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from events.models import Event
+from users.models import AuditLog, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный бенчмарк SQLite: читатели (список мероприятий) и писатели "
+        "(журнал, счетчики) работают одновременно — сначала с настройками по "
+        "умолчанию, затем с профилем production (WAL, прагмы, IMMEDIATE). "
+        "Каждый прогон — на новой временной файловой базе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8, help="Потоков чтения")
+        parser.add_argument('--writers', type=int, default=4, help="Потоков записи")
+        parser.add_argument('--seconds', type=float, default=5, help="Длительность прогона")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Бенчмарк рассчитан на SQLite.")
+        db_settings = connection.settings_dict
+        original_options = db_settings.get('OPTIONS', {})
+        production_options = {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in settings.SQLITE_PRAGMAS.items()),
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+        }
+        try:
+            for profile, db_options in (('default', {}), ('production', production_options)):
+                with tempfile.TemporaryDirectory() as directory:
+                    connection.close()
+                    # Тот же словарь настроек используют соединения всех потоков
+                    db_settings['OPTIONS'] = db_options
+                    db_settings.setdefault('TEST', {})['NAME'] = os.path.join(directory, f'bench_{profile}.sqlite3')
+                    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+                    try:
+                        self.run(profile, options)
+                    finally:
+                        connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            db_settings['OPTIONS'] = original_options
+
+    def run(self, profile, options):
+        now = timezone.now()
+        User.objects.bulk_create(User(username=f'bench-{i}') for i in range(200))
+        organizer = User.objects.first()
+        Event.objects.bulk_create(
+            Event(title=f"Акция {i}", description='...', organizer=organizer, is_approved=True,
+                  start_time=now, end_time=now)
+            for i in range(100)
+        )
+        event_ids = list(Event.objects.values_list('pk', flat=True))
+        users = list(User.objects.values_list('pk', flat=True))
+
+        stop = threading.Event()
+        results = {'read': [], 'write': [], 'errors': 0}
+        lock = threading.Lock()
+
+        def reader():
+            timings = []
+            try:
+                while not stop.is_set():
+                    started = time.perf_counter()
+                    try:
+                        list(Event.objects.filter(is_approved=True, is_completed=False).order_by('start_time')[:20])
+                        User.objects.filter(is_approved=False).count()
+                    except OperationalError:
+                        with lock:
+                            results['errors'] += 1
+                        continue
+                    timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                connections.close_all()
+            with lock:
+                results['read'] += timings
+
+        def writer(number):
+            timings, i = [], 0
+            try:
+                while not stop.is_set():
+                    i += 1
+                    event_id = event_ids[(number * 7 + i) % len(event_ids)]
+                    started = time.perf_counter()
+                    try:
+                        # Типичная транзакция: сначала прочитать, потом записать
+                        with transaction.atomic():
+                            event = Event.objects.only('title').get(pk=event_id)
+                            Event.objects.filter(pk=event_id).update(participants_count=F('participants_count') + 1)
+                            AuditLog.objects.create(actor_id=users[i % len(users)], action=f"Записался: {event.title}")
+                    except OperationalError:
+                        with lock:
+                            results['errors'] += 1
+                        continue
+                    timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                connections.close_all()
+            with lock:
+                results['write'] += timings
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(n,)) for n in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['seconds'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        seconds = options['seconds']
+        parts = []
+        for kind in ('read', 'write'):
+            timings = sorted(results[kind]) or [0]
+            parts.append(
+                f"{kind}: {len(results[kind]) / seconds:.0f}/с, p50 {statistics.median(timings):.2f} мс, "
+                f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} мс"
+            )
+        self.stdout.write(f"{profile:>10}: " + "; ".join(parts) + f"; ошибок 'locked': {results['errors']}")
@@ -0,0 +1,165 @@
+import json
+import statistics
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from events import urls as events_urls
+from events.models import Event, EventPhoto, PhotoUploadBatch
+from users import urls as users_urls
+from users.models import Direction, Notification, School, User
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу: share=0.95 — значение, не меньше 95% замеров."""
+    ordered = sorted(values)
+    return ordered[max(0, round(share * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Прогоняет GET каждого URL из users/urls.py и events/urls.py через "
+        "тестовый клиент на текущей базе (удобно после seed_data) и выводит JSON: "
+        "p50/p95/p99 времени ответа, запросы к БД и пик памяти на URL. "
+        "Ключи отсортированы, поэтому два прогона можно сравнить обычным diff."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help="От чьего имени ходить (по умолчанию — одобренный президент)")
+        parser.add_argument('--iterations', type=int, default=20, help="Замеров на URL (после одного прогревочного)")
+        parser.add_argument('--cold', action='store_true', help="Очищать кэш перед каждым запросом")
+        parser.add_argument('--only', nargs='*', help="Только эти имена URL")
+        parser.add_argument('--output', help="Файл для JSON (по умолчанию — stdout)")
+
+    def get_user(self, username):
+        users = User.objects.filter(is_active=True)
+        user = (
+            users.filter(username=username).first() if username
+            else users.filter(role='president', is_approved=True).first() or users.filter(is_superuser=True).first()
+        )
+        if user is None:
+            raise CommandError("Нет пользователя для прогона: укажите --username или заполните базу (seed_data).")
+        return user
+
+    def get_objects(self, user):
+        """Объекты для URL с параметрами: берем самые «тяжелые» страницы — с отчетом, фото и героями."""
+        event = (
+            Event.objects.filter(is_report_published=True, photos__isnull=False, heroes__isnull=False).first()
+            or Event.objects.first()
+        )
+        return {
+            'event': event,
+            'photo': EventPhoto.objects.filter(event=event).first(),
+            'batch': PhotoUploadBatch.objects.filter(event=event).first(),
+            'notification': Notification.objects.filter(recipient=user).first(),
+            'direction': Direction.objects.first(),
+            'school': School.objects.first(),
+            'volunteer': User.objects.filter(is_approved=True).exclude(pk=user.pk).first(),
+        }
+
+    def url_kwargs(self, pattern, objects):
+        """Параметры URL или None, если подходящего объекта в базе нет."""
+        name = pattern.name
+        if name == 'event_photo_batch_status':
+            needed = {'pk': objects['event'], 'batch_id': objects['batch']}
+        elif 'pk' not in pattern.pattern.converters:
+            return {}
+        elif name == 'event_photo_delete':
+            needed = {'pk': objects['photo']}
+        elif name == 'mark_notification_as_read':
+            needed = {'pk': objects['notification']}
+        elif name.startswith('event_'):
+            needed = {'pk': objects['event']}
+        elif 'direction' in name:
+            needed = {'pk': objects['direction']}
+        elif 'school' in name:
+            needed = {'pk': objects['school']}
+        else:
+            needed = {'pk': objects['volunteer']}
+        if any(obj is None for obj in needed.values()):
+            return None
+        return {key: obj.pk for key, obj in needed.items()}
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['username'])
+        objects = self.get_objects(user)
+        patterns = [
+            pattern for urlconf in (users_urls, events_urls) for pattern in urlconf.urlpatterns
+            if isinstance(pattern, URLPattern) and (not options['only'] or pattern.name in options['only'])
+        ]
+        results, skipped = {}, []
+        # Тестовый клиент ходит на хост testserver
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            client = Client(raise_request_exception=False)
+            for pattern in patterns:
+                kwargs = self.url_kwargs(pattern, objects)
+                if kwargs is None:
+                    skipped.append(pattern.name)
+                    continue
+                results[pattern.name] = self.measure(client, user, reverse(pattern.name, kwargs=kwargs), options)
+                self.stderr.write(f"{pattern.name}: p95 {results[pattern.name]['p95_ms']} мс")
+
+        report = json.dumps({
+            'meta': {
+                'user': user.username, 'iterations': options['iterations'], 'cold_cache': options['cold'],
+                'users': User.objects.count(), 'events': Event.objects.count(),
+                'notifications': Notification.objects.count(),
+            },
+            'skipped': skipped,
+            'urls': results,
+        }, ensure_ascii=False, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                output.write(report + '\n')
+        else:
+            self.stdout.write(report)
+
+    def request(self, client, user, url, cold, trace_memory=False):
+        """(код ответа, мс, запросов к БД, пик памяти в байтах или None)."""
+        # Вход — вне замера; заодно возвращает сессию после logout
+        client.force_login(user)
+        if cold:
+            cache.clear()
+        peak = None
+        if trace_memory:
+            tracemalloc.start()
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                elapsed = (time.perf_counter() - started) * 1000
+            if trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            if trace_memory:
+                tracemalloc.stop()
+        return response.status_code, elapsed, len(queries), peak
+
+    def measure(self, client, user, url, options):
+        self.request(client, user, url, options['cold'])  # прогрев: шаблоны, кэш
+        statuses, timings, query_counts = set(), [], []
+        for _ in range(options['iterations']):
+            status, elapsed, queries, _peak = self.request(client, user, url, options['cold'])
+            statuses.add(status)
+            timings.append(elapsed)
+            query_counts.append(queries)
+        # Память — отдельным запросом: tracemalloc заметно замедляет код
+        peak = self.request(client, user, url, options['cold'], trace_memory=True)[3]
+
+        return {
+            'url': url,
+            'status': sorted(statuses),
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'queries': round(statistics.median(query_counts)),
+            'queries_max': max(query_counts),
+            'peak_memory_kb': round(peak / 1024),
+        }
@@ -0,0 +1,51 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from core.images import IMAGE_FIELDS, generate_variants, has_variants
+
+
+def _init_worker():
+    django.setup()
+
+
+def _generate(name):
+    try:
+        return name, generate_variants(name), None
+    except Exception as exc:
+        return name, 0, repr(exc)
+
+
+class Command(BaseCommand):
+    help = "Создает уменьшенные копии (миниатюры, WebP/JPEG) для уже загруженных картинок."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--force', action='store_true', help="Пересоздать и те, у которых варианты уже есть")
+
+    def collect_names(self):
+        names = set()
+        for label, field in IMAGE_FIELDS.items():
+            model = apps.get_model(label)
+            names.update(
+                model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+                .values_list(field, flat=True).iterator()
+            )
+        return sorted(names)
+
+    def handle(self, *args, **options):
+        names = self.collect_names()
+        if not options['force']:
+            names = [name for name in names if not has_variants(name)]
+        done = failed = 0
+        with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+            for name, count, error in pool.map(_generate, names, chunksize=4):
+                if error:
+                    failed += 1
+                    self.stderr.write(f"{name}: {error}")
+                else:
+                    done += 1
+        self.stdout.write(self.style.SUCCESS(f"Готово: {done} картинок, ошибок: {failed}."))
@@ -0,0 +1,93 @@
+import json
+import os
+import statistics
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiler import load_profiles
+
+
+# Middleware замеров есть в каждом стеке — в сводке они только мешают
+INSTRUMENTATION = ('core/profiler.py:', 'core/metrics.py:', 'core/timing.py:', 'core/querycount.py:')
+
+
+def _function(frame):
+    # 'файл:функция:строка' -> 'файл:функция' (строки одной функции — вместе)
+    return frame.rsplit(':', 1)[0]
+
+
+class Command(BaseCommand):
+    help = (
+        "Сводка профилей медленных запросов (core/profiler.py): для каждого имени URL — "
+        "число запросов, время и самые горячие функции по доле снимков стека. "
+        "self — функция была на вершине стека, total — где-либо в стеке; сортировка по self."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help="Каталог профилей (по умолчанию SLOW_REQUEST_PROFILE_DIR)")
+        parser.add_argument('--url', action='append', help="Только это имя URL (можно несколько раз)")
+        parser.add_argument('--top', type=int, default=15, help="Функций на URL")
+        parser.add_argument('--all-frames', action='store_true', help="Не скрывать функции Django и Python")
+        parser.add_argument('--json', action='store_true', help="Вывести JSON вместо таблицы")
+
+    def is_project_frame(self, frame):
+        # Пути кода проекта в профиле — относительные (см. _short_path)
+        return not (os.path.isabs(frame) or frame.startswith(('site-packages', '<', *INSTRUMENTATION)))
+
+    def handle(self, *args, **options):
+        directory = options['dir'] or settings.SLOW_REQUEST_PROFILE_DIR
+        if not os.path.isdir(directory):
+            raise CommandError(f"Нет каталога профилей {directory}. Включите SLOW_REQUEST_PROFILER.")
+
+        by_url = defaultdict(lambda: {'durations': [], 'samples': 0, 'self': Counter(), 'total': Counter()})
+        for profile in load_profiles(directory):
+            if options['url'] and profile['url_name'] not in options['url']:
+                continue
+            report = by_url[profile['url_name']]
+            report['durations'].append(profile['duration_ms'])
+            for stack, count in profile['stacks']:
+                if not options['all_frames']:
+                    stack = [frame for frame in stack if self.is_project_frame(frame)] or stack[-1:]
+                functions = [_function(frame) for frame in stack]
+                report['samples'] += count
+                report['self'][functions[-1]] += count
+                # Рекурсия не должна считать функцию дважды в одном снимке
+                for function in set(functions):
+                    report['total'][function] += count
+
+        result = {}
+        # Сначала URL, на которые ушло больше всего времени
+        for url_name, report in sorted(by_url.items(), key=lambda item: -sum(item[1]['durations'])):
+            samples = report['samples'] or 1
+            # Горячие — где время тратится само (self), при равенстве — по total
+            hottest = sorted(report['total'], key=lambda name: (report['self'][name], report['total'][name]), reverse=True)
+            result[url_name] = {
+                'requests': len(report['durations']),
+                'p50_ms': round(statistics.median(report['durations']), 1),
+                'max_ms': max(report['durations']),
+                'samples': report['samples'],
+                'functions': [
+                    {
+                        'function': function,
+                        'self_pct': round(100 * report['self'][function] / samples, 1),
+                        'total_pct': round(100 * report['total'][function] / samples, 1),
+                    }
+                    for function in hottest[:options['top']]
+                ],
+            }
+
+        if options['json']:
+            self.stdout.write(json.dumps(result, ensure_ascii=False, indent=2))
+            return
+        if not result:
+            self.stdout.write("Профилей нет.")
+        for url_name, report in result.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{url_name}: {report['requests']} запросов, p50 {report['p50_ms']} мс, "
+                f"max {report['max_ms']} мс, снимков {report['samples']}"
+            ))
+            self.stdout.write(f"  {'total %':>8} {'self %':>8}  функция")
+            for row in report['functions']:
+                self.stdout.write(f"  {row['total_pct']:>8} {row['self_pct']:>8}  {row['function']}")
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.tasks import claim_next_job, run_job
+
+
+class Command(BaseCommand):
+    help = "Воркер очереди фоновых задач (BACKGROUND_TASKS_MODE = 'queue')."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Выполнить все ожидающие задачи и выйти")
+        parser.add_argument('--sleep', type=float, default=2.0, help="Пауза, когда очередь пуста (сек)")
+
+    def handle(self, *args, **options):
+        done = failed = 0
+        while True:
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+            if run_job(job):
+                done += 1
+            else:
+                failed += 1
+        self.stdout.write(self.style.SUCCESS(f"Выполнено задач: {done}, с ошибкой: {failed}."))
@@ -0,0 +1,212 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from events.models import Event, EventHero, EventPhoto
+from events.reservations import refresh_participant_counts
+from users.audit import ACTIONS
+from users.management.commands.bench_search import FIRST_NAMES, ROOTS, SUFFIXES
+from users.models import AuditLog, Direction, Notification, School, User
+
+USERNAME_PREFIX = 'seed-'
+PASSWORD = 'seed-password'
+
+FACULTIES = ['Лечебный', 'Педиатрический', 'Стоматологический', 'Фармацевтический', 'Медико-профилактический']
+CITIES = ['Душанбе', 'Худжанд', 'Бохтар', 'Куляб', 'Истаравшан', 'Турсунзаде', 'Вахдат', 'Хорог']
+ROLES = ['volunteer'] * 96 + ['leader'] * 3 + ['moderator']
+LOCATIONS = ['ТГМУ', 'Главный корпус', 'Парк Рудаки', 'Городская больница №1', 'Школа №5']
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу синтетическими данными для нагрузочных замеров: "
+        "пользователи, направления, школы, мероприятия с участниками, фото и "
+        "героями, уведомления и журнал. При том же --seed данные одинаковые. "
+        "Все пользователи получают пароль 'seed-password'."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--directions', type=int, default=20)
+        parser.add_argument('--schools', type=int, default=50)
+        parser.add_argument('--events', type=int, default=20_000)
+        parser.add_argument('--participants', type=int, default=30, help="В среднем участников на мероприятие")
+        parser.add_argument('--photos', type=int, default=5, help="В среднем фото на завершенное мероприятие")
+        parser.add_argument('--heroes', type=int, default=3, help="В среднем героев на завершенное мероприятие")
+        parser.add_argument('--notifications', type=int, default=2_000_000)
+        parser.add_argument('--audit', type=int, default=1_000_000, help="Записей в журнале")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=USERNAME_PREFIX).exists():
+            raise CommandError("Синтетические данные уже есть в базе. Используйте чистую базу.")
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+        started = time.perf_counter()
+
+        self.step("Направления и школы", self.seed_catalogs, options)
+        self.step("Пользователи", self.seed_users, options)
+        self.step("Мероприятия", self.seed_events, options)
+        self.step("Участники, фото и герои", self.seed_event_details, options)
+        self.step("Уведомления", self.seed_notifications, options)
+        self.step("Журнал действий", self.seed_audit, options)
+        # bulk_create не вызывает сигналы: счетчики и индексы пересчитываем целиком
+        self.step("Счетчики и индексы", self.refresh_derived, options)
+        self.stdout.write(self.style.SUCCESS(f"Готово за {time.perf_counter() - started:.1f} с"))
+
+    def step(self, title, function, options):
+        started = time.perf_counter()
+        count = function(options)
+        self.stdout.write(f"{title}: {count} за {time.perf_counter() - started:.1f} с")
+
+    def bulk(self, model, rows):
+        """Вставляет строки пачками по batch_size, каждую пачку — одной транзакцией."""
+        total, batch = 0, []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                total += self._insert(model, batch)
+                batch = []
+        if batch:
+            total += self._insert(model, batch)
+        return total
+
+    def _insert(self, model, batch):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        return len(batch)
+
+    def seed_catalogs(self, options):
+        Direction.objects.bulk_create(Direction(name=f"Направление {i + 1}") for i in range(options['directions']))
+        School.objects.bulk_create(School(name=f"Школа {i + 1}") for i in range(options['schools']))
+        self.direction_ids = list(Direction.objects.values_list('pk', flat=True))
+        self.school_ids = list(School.objects.values_list('pk', flat=True))
+        return len(self.direction_ids) + len(self.school_ids)
+
+    def make_user(self, i, password):
+        rng = self.rng
+        gender = rng.choice('MF')
+        suffix = rng.choice(SUFFIXES)
+        if gender == 'F' and suffix in ('ов', 'ев'):
+            suffix += 'а'
+        # Первый — президент, чтобы главная и бенчмарк видели настоящую страницу
+        role = 'president' if i == 0 else rng.choice(ROLES)
+        return User(
+            username=f'{USERNAME_PREFIX}{i}', password=password,
+            first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(ROOTS) + suffix,
+            patronymic=rng.choice(ROOTS) + ('овна' if gender == 'F' else 'ович'),
+            gender=gender, role=role, is_approved=i == 0 or rng.random() < 0.95,
+            is_active_volunteer_title=rng.random() < 0.05,
+            faculty=rng.choice(FACULTIES), course=rng.randint(1, 6), city=rng.choice(CITIES),
+            date_joined=self.now - timedelta(days=rng.randint(0, 5 * 365)),
+        )
+
+    def seed_users(self, options):
+        # Хэш пароля дорогой (сотни миллисекунд), поэтому один на всех
+        password = make_password(PASSWORD)
+        count = self.bulk(User, (self.make_user(i, password) for i in range(options['users'])))
+        users = User.objects.filter(username__startswith=USERNAME_PREFIX)
+        self.user_ids = list(users.values_list('pk', flat=True))
+        self.leader_ids = list(users.filter(role='leader').values_list('pk', flat=True))
+
+        rng = self.rng
+        self.bulk(User.directions.through, (
+            User.directions.through(user_id=user_id, direction_id=direction_id)
+            for user_id in self.user_ids
+            for direction_id in rng.sample(self.direction_ids, min(len(self.direction_ids), rng.randint(0, 2)))
+        ))
+        leaders = self.leader_ids or self.user_ids
+        self.bulk(Direction.leaders.through, (
+            Direction.leaders.through(direction_id=direction_id, user_id=user_id)
+            for direction_id in self.direction_ids
+            for user_id in rng.sample(leaders, min(len(leaders), 2))
+        ))
+        self.bulk(User.school_leader_of.through, (
+            User.school_leader_of.through(user_id=user_id, school_id=school_id)
+            for school_id in self.school_ids
+            for user_id in rng.sample(self.user_ids, min(len(self.user_ids), 2))
+        ))
+        return count
+
+    def make_event(self, i):
+        rng = self.rng
+        # Примерно пятая часть — предстоящие, остальное — архив за пять лет
+        upcoming = rng.random() < 0.2
+        start = self.now + timedelta(days=rng.randint(1, 120) if upcoming else -rng.randint(1, 5 * 365), hours=rng.randint(8, 18))
+        completed = not upcoming
+        return Event(
+            title=f"Акция {i + 1}: {rng.choice(['Донорство', 'Субботник', 'Лекция', 'Марафон', 'Акция помощи'])}",
+            description="Синтетическое мероприятие для замеров. " * rng.randint(1, 20),
+            start_time=start, end_time=start + timedelta(hours=rng.randint(1, 6)),
+            location=rng.choice(LOCATIONS), organizer_id=rng.choice(self.user_ids),
+            is_approved=completed or rng.random() < 0.9, is_completed=completed,
+            max_participants=rng.choice([None, None, 20, 50, 100]),
+            report_text="Отчет о мероприятии." * rng.randint(0, 10) if completed else '',
+            is_report_published=completed and rng.random() < 0.8,
+        )
+
+    def seed_events(self, options):
+        count = self.bulk(Event, (self.make_event(i) for i in range(options['events'])))
+        self.events = list(Event.objects.values_list('pk', 'is_completed', 'max_participants'))
+        return count
+
+    def _sample_users(self, average, limit=None):
+        size = min(len(self.user_ids), self.rng.randint(0, average * 2), limit or len(self.user_ids))
+        return self.rng.sample(self.user_ids, size)
+
+    def seed_event_details(self, options):
+        through = Event.participants.through
+        count = self.bulk(through, (
+            through(event_id=event_id, user_id=user_id)
+            for event_id, _completed, limit in self.events
+            for user_id in self._sample_users(options['participants'], limit)
+        ))
+        completed = [event_id for event_id, is_completed, _limit in self.events if is_completed]
+        count += self.bulk(EventPhoto, (
+            EventPhoto(event_id=event_id, image=f'event_gallery/seed_{event_id}_{n}.jpg')
+            for event_id in completed
+            for n in range(self.rng.randint(0, options['photos'] * 2))
+        ))
+        count += self.bulk(EventHero, (
+            EventHero(event_id=event_id, user_id=user_id, role_name=self.rng.choice(['Организатор', 'Фотограф', 'Волонтер']))
+            for event_id in completed
+            for user_id in self._sample_users(options['heroes'])
+        ))
+        return count
+
+    def seed_notifications(self, options):
+        rng = self.rng
+        return self.bulk(Notification, (
+            Notification(
+                recipient_id=rng.choice(self.user_ids), message=f"Уведомление {i}",
+                link='/events/', is_read=rng.random() < 0.8,
+            )
+            for i in range(options['notifications'])
+        ))
+
+    def seed_audit(self, options):
+        rng = self.rng
+        codes = list(ACTIONS)
+        span = int(timedelta(days=2 * 365).total_seconds())
+        return self.bulk(AuditLog, (
+            AuditLog(
+                actor_id=rng.choice(self.user_ids), target_user_id=rng.choice(self.user_ids),
+                action=ACTIONS[code], action_code=code,
+                created_at=self.now - timedelta(seconds=rng.randint(0, span)),
+            )
+            for code in (rng.choice(codes) for _ in range(options['audit']))
+        ))
+
+    def refresh_derived(self, options):
+        count = refresh_participant_counts()
+        for command in ('rebuild_facets', 'rebuild_search_index', 'refresh_unread_counts'):
+            call_command(command, stdout=self.stdout)
+        return count
@@ -0,0 +1,341 @@
+# core/metrics.py
+"""
+Метрики сайта в текстовом формате Prometheus (/metrics).
+
+Счетчики и гистограммы копятся в файлах METRICS_DIR, по файлу на процесс
+(<pid>.metrics). Файл отображен в память (mmap), поэтому запись — это
+изменение числа в памяти, без системных вызовов и блокировок между
+процессами. /metrics читает файлы всех процессов и складывает значения,
+поэтому gunicorn с несколькими воркерами отдает общие цифры.
+
+Файлы завершившихся процессов /metrics переносит в общий dead.metrics
+(под блокировкой, чтобы два одновременных запроса не сложили их дважды):
+сумма не уменьшается при перезапуске воркера, а каталог не растет с
+каждым перезапуском. При деплое каталог можно очистить — Prometheus
+поймет сброс счетчиков.
+
+Значения, которые есть в БД (очередь модерации, непрочитанные
+уведомления), считаются при каждом запросе /metrics — по частичному
+индексу и по счетчикам пользователей, без перебора уведомлений.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import ctypes
+    import msvcrt
+
+# Имя: (тип, описание)
+METRICS = {
+    'aya_http_request_duration_seconds': ('histogram', "Время ответа по имени URL"),
+    'aya_db_queries_total': ('counter', "Запросы к БД по имени URL"),
+    'aya_cache_requests_total': ('counter', "Обращения к кэшам: result=hit|miss"),
+    'aya_event_reservations_total': ('counter', "Запись на мероприятия и в очередь: action, result"),
+}
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_INITIAL_SIZE = 64 * 1024
+_HEADER = struct.Struct('<Q')  # занято байт
+_KEY_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+
+
+# --- ФАЙЛ ПРОЦЕССА ---
+def _entry_size(key_length):
+    # Длина ключа + ключ, выровненные до 8 байт, затем double
+    return (_KEY_LENGTH.size + key_length + 7) // 8 * 8 + _VALUE.size
+
+
+def _read_entries(buffer):
+    """[(ключ, смещение значения), ...] из файла метрик."""
+    used = _HEADER.unpack_from(buffer, 0)[0]
+    position, entries = _HEADER.size, []
+    while position < used:
+        length = _KEY_LENGTH.unpack_from(buffer, position)[0]
+        key = bytes(buffer[position + _KEY_LENGTH.size:position + _KEY_LENGTH.size + length]).decode()
+        size = _entry_size(length)
+        entries.append((key, position + size - _VALUE.size))
+        position += size
+    return entries
+
+
+class MmapValues:
+    """Словарь ключ -> float в файле, отображенном в память. Пишет только свой процесс."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a+b')
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._file.truncate(_INITIAL_SIZE)
+            self._file.flush()
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        used = _HEADER.unpack_from(self._map, 0)[0]
+        if used == 0:
+            _HEADER.pack_into(self._map, 0, _HEADER.size)
+        self._positions = dict(_read_entries(self._map))
+
+    def _add_key(self, key):
+        encoded = key.encode()
+        used = _HEADER.unpack_from(self._map, 0)[0]
+        size = _entry_size(len(encoded))
+        if used + size > len(self._map):
+            new_size = max(len(self._map) * 2, used + size)
+            self._map.close()
+            self._file.truncate(new_size)
+            self._map = mmap.mmap(self._file.fileno(), 0)
+        _KEY_LENGTH.pack_into(self._map, used, len(encoded))
+        self._map[used + _KEY_LENGTH.size:used + _KEY_LENGTH.size + len(encoded)] = encoded
+        position = used + size - _VALUE.size
+        _VALUE.pack_into(self._map, position, 0.0)
+        # Заголовок — последним: читатель не увидит недописанную запись
+        _HEADER.pack_into(self._map, 0, used + size)
+        self._positions[key] = position
+        return position
+
+    def add(self, key, amount):
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._add_key(key)
+            _VALUE.pack_into(self._map, position, _VALUE.unpack_from(self._map, position)[0] + amount)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+_values = None
+_values_lock = threading.Lock()
+
+
+def _process_values():
+    # Каталог и pid проверяются каждый раз: после fork у воркера должен быть свой файл
+    global _values
+    path = os.path.join(settings.METRICS_DIR, f'{os.getpid()}.metrics')
+    values = _values
+    if values is None or values.path != path:
+        with _values_lock:
+            if _values is None or _values.path != path:
+                os.makedirs(settings.METRICS_DIR, exist_ok=True)
+                _values = MmapValues(path)
+            values = _values
+    return values
+
+
+def _key(name, labels):
+    return json.dumps([name, sorted(labels.items())], ensure_ascii=False)
+
+
+# --- ЗАПИСЬ ---
+def inc(name, amount=1, **labels):
+    _process_values().add(_key(name, labels), amount)
+
+
+def observe(name, value, **labels):
+    """Значение гистограммы: в корзину (не накопительно), сумму и количество."""
+    values = _process_values()
+    bucket = next((str(bound) for bound in LATENCY_BUCKETS if value <= bound), '+Inf')
+    values.add(_key(f'{name}_bucket', {**labels, 'le': bucket}), 1)
+    values.add(_key(f'{name}_sum', labels), value)
+    values.add(_key(f'{name}_count', labels), 1)
+
+
+class MetricsMiddleware:
+    """Время ответа и число запросов к БД по имени URL."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        started = time.perf_counter()
+        with connection.execute_wrapper(count):
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        # Несуществующие адреса — одной строкой, иначе боты раздуют число меток
+        url_name = (match.view_name if match else None) or 'unmatched'
+        observe('aya_http_request_duration_seconds', time.perf_counter() - started, url_name=url_name)
+        inc('aya_db_queries_total', queries[0], url_name=url_name)
+        return response
+
+
+# --- ЧТЕНИЕ ---
+DEAD_FILE = 'dead.metrics'
+
+
+def _file_values(path):
+    """[(ключ, значение), ...] из файла метрик."""
+    with open(path, 'rb') as source:
+        data = source.read()
+    if len(data) < _HEADER.size:
+        return []
+    return [(key, _VALUE.unpack_from(data, position)[0]) for key, position in _read_entries(data)]
+
+
+if fcntl is not None:
+    def _lock(lock_file):
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+    def _unlock(lock_file):
+        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _is_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass  # процесс есть, но чужой
+        return True
+else:
+    _PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    _ERROR_ACCESS_DENIED = 5
+    _STILL_ACTIVE = 259
+
+    def _lock(lock_file):
+        # Блокировка первого байта; LK_LOCK ждет ее до 10 секунд
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+
+    def _unlock(lock_file):
+        lock_file.seek(0)
+        msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _is_alive(pid):
+        # os.kill(pid, 0) в Windows не проверяет процесс, а завершает его
+        kernel32 = ctypes.WinDLL('kernel32', use_last_error=True)
+        handle = kernel32.OpenProcess(_PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+        if not handle:
+            return ctypes.get_last_error() == _ERROR_ACCESS_DENIED
+        try:
+            code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(code)):
+                return True
+            return code.value == _STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+
+
+def merge_dead(directory):
+    """Переносит счетчики завершившихся процессов в DEAD_FILE. Возвращает число файлов."""
+    with open(os.path.join(directory, '.merge.lock'), 'w') as lock:
+        _lock(lock)
+        try:
+            dead = [
+                filename for filename in os.listdir(directory)
+                if filename.endswith('.metrics') and filename[:-len('.metrics')].isdigit()
+                and not _is_alive(int(filename[:-len('.metrics')]))
+            ]
+            if not dead:
+                return 0
+            target = MmapValues(os.path.join(directory, DEAD_FILE))
+            try:
+                for filename in dead:
+                    path = os.path.join(directory, filename)
+                    for key, value in _file_values(path):
+                        target.add(key, value)
+                    os.remove(path)
+            finally:
+                target.close()
+        finally:
+            _unlock(lock)
+    return len(dead)
+
+
+def collect():
+    """Сумма по файлам всех процессов: {ключ: значение}."""
+    totals = defaultdict(float)
+    directory = settings.METRICS_DIR
+    if not os.path.isdir(directory):
+        return totals
+    merge_dead(directory)
+    for filename in os.listdir(directory):
+        if filename.endswith('.metrics'):
+            for key, value in _file_values(os.path.join(directory, filename)):
+                totals[key] += value
+    return totals
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _sample(name, labels, value):
+    label_text = ','.join(f'{label}="{_escape(text)}"' for label, text in labels)
+    value_text = repr(float(value)) if value != int(value) else str(int(value))
+    return f'{name}{{{label_text}}} {value_text}' if labels else f'{name} {value_text}'
+
+
+def _histogram_lines(name, series):
+    """Корзины хранятся по отдельности — в выводе они накопительные, как требует формат."""
+    lines = []
+    for labels, buckets in sorted(series.items()):
+        running = 0
+        for bound in [*map(str, LATENCY_BUCKETS), '+Inf']:
+            running += buckets.get(bound, 0)
+            lines.append(_sample(f'{name}_bucket', [*labels, ('le', bound)], running))
+        lines.append(_sample(f'{name}_sum', labels, buckets.get('sum', 0)))
+        lines.append(_sample(f'{name}_count', labels, buckets.get('count', 0)))
+    return lines
+
+
+def render(totals, gauges=()):
+    """
+    Текст для /metrics. totals — результат collect(), gauges —
+    [(имя, описание, [(метки, значение), ...]), ...] для значений, посчитанных сейчас.
+    """
+    samples = defaultdict(list)
+    histograms = defaultdict(lambda: defaultdict(dict))
+    for key, value in totals.items():
+        name, labels = json.loads(key)
+        labels = tuple(map(tuple, labels))
+        base, _, part = name.rpartition('_')
+        if METRICS.get(base, ('',))[0] != 'histogram':
+            samples[name].append((labels, value))
+        elif part == 'bucket':
+            series = tuple(pair for pair in labels if pair[0] != 'le')
+            histograms[base][series][dict(labels)['le']] = value
+        else:
+            histograms[base][labels][part] = value
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+        if kind == 'histogram':
+            lines += _histogram_lines(name, histograms.get(name, {}))
+        else:
+            lines += [_sample(name, labels, value) for labels, value in sorted(samples.get(name, []))]
+    for name, help_text, values in gauges:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+        lines += [_sample(name, tuple(labels), value) for labels, value in values]
+    return '\n'.join(lines) + '\n'
+
+
+def cache_hit_ratios(totals):
+    """[(метки, доля попаданий), ...] по счетчикам aya_cache_requests_total."""
+    counts = defaultdict(lambda: {'hit': 0, 'miss': 0})
+    for key, value in totals.items():
+        name, labels = json.loads(key)
+        if name == 'aya_cache_requests_total':
+            labels = dict(labels)
+            counts[labels['cache']][labels['result']] += value
+    return [
+        ((('cache', cache),), found['hit'] / (found['hit'] + found['miss']))
+        for cache, found in sorted(counts.items()) if found['hit'] + found['miss']
+    ]
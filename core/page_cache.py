@@ -0,0 +1,193 @@
+# core/page_cache.py
+"""
+Кэш целых страниц для анонимных посетителей.
+
+Главная, «О нас» и «Администрация» для гостя одинаковы у всех, поэтому
+готовый ответ кладется в кэш и отдается без обращения к БД. Браузер
+получает ETag и при повторном заходе — 304 без тела.
+
+Из кэша отвечаем только тем, у кого нет куки сессии и сообщений: такому
+запросу не нужно грузить пользователя, а в странице не будет ни имени,
+ни «Вы вышли из аккаунта». Остальные запросы идут в view как обычно.
+
+Каждой странице соответствует версия в кэше. Ее меняют сигналы (после
+коммита), и только когда меняется то, что на странице видно:
+    home           — президент, одобренные предстоящие мероприятия;
+    about          — AboutPage;
+    administration — руководитель отдела и работники;
+а AboutPage (контакты в футере) — все три. Готовые варианты картинки
+(core/images.py) сбрасывают страницы, где она видна.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from . import metrics
+
+HOME = 'home'
+ABOUT = 'about'
+ADMINISTRATION = 'administration'
+
+# Какие роли показываются на каких страницах
+ROLE_PAGES = {
+    'president': (HOME,),
+    'head_admin': (ADMINISTRATION,),
+    'worker': (ADMINISTRATION,),
+}
+# Поля пользователя, которые на этих страницах не видны: их сохранение кэш не сбрасывает
+USER_HIDDEN_FIELDS = {'last_login', 'password', 'unread_notifications_count', 'qr_code'}
+
+
+def _version_key(page):
+    return f'page-cache:version:{page}'
+
+
+def _version(page):
+    version = cache.get(_version_key(page))
+    if version is None:
+        version = time.time_ns()
+        cache.set(_version_key(page), version, timeout=None)
+    return version
+
+
+def invalidate(*pages):
+    # После коммита: иначе параллельный запрос закэширует старые данные под новой версией
+    def bump():
+        cache.set_many({_version_key(page): time.time_ns() for page in pages}, timeout=None)
+    transaction.on_commit(bump)
+
+
+def _is_anonymous(request):
+    # Проверка по кукам, а не request.user: загрузка сессии — это уже запрос к БД
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'messages' not in request.COOKIES
+    )
+
+
+def _etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return etag in [tag.strip() for tag in header.split(',')] or header.strip() == '*'
+
+
+def _finish(request, content, content_type, etag):
+    if _etag_matches(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    # Прокси не должны отдавать гостевую страницу вошедшему пользователю,
+    # а браузер каждый раз сверяет ETag (ответ 304 почти ничего не стоит)
+    response['Cache-Control'] = 'no-cache'
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def anonymous_page_cache(page):
+    """Декоратор view: ответ гостю кэшируется до изменения данных страницы."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _is_anonymous(request):
+                return view(request, *args, **kwargs)
+            # Параметры запроса (?utm_source=..., ?fbclid=...) на эти страницы не влияют
+            key = f'page-cache:{page}:{_version(page)}'
+            cached = cache.get(key)
+            metrics.inc('aya_cache_requests_total', cache='page', result='miss' if cached is None else 'hit')
+            if cached is not None:
+                return _finish(request, *cached)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200 or response.cookies or response.streaming:
+                return response
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+            etag = '"%s"' % hashlib.md5(response.content).hexdigest()
+            entry = (response.content, response['Content-Type'], etag)
+            cache.set(key, entry, settings.PAGE_CACHE_TIMEOUT)
+            return _finish(request, *entry)
+        return wrapper
+    return decorator
+
+
+# --- ОБРАБОТЧИКИ СИГНАЛОВ ---
+def _role_pages(*roles):
+    return {page for role in roles for page in ROLE_PAGES.get(role, ())}
+
+
+def user_pre_save(sender, instance, update_fields=None, **kwargs):
+    # Старая роль — из значений, загруженных вместе с объектом (User.from_db);
+    # SELECT только для объекта, собранного вручную или без поля role
+    instance._page_cache_old_role = None
+    if not instance.pk or (update_fields and set(update_fields) <= USER_HIDDEN_FIELDS):
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    if 'role' in loaded:
+        instance._page_cache_old_role = loaded['role']
+    else:
+        instance._page_cache_old_role = sender._base_manager.filter(pk=instance.pk).values_list('role', flat=True).first()
+
+
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= USER_HIDDEN_FIELDS:
+        return
+    pages = _role_pages(instance.role, getattr(instance, '_page_cache_old_role', None))
+    if pages:
+        invalidate(*pages)
+
+
+def user_deleted(sender, instance, **kwargs):
+    pages = _role_pages(instance.role)
+    if pages:
+        invalidate(*pages)
+
+
+def _is_upcoming(approved, completed):
+    return approved and not completed
+
+
+def event_pre_save(sender, instance, **kwargs):
+    # Как у пользователя: прежнее состояние — из Event.from_db
+    instance._page_cache_was_upcoming = False
+    if not instance.pk:
+        return
+    old = getattr(instance, '_loaded_values', {})
+    if 'is_approved' not in old or 'is_completed' not in old:
+        old = sender._base_manager.filter(pk=instance.pk).values('is_approved', 'is_completed').first() or {}
+    instance._page_cache_was_upcoming = bool(old) and _is_upcoming(old['is_approved'], old['is_completed'])
+
+
+def event_saved(sender, instance, **kwargs):
+    # Главная показывает только одобренные предстоящие: черновики и архив ее не меняют
+    if _is_upcoming(instance.is_approved, instance.is_completed) or getattr(instance, '_page_cache_was_upcoming', False):
+        invalidate(HOME)
+
+
+def event_deleted(sender, instance, **kwargs):
+    if _is_upcoming(instance.is_approved, instance.is_completed):
+        invalidate(HOME)
+
+
+def variants_generated(sender, name, **kwargs):
+    # Пока вариантов нет, страница показывает оригинал (см. core/templatetags/images.py) —
+    # сбрасываем те, где эта картинка видна
+    User = apps.get_model('users.User')
+    Event = apps.get_model('events.Event')
+    pages = _role_pages(*User.objects.filter(role__in=ROLE_PAGES, photo=name).values_list('role', flat=True))
+    if Event.objects.filter(is_approved=True, is_completed=False, cover_image=name).exists():
+        pages.add(HOME)
+    if pages:
+        invalidate(*pages)
+
+
+def about_changed(sender, instance, **kwargs):
+    # Контакты из AboutPage есть в футере каждой страницы
+    invalidate(HOME, ABOUT, ADMINISTRATION)
@@ -0,0 +1,157 @@
+# core/profiler.py
+"""
+Профилировщик медленных запросов (включается SLOW_REQUEST_PROFILER).
+
+Пока запрос выполняется, фоновый поток раз в SLOW_REQUEST_SAMPLE_INTERVAL_MS
+снимает стек его потока (sys._current_frames). Если запрос уложился в
+SLOW_REQUEST_THRESHOLD_MS, снимки выбрасываются. Если нет — одинаковые
+стеки сворачиваются со счетчиком и пишутся в JSON-файл в
+SLOW_REQUEST_PROFILE_DIR. Хранятся последние SLOW_REQUEST_PROFILE_KEEP
+файлов, старые удаляются.
+
+В отличие от cProfile, код запроса не замедляется: выборка идет из
+отдельного потока, а запросу остается регистрация в словаре. Поэтому
+профилировщик можно держать включенным на сервере.
+
+Сводка по файлам: python manage.py profile_report.
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+# Идентификатор потока -> список снимков стека выполняемого в нем запроса
+_active = {}
+_lock = threading.Lock()
+_sampler = None
+_sampler_pid = None
+
+MAX_DEPTH = 100
+
+
+def _stack(frame):
+    """Стек от внешнего вызова к текущему: [(файл, функция, строка), ...]."""
+    stack = []
+    while frame is not None and len(stack) < MAX_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_name, frame.f_lineno))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _sample_forever(interval):
+    while True:
+        time.sleep(interval)
+        with _lock:
+            if not _active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, samples in _active.items():
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples.append(_stack(frame))
+
+
+def _ensure_sampler():
+    # Поток не переживает fork: у каждого воркера свой
+    global _sampler, _sampler_pid
+    if _sampler is not None and _sampler_pid == os.getpid() and _sampler.is_alive():
+        return
+    with _lock:
+        if _sampler is None or _sampler_pid != os.getpid() or not _sampler.is_alive():
+            _sampler = threading.Thread(
+                target=_sample_forever, args=(settings.SLOW_REQUEST_SAMPLE_INTERVAL_MS / 1000,),
+                name='slow-request-profiler', daemon=True,
+            )
+            _sampler.start()
+            _sampler_pid = os.getpid()
+
+
+# --- ФАЙЛЫ ПРОФИЛЕЙ ---
+def _short_path(filename):
+    base_dir = str(settings.BASE_DIR)
+    if filename.startswith(base_dir):
+        return filename[len(base_dir) + 1:]
+    # Библиотеки — от site-packages/, стандартная библиотека — полным путем
+    marker = 'site-packages' + os.sep
+    return filename[filename.index(marker):] if marker in filename else filename
+
+
+def _collapse(samples):
+    """Одинаковые стеки — одной строкой: [[['файл:функция:строка', ...], сколько], ...]."""
+    counts = {}
+    for stack in samples:
+        key = tuple(f'{_short_path(filename)}:{name}:{line}' for filename, name, line in stack)
+        counts[key] = counts.get(key, 0) + 1
+    return [[list(stack), count] for stack, count in sorted(counts.items(), key=lambda item: -item[1])]
+
+
+def _rotate(directory, keep):
+    # Имена начинаются с времени, поэтому сортировка по имени — по возрасту
+    names = sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+    for name in names[:max(0, len(names) - keep)]:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass  # удалил другой воркер
+
+
+def save_profile(profile):
+    directory = settings.SLOW_REQUEST_PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.time_ns()}-{os.getpid()}-{profile['url_name'].replace(':', '_')}.json"
+    temporary = os.path.join(directory, f'.{name}.tmp')
+    with open(temporary, 'w', encoding='utf-8') as output:
+        json.dump(profile, output, ensure_ascii=False)
+    # Переименование атомарно: команда отчета не прочитает недописанный файл
+    os.replace(temporary, os.path.join(directory, name))
+    _rotate(directory, settings.SLOW_REQUEST_PROFILE_KEEP)
+    return name
+
+
+def load_profiles(directory):
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name), encoding='utf-8') as source:
+                yield json.load(source)
+
+
+# --- MIDDLEWARE ---
+class SlowRequestProfilerMiddleware:
+    def __init__(self, get_response):
+        if not settings.SLOW_REQUEST_PROFILER:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _ensure_sampler()
+        thread_id = threading.get_ident()
+        samples = []
+        with _lock:
+            _active[thread_id] = samples
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            with _lock:
+                del _active[thread_id]
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        if duration_ms >= settings.SLOW_REQUEST_THRESHOLD_MS and samples:
+            match = getattr(request, 'resolver_match', None)
+            save_profile({
+                'url_name': (match.view_name if match else None) or 'unmatched',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(duration_ms, 1),
+                'interval_ms': settings.SLOW_REQUEST_SAMPLE_INTERVAL_MS,
+                'started_at': time.time() - duration_ms / 1000,
+                'stacks': _collapse(samples),
+            })
+        return response
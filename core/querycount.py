@@ -0,0 +1,100 @@
+# core/querycount.py
+"""
+Подсчет запросов к БД (для разработки).
+
+QueryCountMiddleware считает запросы каждого HTTP-запроса и ищет N+1:
+один и тот же по форме SQL (без значений параметров), повторенный
+QUERY_COUNT_REPEAT_THRESHOLD раз и больше. Для таких запросов в лог
+core.querycount пишется, откуда они пришли — строка шаблона
+(templates/events/event_detail.html:105) или строка нашего кода.
+Число запросов отдается в заголовке X-Query-Count.
+
+Включается в settings.py только при DEBUG = True.
+"""
+import logging
+import re
+import sys
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+\b')
+# Обертки запросов (core/) — не источник запроса
+INSTRUMENTATION_FILES = ('querycount.py', 'slow_queries.py', 'timing.py', 'metrics.py')
+
+
+def sql_shape(sql):
+    """Форма запроса: значения убраны, списки IN (%s, %s, ...) свернуты."""
+    shape = _IN_LIST.sub('IN (...)', sql)
+    shape = _STRING.sub('?', shape)
+    return _NUMBER.sub('?', shape)
+
+
+def query_origin(frame=None):
+    """
+    Строка шаблона, из которой пришел запрос, а если шаблона нет — строка нашего кода.
+    frame — кадр, с которого начинать (по умолчанию вызывающий).
+    """
+    frame = frame or sys._getframe(1)
+    code_line = None
+    base_dir = str(settings.BASE_DIR)
+    while frame is not None:
+        if frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin, token = getattr(node, 'origin', None), getattr(node, 'token', None)
+            if origin is not None and token is not None:
+                return f'{origin.template_name}:{token.lineno}'
+        filename = frame.f_code.co_filename
+        if (
+            code_line is None and filename.startswith(base_dir)
+            and 'site-packages' not in filename and not filename.endswith(INSTRUMENTATION_FILES)
+        ):
+            code_line = f'{filename[len(base_dir) + 1:]}:{frame.f_lineno}'
+        frame = frame.f_back
+    return code_line or '?'
+
+
+class QueryRecorder:
+    """Обертка для connection.execute_wrapper: запоминает форму и источник каждого запроса."""
+
+    def __init__(self):
+        self.count = 0
+        self.shapes = Counter()
+        self.origins = defaultdict(Counter)
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        shape = sql_shape(sql)
+        self.shapes[shape] += 1
+        self.origins[shape][query_origin(sys._getframe(1))] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        """[(форма, сколько раз, {источник: сколько}), ...] — вероятные N+1."""
+        return [
+            (shape, count, dict(self.origins[shape]))
+            for shape, count in self.shapes.most_common() if count >= threshold
+        ]
+
+
+class QueryCountMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+
+        response['X-Query-Count'] = str(recorder.count)
+        for shape, count, origins in recorder.repeated(settings.QUERY_COUNT_REPEAT_THRESHOLD):
+            where = ', '.join(f'{origin} ×{times}' for origin, times in origins.items())
+            logger.warning("N+1 на %s: %s одинаковых запросов из %s: %s", request.path, count, where, shape[:300])
+        if recorder.count > settings.QUERY_COUNT_WARN:
+            logger.warning("%s: %s запросов к БД за один запрос", request.path, recorder.count)
+        return response
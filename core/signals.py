@@ -0,0 +1,28 @@
+# core/signals.py
+"""
+Подключение обработчиков сигналов приложения core.
+Импортируется из CoreConfig.ready().
+"""
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete, pre_save
+
+from . import images, page_cache
+
+for label in images.IMAGE_FIELDS:
+    model = apps.get_model(label)
+    post_save.connect(images.image_saved, sender=model, dispatch_uid=f'core_images_saved_{label}')
+    post_delete.connect(images.image_deleted, sender=model, dispatch_uid=f'core_images_deleted_{label}')
+
+# Кэш страниц для гостей (core/page_cache.py)
+User = apps.get_model('users.User')
+Event = apps.get_model('events.Event')
+AboutPage = apps.get_model('users.AboutPage')
+pre_save.connect(page_cache.user_pre_save, sender=User, dispatch_uid='core_page_cache_user_pre_save')
+post_save.connect(page_cache.user_saved, sender=User, dispatch_uid='core_page_cache_user_saved')
+post_delete.connect(page_cache.user_deleted, sender=User, dispatch_uid='core_page_cache_user_deleted')
+pre_save.connect(page_cache.event_pre_save, sender=Event, dispatch_uid='core_page_cache_event_pre_save')
+post_save.connect(page_cache.event_saved, sender=Event, dispatch_uid='core_page_cache_event_saved')
+post_delete.connect(page_cache.event_deleted, sender=Event, dispatch_uid='core_page_cache_event_deleted')
+images.variants_generated.connect(page_cache.variants_generated, dispatch_uid='core_page_cache_variants_generated')
+post_save.connect(page_cache.about_changed, sender=AboutPage, dispatch_uid='core_page_cache_about_saved')
+post_delete.connect(page_cache.about_changed, sender=AboutPage, dispatch_uid='core_page_cache_about_deleted')
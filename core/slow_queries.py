@@ -0,0 +1,144 @@
+# core/slow_queries.py
+"""
+Журнал медленных SQL-запросов.
+
+SlowQueryLogMiddleware оборачивает выполнение запросов (execute_wrapper)
+и записывает каждый запрос дольше SLOW_QUERY_THRESHOLD_MS: форму запроса,
+параметры, имя URL, строку шаблона или кода, откуда он пришел, и план
+выполнения (EXPLAIN QUERY PLAN — только для SELECT).
+
+Записи лежат в кэше кольцом из SLOW_QUERY_LOG_SIZE ячеек: номер ячейки —
+атомарный счетчик cache.incr по модулю размера, так что новые записи
+вытесняют самые старые. Если процессов несколько, кэш (CACHES) должен быть
+общим, иначе каждый воркер видит только свои запросы (как и в users/about.py).
+
+Страница «Медленные запросы» (administration/slow-queries/) группирует
+записи по форме запроса и сортирует по суммарному времени.
+"""
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .querycount import query_origin, sql_shape
+
+SEQUENCE_KEY = 'slow-queries:next'
+
+_recording = threading.local()
+
+
+def _slot_key(slot):
+    return f'slow-queries:slot:{slot}'
+
+
+def _next_slot():
+    try:
+        number = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        # Счетчика еще нет (или кэш его вытеснил)
+        cache.add(SEQUENCE_KEY, 0, timeout=None)
+        number = cache.incr(SEQUENCE_KEY)
+    return number % settings.SLOW_QUERY_LOG_SIZE
+
+
+def explain(sql, params):
+    """План запроса или '' (не SELECT, ошибка). Отдельный курсор — без наших оберток."""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return ''
+    cursor = connection.create_cursor()
+    try:
+        cursor.execute(f'{connection.ops.explain_query_prefix()} {sql}', params)
+        rows = cursor.fetchall()
+    except Exception:
+        return ''
+    finally:
+        cursor.close()
+    if connection.vendor != 'sqlite':
+        return '\n'.join(str(row[0]) for row in rows)
+    # SQLite: (id, parent, _, detail) — отступ по вложенности, как в sqlite3 .eqp
+    depth, lines = {0: -1}, []
+    for node_id, parent, _unused, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node_id] + detail)
+    return '\n'.join(lines)
+
+
+def record(sql, params, duration, url_name, origin):
+    entry = {
+        'shape': sql_shape(sql),
+        'sql': sql[:2000],
+        'params': repr(params)[:500],
+        'duration_ms': round(duration * 1000, 1),
+        'url_name': url_name,
+        'origin': origin,
+        'plan': explain(sql, params),
+        'at': timezone.now(),
+    }
+    cache.set(_slot_key(_next_slot()), entry, timeout=None)
+    return entry
+
+
+def entries():
+    keys = [_slot_key(slot) for slot in range(settings.SLOW_QUERY_LOG_SIZE)]
+    return sorted(cache.get_many(keys).values(), key=lambda entry: entry['at'], reverse=True)
+
+
+def clear():
+    cache.delete_many([SEQUENCE_KEY, *(_slot_key(slot) for slot in range(settings.SLOW_QUERY_LOG_SIZE))])
+
+
+def top_offenders(log, limit=30):
+    """Записи журнала по формам запроса, больше всего суммарного времени — сверху."""
+    groups = {}
+    for entry in log:
+        group = groups.setdefault(entry['shape'], {
+            'shape': entry['shape'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+            'url_names': Counter(), 'origins': Counter(), 'slowest': entry, 'last_at': entry['at'],
+        })
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        group['url_names'][entry['url_name']] += 1
+        group['origins'][entry['origin']] += 1
+        group['last_at'] = max(group['last_at'], entry['at'])
+        if entry['duration_ms'] >= group['max_ms']:
+            group['max_ms'] = entry['duration_ms']
+            group['slowest'] = entry
+    result = sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)[:limit]
+    for group in result:
+        group['total_ms'] = round(group['total_ms'], 1)
+        group['avg_ms'] = round(group['total_ms'] / group['count'], 1)
+        group['url_names'] = group['url_names'].most_common()
+        group['origins'] = group['origins'].most_common()
+    return result
+
+
+class _SlowQueryWrapper:
+    def __init__(self, request):
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = time.perf_counter() - started
+        # Запросы самой записи (EXPLAIN, кэш в БД) в журнал не попадают
+        if duration * 1000 >= settings.SLOW_QUERY_THRESHOLD_MS and not many and not getattr(_recording, 'active', False):
+            _recording.active = True
+            try:
+                match = getattr(self.request, 'resolver_match', None)
+                record(sql, params, duration, (match.view_name if match else None) or 'unmatched', query_origin())
+            finally:
+                _recording.active = False
+        return result
+
+
+class SlowQueryLogMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with connection.execute_wrapper(_SlowQueryWrapper(request)):
+            return self.get_response(request)
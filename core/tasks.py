@@ -0,0 +1,164 @@
+# core/tasks.py
+"""
+Фоновое выполнение задач без внешних сервисов.
+
+run_in_background(func, *args) запускает функцию после коммита текущей
+транзакции в небольшом пуле потоков внутри процесса, чтобы запрос
+пользователя не ждал, например, рассылки уведомлений.
+
+enqueue(task, *args) — то же для задач, объявленных декоратором @task,
+но в режиме 'queue' задача сохраняется в таблицу BackgroundJob и
+выполняется отдельным процессом `python manage.py run_tasks`, т.е.
+переживает перезапуск веб-сервера.
+
+Режим задается настройкой BACKGROUND_TASKS_MODE:
+    'thread' — пул потоков (по умолчанию);
+    'queue'  — очередь в БД + воркер run_tasks;
+    'sync'   — выполнить сразу в текущем потоке (удобно в тестах и отладке).
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Зарегистрированные задачи: 'users.qr.generate_qr_code' -> функция
+TASKS = {}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BACKGROUND_TASKS_WORKERS', 2),
+                thread_name_prefix='aya-background',
+            )
+        return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception("Фоновая задача %s завершилась ошибкой", getattr(func, '__name__', func))
+    finally:
+        # У каждого потока свое соединение с БД — закрываем, чтобы не копились
+        connections.close_all()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Выполняет func(*args, **kwargs) вне потока запроса (после коммита транзакции)."""
+    if getattr(settings, 'BACKGROUND_TASKS_MODE', 'thread') == 'sync':
+        func(*args, **kwargs)
+        return
+    transaction.on_commit(lambda: get_executor().submit(_run, func, args, kwargs))
+
+
+# --- ЗАДАЧИ И ОЧЕРЕДЬ В БД ---
+def task(func):
+    """Регистрирует функцию как фоновую задачу (аргументы должны сериализоваться в JSON)."""
+    func.task_name = f'{func.__module__}.{func.__name__}'
+    TASKS[func.task_name] = func
+    return func
+
+
+def get_task(name):
+    if name not in TASKS:
+        # Модуль с задачей мог еще не импортироваться в этом процессе
+        import_string(name)
+    return TASKS[name]
+
+
+def enqueue(func, *args, **kwargs):
+    """Ставит задачу в очередь согласно BACKGROUND_TASKS_MODE."""
+    mode = getattr(settings, 'BACKGROUND_TASKS_MODE', 'thread')
+    if mode == 'queue':
+        from .models import BackgroundJob
+        transaction.on_commit(
+            lambda: BackgroundJob.objects.create(name=func.task_name, args=list(args), kwargs=kwargs)
+        )
+    else:
+        run_in_background(func, *args, **kwargs)
+
+
+def reclaim_stale_jobs(now=None):
+    """
+    Возвращает в очередь задачи, которые выполняются дольше
+    BACKGROUND_TASKS_LEASE_SECONDS: их воркер, скорее всего, упал или был
+    убит при деплое. Такой запуск считается неудачной попыткой, поэтому
+    задача, которая сама роняет воркер, не будет перезапускаться вечно.
+    """
+    from .models import BackgroundJob
+    now = now or timezone.now()
+    stale = BackgroundJob.objects.filter(
+        status=BackgroundJob.RUNNING,
+        started_at__lt=now - timedelta(seconds=settings.BACKGROUND_TASKS_LEASE_SECONDS),
+    )
+    error = "Воркер не завершил задачу за отведенное время"
+    failed = stale.filter(attempts__gte=settings.BACKGROUND_TASKS_MAX_ATTEMPTS - 1).update(
+        status=BackgroundJob.FAILED, attempts=F('attempts') + 1, error=error, finished_at=now,
+    )
+    retried = stale.update(status=BackgroundJob.PENDING, attempts=F('attempts') + 1, error=error, run_after=now)
+    if failed or retried:
+        logger.warning("Истекла аренда задач: %s возвращено в очередь, %s завершено ошибкой", retried, failed)
+    return retried + failed
+
+
+def claim_next_job():
+    """
+    Забирает одну ожидающую задачу. Статус меняется условным UPDATE,
+    поэтому несколько воркеров не выполнят одну задачу дважды.
+    Перед этим в очередь возвращаются задачи упавших воркеров.
+    """
+    from .models import BackgroundJob
+    now = timezone.now()
+    reclaim_stale_jobs(now)
+    candidates = (
+        BackgroundJob.objects.filter(status=BackgroundJob.PENDING, run_after__lte=now)
+        .order_by('run_after', 'id').values_list('id', flat=True)[:5]
+    )
+    for job_id in candidates:
+        claimed = BackgroundJob.objects.filter(pk=job_id, status=BackgroundJob.PENDING).update(
+            status=BackgroundJob.RUNNING, started_at=now
+        )
+        if claimed:
+            return BackgroundJob.objects.get(pk=job_id)
+    return None
+
+
+def run_job(job):
+    from .models import BackgroundJob
+    try:
+        get_task(job.name)(*job.args, **job.kwargs)
+    except Exception as exc:
+        logger.exception("Задача %s (#%s) завершилась ошибкой", job.name, job.pk)
+        job.attempts += 1
+        job.error = repr(exc)
+        if job.attempts < settings.BACKGROUND_TASKS_MAX_ATTEMPTS:
+            # Повторим позже, с нарастающей паузой
+            job.status = BackgroundJob.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=30 * job.attempts)
+        else:
+            job.status = BackgroundJob.FAILED
+    else:
+        job.status = BackgroundJob.DONE
+        job.error = ''
+    job.finished_at = timezone.now()
+    # Если аренда истекла и задачу уже забрал другой воркер, результат пишет он
+    BackgroundJob.objects.filter(pk=job.pk, status=BackgroundJob.RUNNING, started_at=job.started_at).update(
+        status=job.status, attempts=job.attempts, error=job.error, run_after=job.run_after,
+        finished_at=job.finished_at,
+    )
+    return job.status == BackgroundJob.DONE
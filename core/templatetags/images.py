@@ -0,0 +1,55 @@
+# core/templatetags/images.py
+"""
+Теги для адаптивных картинок (варианты создает core/images.py).
+
+    {% load images %}
+    <img src="{{ photo.image|thumbnail_url }}">
+    {% responsive_image event.cover_image sizes="(max-width: 768px) 100vw, 33vw" class="w-100" alt="Обложка" %}
+
+Если варианты еще не готовы (фоновая задача не успела), выводится оригинал.
+"""
+from django import template
+from django.conf import settings
+from django.utils.html import format_html, format_html_join
+
+from core.images import has_variants, variant_name
+
+register = template.Library()
+
+
+def _url(image, label, ext):
+    return image.storage.url(variant_name(image.name, label, ext))
+
+
+def _srcset(image, ext):
+    return ', '.join(
+        f'{_url(image, str(width), ext)} {width}w' for width in settings.IMAGE_VARIANT_WIDTHS
+    )
+
+
+@register.filter
+def thumbnail_url(image, ext='jpg'):
+    """URL квадратной миниатюры или оригинала, если миниатюры еще нет."""
+    if not image:
+        return ''
+    if has_variants(image.name, image.storage):
+        return _url(image, 'thumb', ext)
+    return image.url
+
+
+@register.simple_tag
+def responsive_image(image, sizes='100vw', **attrs):
+    """<picture> с WebP и JPEG вариантами по ширине (srcset)."""
+    if not image:
+        return ''
+    attributes = format_html_join(' ', '{}="{}"', ((key.replace('_', '-'), value) for key, value in attrs.items()))
+    if not has_variants(image.name, image.storage):
+        return format_html('<img src="{}" loading="lazy" {}>', image.url, attributes)
+    fallback = _url(image, str(settings.IMAGE_VARIANT_WIDTHS[-1]), 'jpg')
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" loading="lazy" {}>'
+        '</picture>',
+        _srcset(image, 'webp'), sizes, fallback, _srcset(image, 'jpg'), sizes, attributes,
+    )
@@ -0,0 +1,58 @@
+# core/test_runner.py
+"""
+Запуск тестов (TEST_RUNNER в settings.py).
+
+Тесты не должны зависеть от окружения разработчика и оставлять следов в
+проекте: фоновые задачи выполняются сразу (а не в потоках, которые
+переживают тест), а файлы пишутся во временный каталог, который
+удаляется после прогона. Тесты, которым нужна очередь, по-прежнему
+включают ее через override_settings.
+
+Логи приложений (строка core.timing на каждый запрос и т.п.) в тестах
+приглушены до ERROR; assertLogs включает нужный уровень сам.
+"""
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class AyaTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.temp_dir = tempfile.mkdtemp(prefix='aya-tests-')
+        self.test_settings = override_settings(**self.isolated_settings(self.temp_dir))
+        self.test_settings.enable()
+        self.log_levels = {}
+        for name in settings.LOGGING.get('loggers', {}):
+            logger = logging.getLogger(name)
+            self.log_levels[name] = logger.level
+            logger.setLevel(logging.ERROR)
+
+    def isolated_settings(self, temp_dir):
+        return {
+            'BACKGROUND_TASKS_MODE': 'sync',
+            'MEDIA_ROOT': os.path.join(temp_dir, 'media'),
+            'PHOTO_UPLOAD_SPOOL_DIR': os.path.join(temp_dir, 'upload_spool'),
+            'AUDIT_LOG_ARCHIVE_DIR': os.path.join(temp_dir, 'audit_archive'),
+            'METRICS_DIR': os.path.join(temp_dir, 'metrics'),
+            'SLOW_REQUEST_PROFILE_DIR': os.path.join(temp_dir, 'profiles'),
+            'CACHES': {
+                'default': {
+                    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                    'LOCATION': os.path.join(temp_dir, 'cache'),
+                    'OPTIONS': {'MAX_ENTRIES': 20000},
+                },
+            },
+        }
+
+    def teardown_test_environment(self, **kwargs):
+        for name, level in self.log_levels.items():
+            logging.getLogger(name).setLevel(level)
+        self.test_settings.disable()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
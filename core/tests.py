@@ -1,3 +1,600 @@
-from django.test import TestCase
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import timedelta
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models.fields.files import FieldFile
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, resolve, reverse
+from django.utils import timezone
+
+from events import urls as events_urls
+from events.models import Event, EventHero, EventPhoto, PhotoUploadBatch
+from users.context_processors import notifications_processor
+from users import urls as users_urls
+from users.models import AboutPage, Direction, Notification, School, User
+from users.notifications import notify
+from users.qr import build_qr_png, profile_url
+
+from . import metrics
+from .checks import check_shared_cache
+from .images import generate_image_variants, has_variants, variant_name
+from .models import BackgroundJob
+from .profiler import SlowRequestProfilerMiddleware, load_profiles
+from . import slow_queries
+from .querycount import QueryRecorder, sql_shape
+from .tasks import claim_next_job, run_job
+
+
+@override_settings(BACKGROUND_TASKS_MODE='queue')
+class BackgroundQueueTests(TestCase):
+    def test_new_user_qr_code_is_generated_by_worker(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            user = User.objects.create_user(username='qr', password='x')
+        self.assertFalse(User.objects.get(pk=user.pk).qr_code)
+
+        job = BackgroundJob.objects.get()
+        self.assertEqual(job.name, 'users.qr.generate_qr_code')
+        claimed = claim_next_job()
+        self.assertEqual(claimed, job)
+        self.assertIsNone(claim_next_job())  # уже забрана, второй воркер ее не получит
+        self.assertTrue(run_job(claimed))
+
+        self.assertEqual(BackgroundJob.objects.get().status, BackgroundJob.DONE)
+        self.assertTrue(User.objects.get(pk=user.pk).qr_code.name.startswith('qr_codes/qr_code_qr'))
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        job = BackgroundJob.objects.create(name='users.qr.generate_qr_code', args=['not-an-id'])
+        with self.assertLogs('core.tasks', 'ERROR'), self.settings(BACKGROUND_TASKS_MAX_ATTEMPTS=1):
+            self.assertFalse(run_job(claim_next_job()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (BackgroundJob.FAILED, 1))
+
+    def test_stale_running_job_is_returned_to_queue(self):
+        job = BackgroundJob.objects.create(name='users.qr.generate_qr_code', args=[1])
+        self.assertEqual(claim_next_job(), job)
+        # Воркер упал: задача так и осталась «Выполняется»
+        BackgroundJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('core.tasks', 'WARNING'):
+            reclaimed = claim_next_job()
+        self.assertEqual(reclaimed, job)
+        self.assertEqual((reclaimed.status, reclaimed.attempts), (BackgroundJob.RUNNING, 1))
+
+        # Последняя попытка тоже брошена — задача завершается ошибкой
+        with self.settings(BACKGROUND_TASKS_MAX_ATTEMPTS=2):
+            BackgroundJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+            with self.assertLogs('core.tasks', 'WARNING'):
+                self.assertIsNone(claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (BackgroundJob.FAILED, 2))
+
+    def test_late_result_of_reclaimed_job_is_ignored(self):
+        job = BackgroundJob.objects.create(name='users.qr.generate_qr_code', args=['not-an-id'])
+        stale = claim_next_job()
+        BackgroundJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(hours=1))
+        with self.assertLogs('core.tasks', 'WARNING'):
+            fresh = claim_next_job()
+        with self.assertLogs('core.tasks', 'ERROR'):
+            run_job(stale)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.started_at), (BackgroundJob.RUNNING, fresh.started_at))
+
+    def test_regenerate_qr_codes_uses_base_url(self):
+        user = User.objects.create_user(username='regen', password='x')
+        output = StringIO()
+        call_command('regenerate_qr_codes', base_url='https://aya.example', workers=2, stdout=output)
+        self.assertIn(f'QR-коды перерисованы: {User.objects.count()}.', output.getvalue())
+        user.refresh_from_db()
+        self.assertTrue(user.qr_code)
+        # QR-код детерминирован: сохраненный PNG совпадает с кодом ожидаемой ссылки
+        url = profile_url(user.pk, 'https://aya.example')
+        self.assertTrue(url.startswith('https://aya.example/'))
+        with user.qr_code.open('rb') as stored:
+            png = stored.read()
+        self.assertEqual(png, build_qr_png(url))
+        self.assertNotEqual(png, build_qr_png(profile_url(user.pk, 'http://testserver')))
+
+
+def make_upload(size=(1600, 900)):
+    from PIL import Image
+    buffer = BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'  # Make — метаданные, которые не должны попасть в варианты
+    Image.new('RGB', size, 'teal').save(buffer, format='JPEG', exif=exif)
+    return SimpleUploadedFile('cover.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+class ImageVariantTests(TestCase):
+
+    def test_variants_are_generated_on_upload(self):
+        from PIL import Image
+        organizer = User.objects.create_user(username='org', password='x')
+        event = Event.objects.create(
+            title='Субботник', description='...', organizer=organizer, cover_image=make_upload(),
+            start_time=timezone.now(), end_time=timezone.now(),
+        )
+        name = event.cover_image.name
+        self.assertTrue(has_variants(name))
+        with default_storage.open(variant_name(name, '640', 'webp')) as variant:
+            image = Image.open(variant)
+            self.assertEqual(image.size, (640, 360))
+            self.assertNotIn(0x010F, image.getexif())
+        with default_storage.open(variant_name(name, 'thumb', 'jpg')) as thumb:
+            self.assertEqual(Image.open(thumb).size, (400, 400))
+
+        html = Template('{% load images %}{% responsive_image image class="w-100" %}').render(
+            Context({'image': event.cover_image})
+        )
+        self.assertIn('320.webp 320w', html)
+        self.assertIn('class="w-100"', html)
+
+        event.delete()
+        self.assertFalse(has_variants(name))
+
+    def test_missing_variants_fall_back_to_original(self):
+        photo = default_storage.save('event_gallery/raw.jpg', make_upload())
+        image = FieldFile(None, EventPhoto._meta.get_field('image'), photo)
+        self.assertEqual(Template('{% load images %}{{ image|thumbnail_url }}').render(Context({'image': image})), image.url)
+
+
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_home_is_served_from_cache_until_it_changes(self):
+        president = User.objects.create_user(username='pres', first_name='Анна', role='president', is_approved=True)
+        url = reverse('home')
+        first = self.client.get(url)
+        self.assertContains(first, 'Анна')
+        with self.assertNumQueries(0):
+            again = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(again.status_code, 304)
+
+        # Невидимые на странице изменения кэш не сбрасывают
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.create_user(username='volunteer', role='volunteer', is_approved=True)
+            president.last_login = timezone.now()
+            president.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            president.role = 'volunteer'
+            president.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Анна')
+
+    def test_generated_variants_replace_original_on_cached_page(self):
+        with self.settings(BACKGROUND_TASKS_MODE='queue'):
+            president = User.objects.create_user(
+                username='pres', role='president', is_approved=True,
+                photo=make_upload(size=(600, 600)),
+            )
+        url = reverse('home')
+        self.assertNotContains(self.client.get(url), 'thumb.jpg')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_image_variants(president.photo.name)
+        self.assertContains(self.client.get(url), 'thumb.jpg')
+
+    def test_about_and_logged_in_users(self):
+        url = reverse('about_page')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            AboutPage.objects.create(description='Новый текст')
+        self.assertContains(self.client.get(url), 'Новый текст')
+
+        self.client.force_login(User.objects.create_user(username='member', password='x'))
+        response = self.client.get(url)
+        self.assertNotIn('ETag', response)
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+    def test_process_local_cache_is_rejected_in_production(self):
+        with self.settings(CACHES=self.LOCMEM, DEBUG=False):
+            [error] = check_shared_cache(None)
+        self.assertEqual(error.id, 'core.E001')
+        with self.settings(CACHES=self.LOCMEM, DEBUG=True):
+            self.assertEqual(check_shared_cache(None), [])
+        self.assertEqual(check_shared_cache(None), [])
+
+
+class QueryPlanTests(TestCase):
+    """Частые запросы не должны превращаться в полный перебор таблицы."""
+    # Таблицы, которые читаются целиком намеренно: одна запись на сайт
+    ALLOWED_SCANS = {'users_aboutpage'}
+
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='boss', password='x', role='president', is_approved=True)
+        self.volunteer = User.objects.create_user(username='member', password='x', is_approved=True)
+        now = timezone.now()
+        for completed in (False, True):
+            Event.objects.create(
+                title='Акция', description='...', organizer=self.admin, is_approved=True,
+                is_completed=completed, start_time=now, end_time=now,
+            )
+        Notification.objects.create(recipient=self.volunteer, message='Привет')
+
+    def full_scans(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            details = [row[3] for row in cursor.fetchall()]
+        scans = {match.group(1) for match in map(re.compile(r'^SCAN (\S+)$').match, details) if match}
+        return scans - self.ALLOWED_SCANS
+
+    def assert_view_uses_indexes(self, user, url):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        for query in queries.captured_queries:
+            if query['sql'].startswith('SELECT'):
+                self.assertFalse(self.full_scans(query['sql']), f"{url}: {query['sql']}")
+
+    def test_hot_views(self):
+        for user, name in (
+            (self.volunteer, 'home'), (self.volunteer, 'event_list'), (self.admin, 'event_list'),
+            (self.volunteer, 'volunteer_list'), (self.admin, 'audit_log'),
+        ):
+            self.assert_view_uses_indexes(user, reverse(name))
+        self.assert_view_uses_indexes(self.admin, reverse('audit_log') + f'?actor={self.admin.pk}')
+
+    def test_moderation_queue_count(self):
+        sql, params = User.objects.filter(is_approved=False).values('pk').query.sql_with_params()
+        self.assertFalse(self.full_scans(f'SELECT COUNT(*) FROM ({sql})', params))
+
+    def test_unread_notifications(self):
+        request = RequestFactory().get('/')
+        request.user = self.volunteer
+        unread = notifications_processor(request)['unread_notifications']
+        sql, params = unread.query.sql_with_params()
+        self.assertFalse(self.full_scans(sql, params))
+
+
+# Потолок запросов на один GET каждой страницы (пользователь — президент,
+# на странице по шесть волонтеров, героев, участников). N+1 на любом списке
+# сразу выводит страницу за бюджет. Новый URL без бюджета роняет тест.
+QUERY_BUDGETS = {
+    'home': 6, 'about_page': 3, 'administration_page': 5,
+    'volunteer_list': 7, 'volunteer_search': 2,
+    'signup': 3, 'login': 3, 'logout': 5,
+    'my_profile': 5, 'profile_edit': 3, 'public_profile': 6, 'admin_edit_user': 4,
+    'moderator_dashboard': 5, 'admin_dashboard': 4, 'user_management': 4,
+    'approve_user': 3, 'reject_user': 4, 'update_user_role': 3, 'toggle_active_volunteer': 3,
+    'direction_management': 6, 'direction_create': 3, 'direction_delete': 4, 'assign_direction_leader': 3,
+    'school_management': 6, 'school_create': 3, 'school_delete': 4, 'assign_school_leader': 3,
+    'about_page_edit': 7, 'audit_log': 5, 'slow_query_log': 4,
+    'notifications': 4, 'mark_notification_as_read': 8,
+    'event_list': 6, 'event_create': 3, 'event_detail': 8, 'event_participants': 4, 'event_edit': 5,
+    'event_join': 4, 'event_finish': 5, 'event_report_edit': 11,
+    'event_photo_batch_status': 4, 'event_photo_delete': 6, 'event_delete': 5,
+}
+# Ответ на GET, если это не 200: действия (обычно POST) на GET отвечают редиректом,
+# регистрация уводит вошедшего пользователя
+EXPECTED_STATUS = {
+    name: 302 for name in (
+        'signup', 'logout', 'approve_user', 'reject_user', 'update_user_role', 'toggle_active_volunteer',
+        'direction_create', 'direction_delete', 'assign_direction_leader',
+        'school_create', 'school_delete', 'assign_school_leader', 'mark_notification_as_read',
+        'event_join', 'event_finish', 'event_photo_delete', 'event_delete',
+    )
+}
+
+
+class QueryBudgetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='boss', password='x', role='president', is_approved=True)
+        volunteers = [
+            User.objects.create_user(username=f'v{i}', password='x', is_approved=True, last_name=f'L{i}')
+            for i in range(6)
+        ]
+        cls.direction = Direction.objects.create(name='Донорство')
+        cls.direction.leaders.add(*volunteers[:3])
+        cls.school = School.objects.create(name='Школа')
+        cls.school.leaders.add(*volunteers[:3])
+        now = timezone.now()
+        cls.event = Event.objects.create(
+            title='Акция', description='d', organizer=cls.admin, is_approved=True, start_time=now, end_time=now,
+        )
+        for user in volunteers:
+            EventHero.objects.create(event=cls.event, user=user, role_name='Волонтер')
+        cls.event.participants.add(*volunteers)
+        cls.photo = EventPhoto.objects.create(event=cls.event, image='event_gallery/x.jpg')
+        cls.batch = PhotoUploadBatch.objects.create(event=cls.event, total=1)
+        cls.notification = Notification.objects.create(recipient=cls.admin, message='m', link='/')
+        cls.volunteer = volunteers[0]
+
+    def _kwargs(self, pattern):
+        kwargs = {}
+        if 'pk' in pattern.pattern.converters:
+            kwargs['pk'] = {
+                'event': self.event.pk, 'mark_notification_as_read': self.notification.pk,
+                'event_photo_delete': self.photo.pk,
+                'direction_delete': self.direction.pk, 'assign_direction_leader': self.direction.pk,
+                'school_delete': self.school.pk, 'assign_school_leader': self.school.pk,
+            }.get(pattern.name, self.event.pk if pattern.name.startswith('event_') else self.volunteer.pk)
+        if 'batch_id' in pattern.pattern.converters:
+            kwargs['batch_id'] = self.batch.pk
+        return kwargs
+
+    def test_every_url_fits_its_budget(self):
+        for urlconf in (users_urls, events_urls):
+            for pattern in urlconf.urlpatterns:
+                if not isinstance(pattern, URLPattern):
+                    continue
+                with self.subTest(url=pattern.name):
+                    self.assertIn(pattern.name, QUERY_BUDGETS, "добавьте бюджет запросов для нового URL")
+                    cache.clear()
+                    self.client.force_login(self.admin)
+                    url = reverse(pattern.name, kwargs=self._kwargs(pattern))
+                    with CaptureQueriesContext(connection) as queries:
+                        response = self.client.get(url)
+                    # Иначе бюджет "выполняется" и страницей с ошибкой или редиректом на вход
+                    self.assertEqual(response.status_code, EXPECTED_STATUS.get(pattern.name, 200), url)
+                    self.assertLessEqual(len(queries), QUERY_BUDGETS[pattern.name], url)
+
+    def test_recorder_reports_repeated_query_and_its_origin(self):
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for user in User.objects.all():
+                user.school_leader_of.exists()
+        [(shape, count, origins)] = recorder.repeated(3)
+        self.assertEqual(count, 7)
+        self.assertIn('users_user_school_leader_of', shape)
+        # Источник — строка этого теста, а не код Django
+        [origin] = origins
+        self.assertTrue(origin.startswith('core/tests.py:'), origin)
+
+    def test_sql_shape_ignores_values(self):
+        self.assertEqual(
+            sql_shape("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            sql_shape("SELECT * FROM t WHERE id IN (%s) AND name = 'y' LIMIT 1"),
+        )
+
+
+class SeedAndBenchTests(TestCase):
+    def test_seed_is_reproducible_and_bench_covers_every_url(self):
+        sizes = ['--users', '30', '--events', '10', '--notifications', '50', '--audit', '50', '--seed', '7']
+        call_command('seed_data', *sizes, stdout=StringIO())
+        names = list(User.objects.order_by('pk').values_list('last_name', flat=True))
+        self.assertEqual(len(names), 30)
+        self.assertEqual(Notification.objects.count(), 50)
+
+        output = StringIO()
+        call_command('bench_urls', '--iterations', '2', stdout=output, stderr=StringIO())
+        report = json.loads(output.getvalue())
+        self.assertEqual(set(report['urls']) | set(report['skipped']), set(QUERY_BUDGETS))
+        self.assertEqual(report['urls']['home']['status'], [200])
+        self.assertLessEqual(report['urls']['home']['p50_ms'], report['urls']['home']['p99_ms'])
+
+        # Тот же seed — те же данные
+        User.objects.all().delete()
+        Direction.objects.all().delete()
+        School.objects.all().delete()
+        call_command('seed_data', *sizes, stdout=StringIO())
+        self.assertEqual(list(User.objects.order_by('pk').values_list('last_name', flat=True)), names)
+
+
+@override_settings(SERVER_TIMING_SAMPLE_RATE=1.0)
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='t', password='x', is_approved=True, is_staff=True)
+        self.client.force_login(self.user)
+
+    def test_header_and_log_line_split_request_time(self):
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            response = self.client.get(reverse('notifications'))
+        metrics = dict(part.split(';', 1)[0:2] for part in response['Server-Timing'].split(', '))
+        self.assertEqual(set(metrics), {'total', 'db', 'tpl', 'cp'})
+        self.assertRegex(metrics['db'], r'^dur=[\d.]+;desc="\d+ queries"$')
+
+        [record] = logs.records
+        self.assertEqual(record.url_name, 'notifications')
+        self.assertGreater(record.timings['queries'], 0)
+        self.assertGreater(record.timings['template_ms'], 0)
+        self.assertLessEqual(record.timings['processors_ms'], record.timings['template_ms'])
+        self.assertLessEqual(record.timings['template_ms'], record.timings['total_ms'])
+
+    def test_header_is_only_for_staff(self):
+        self.client.force_login(User.objects.create_user(username='member', password='x', is_approved=True))
+        with self.assertLogs('core.timing', 'INFO'):
+            response = self.client.get(reverse('notifications'))
+        self.assertNotIn('Server-Timing', response)
+        with self.settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.client.get(reverse('notifications')))
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request_has_no_header(self):
+        response = self.client.get(reverse('notifications'))
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
+
+
+def _increment_in_child(amount):
+    metrics.inc('aya_cache_requests_total', amount, cache='page', result='hit')
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        # Свой каталог на тест: файлы метрик прошлых тестов не должны попасть в выборку
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.settings_override = override_settings(METRICS_DIR=directory, METRICS_TOKEN='secret')
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        cache.clear()
+
+    def scrape(self, **headers):
+        headers.setdefault('authorization', 'Bearer secret')
+        response = self.client.get(reverse('metrics'), headers=headers)
+        return response, response.content.decode()
+
+    def test_latency_histogram_and_business_gauges(self):
+        pending = User.objects.create_user(username='pending', password='x')
+        notify([pending.pk], "Профиль на модерации")
+        self.client.get(reverse('home'))
+        self.client.get(reverse('home'))
+
+        response, text = self.scrape()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('# TYPE aya_http_request_duration_seconds histogram', text)
+        self.assertIn('aya_http_request_duration_seconds_bucket{url_name="home",le="+Inf"} 2', text)
+        self.assertIn('aya_http_request_duration_seconds_count{url_name="home"} 2', text)
+        self.assertIn('aya_moderation_queue 1', text)
+        self.assertIn('aya_unread_notifications 1', text)
+        # Гость: первая главная — промах кэша страницы, вторая — попадание
+        self.assertIn('aya_cache_requests_total{cache="page",result="hit"} 1', text)
+        self.assertIn('aya_cache_hit_ratio{cache="page"} 0.5', text)
+
+    @unittest.skipUnless('fork' in multiprocessing.get_all_start_methods(), "нужен fork (нет в Windows)")
+    def test_counters_from_several_processes_are_summed(self):
+        metrics.inc('aya_cache_requests_total', 2, cache='page', result='hit')
+        context = multiprocessing.get_context('fork')
+        for amount in (3, 5):
+            child = context.Process(target=_increment_in_child, args=(amount,))
+            child.start()
+            child.join()
+            self.assertEqual(child.exitcode, 0)
+
+        self.assertEqual(len(os.listdir(settings.METRICS_DIR)), 3)
+        _response, text = self.scrape()
+        self.assertIn('aya_cache_requests_total{cache="page",result="hit"} 10', text)
+        # Файлы завершившихся процессов сложены в один и больше не считаются отдельно
+        files = {name for name in os.listdir(settings.METRICS_DIR) if name.endswith('.metrics')}
+        self.assertEqual(files, {f'{os.getpid()}.metrics', metrics.DEAD_FILE})
+        _response, text = self.scrape()
+        self.assertIn('aya_cache_requests_total{cache="page",result="hit"} 10', text)
+
+    def test_reservations_are_counted(self):
+        user = User.objects.create_user(username='v', password='x', is_approved=True)
+        now = timezone.now()
+        event = Event.objects.create(title='E', description='d', organizer=user, is_approved=True, start_time=now, end_time=now)
+        self.client.force_login(user)
+        self.client.post(reverse('event_join', args=[event.pk]), {'action': 'join'})
+
+        _response, text = self.scrape()
+        self.assertIn('aya_event_reservations_total{action="join",result="joined"} 1', text)
+
+    def test_token_is_required(self):
+        self.assertEqual(self.scrape(authorization='')[0].status_code, 401)
+        self.assertEqual(self.scrape(authorization='Bearer wrong')[0].status_code, 401)
+        # Без токена метрики отдаются только при разработке
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(self.scrape(authorization='')[0].status_code, 403)
+            with override_settings(DEBUG=True):
+                self.assertEqual(self.scrape(authorization='')[0].status_code, 200)
+
+
+def _slow_view(request):
+    time.sleep(0.05)
+    return HttpResponse('ok')
+
+
+@override_settings(SLOW_REQUEST_PROFILER=True, SLOW_REQUEST_THRESHOLD_MS=30, SLOW_REQUEST_SAMPLE_INTERVAL_MS=1)
+class SlowRequestProfilerTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.settings_override = override_settings(SLOW_REQUEST_PROFILE_DIR=self.directory, SLOW_REQUEST_PROFILE_KEEP=2)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+
+    def request(self, view=_slow_view):
+        request = RequestFactory().get('/volunteers/')
+        request.resolver_match = resolve('/volunteers/')
+        return SlowRequestProfilerMiddleware(view)(request)
+
+    def test_only_slow_requests_are_saved_and_old_files_rotated(self):
+        self.request(lambda request: HttpResponse('fast'))
+        self.assertEqual(os.listdir(self.directory), [])
+
+        for _ in range(3):
+            self.request()
+        profiles = list(load_profiles(self.directory))
+        self.assertEqual(len(profiles), 2)
+        self.assertEqual(profiles[0]['url_name'], 'volunteer_list')
+        self.assertGreaterEqual(profiles[0]['duration_ms'], 50)
+
+    def test_report_ranks_hot_functions_per_url(self):
+        self.request()
+        output = StringIO()
+        call_command('profile_report', '--json', stdout=output)
+        report = json.loads(output.getvalue())['volunteer_list']
+        self.assertEqual(report['requests'], 1)
+        top = report['functions'][0]
+        self.assertEqual(top['function'], 'core/tests.py:_slow_view')
+        self.assertGreater(top['self_pct'], 50)
+
+    @override_settings(SLOW_REQUEST_PROFILER=False)
+    def test_disabled_by_default(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            SlowRequestProfilerMiddleware(_slow_view)
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='boss', password='x', role='president', is_approved=True)
+        self.client.force_login(self.admin)
+
+    def test_queries_are_logged_with_view_origin_and_plan(self):
+        self.client.get(reverse('volunteer_list'), {'query': 'Ива'})
+        log = slow_queries.entries()
+        # Поиск действительно выполнялся (параметр поиска списка — query, а не q)
+        self.assertTrue(any('users_usersearch' in entry['sql'] for entry in log))
+        volunteers = [
+            entry for entry in log
+            if entry['url_name'] == 'volunteer_list' and 'FROM "users_user"' in entry['sql']
+        ]
+        self.assertTrue(volunteers)
+        entry = volunteers[0]
+        self.assertTrue(entry['origin'].startswith('users/'), entry['origin'])
+        self.assertRegex(entry['plan'], r'SCAN|SEARCH')
+
+    @override_settings(SLOW_QUERY_LOG_SIZE=3)
+    def test_ring_buffer_keeps_only_latest_entries(self):
+        for number in range(5):
+            slow_queries.record(f'SELECT {number}', (), 0.2, 'home', 'x.py:1')
+        self.assertEqual([entry['sql'] for entry in slow_queries.entries()], ['SELECT 4', 'SELECT 3', 'SELECT 2'])
+
+    def test_top_offenders_are_grouped_by_shape_and_total_time(self):
+        slow_queries.clear()
+        slow_queries.record('SELECT * FROM users_user WHERE id = 1', (), 0.2, 'home', 'a.py:1')
+        slow_queries.record('SELECT * FROM users_user WHERE id = 2', (), 0.3, 'home', 'a.py:1')
+        slow_queries.record('SELECT * FROM events_event', (), 0.4, 'event_list', 'b.py:1')
+        [first, second] = slow_queries.top_offenders(slow_queries.entries())
+        self.assertEqual((first['count'], first['total_ms'], first['max_ms']), (2, 500.0, 300.0))
+        self.assertEqual(second['url_names'], [('event_list', 1)])
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=100_000)
+    def test_page_is_admin_only(self):
+        slow_queries.record('SELECT * FROM events_event', (), 0.4, 'event_list', 'b.py:1')
+        response = self.client.get(reverse('slow_query_log'))
+        self.assertContains(response, 'SELECT * FROM events_event')
+        self.assertContains(response, 'b.py:1')
+
+        volunteer = User.objects.create_user(username='v', password='x', is_approved=True)
+        self.client.force_login(volunteer)
+        self.assertRedirects(self.client.get(reverse('slow_query_log')), reverse('home'), fetch_redirect_response=False)
@@ -0,0 +1,145 @@
+# core/timing.py
+"""
+Замер времени запроса по частям: БД, шаблоны, контекст-процессоры.
+
+TimingMiddleware для доли запросов (SERVER_TIMING_SAMPLE_RATE) собирает:
+    total — весь запрос (middleware и view);
+    db    — время и число SQL-запросов;
+    tpl   — рендер шаблонов (включая контекст-процессоры и ленивые запросы
+            из шаблона — эти же миллисекунды есть и в db);
+    cp    — контекст-процессоры (notifications_processor и др.).
+Результат уходит строкой в лог core.timing вместе с именем URL, а
+сотрудникам (is_staff) и при DEBUG — еще и в заголовок Server-Timing
+(виден во вкладке Network браузера).
+
+Шаблоны и контекст-процессоры замеряет бэкенд TimedDjangoTemplates
+(TEMPLATES в settings.py). В запросах вне выборки он только проверяет
+contextvar, поэтому middleware можно держать включенным на сервере.
+"""
+import contextvars
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_timings', default=None)
+
+
+class Timings:
+    __slots__ = ('db', 'queries', 'template', 'processors', '_rendering')
+
+    def __init__(self):
+        self.db = self.template = self.processors = 0.0
+        self.queries = 0
+        self._rendering = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+
+# --- ШАБЛОНЫ ---
+def _timed_processor(processor):
+    def wrapper(request):
+        timings = _current.get()
+        if timings is None:
+            return processor(request)
+        started = time.perf_counter()
+        try:
+            return processor(request)
+        finally:
+            timings.processors += time.perf_counter() - started
+    return wrapper
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        # render_to_string внутри рендера уже учтен внешним шаблоном
+        if timings is None or timings._rendering:
+            return super().render(context, request)
+        timings._rendering += 1
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            timings._rendering -= 1
+            timings.template += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Обычный бэкенд Django, который отдает время рендера в TimingMiddleware."""
+
+    def __init__(self, params):
+        super().__init__(params)
+        engine = self.engine
+        engine.template_context_processors = tuple(
+            _timed_processor(processor) for processor in engine.template_context_processors
+        )
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+# --- MIDDLEWARE ---
+def _ms(seconds):
+    return round(seconds * 1000, 1)
+
+
+def _is_staff(request):
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_staff
+
+
+class TimingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timings = Timings()
+        token = _current.set(timings)
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(timings):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        total = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.view_name if match else None) or '-'
+        # Разбивка времени выдает устройство сайта — заголовок только своим
+        if settings.DEBUG or _is_staff(request):
+            response['Server-Timing'] = ', '.join([
+                f'total;dur={_ms(total)}',
+                f'db;dur={_ms(timings.db)};desc="{timings.queries} queries"',
+                f'tpl;dur={_ms(timings.template)}',
+                f'cp;dur={_ms(timings.processors)}',
+            ])
+        logger.info(
+            "url=%s status=%s total_ms=%s db_ms=%s queries=%s template_ms=%s processors_ms=%s",
+            url_name, response.status_code, _ms(total), _ms(timings.db), timings.queries,
+            _ms(timings.template), _ms(timings.processors),
+            extra={'url_name': url_name, 'timings': {
+                'total_ms': _ms(total), 'db_ms': _ms(timings.db), 'queries': timings.queries,
+                'template_ms': _ms(timings.template), 'processors_ms': _ms(timings.processors),
+            }},
+        )
+        return response
+
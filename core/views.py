@@ -1,3 +1,31 @@
-from django.shortcuts import render
+import hmac
 
-# Create your views here.
+from django.conf import settings
+from django.db.models import Sum
+from django.http import HttpResponse
+
+from users.models import User
+
+from . import metrics
+
+
+def metrics_view(request):
+    """Метрики в текстовом формате Prometheus (см. core/metrics.py)."""
+    if settings.METRICS_TOKEN:
+        expected = f'Bearer {settings.METRICS_TOKEN}'
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), expected):
+            return HttpResponse(status=401)
+    elif not settings.DEBUG:
+        # Без токена метрики открыты всем — на сервере так не отдаем
+        return HttpResponse("Задайте AYA_METRICS_TOKEN.", status=403, content_type='text/plain; charset=utf-8')
+
+    totals = metrics.collect()
+    unread = User.objects.aggregate(total=Sum('unread_notifications_count'))['total'] or 0
+    gauges = [
+        # Частичный индекс users_user_pending
+        ('aya_moderation_queue', "Профили, ожидающие модерации",
+         [((), User.objects.filter(is_approved=False).count())]),
+        ('aya_unread_notifications', "Непрочитанные уведомления", [((), unread)]),
+        ('aya_cache_hit_ratio', "Доля попаданий в кэш с запуска", metrics.cache_hit_ratios(totals)),
+    ]
+    return HttpResponse(metrics.render(totals, gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,178 @@
+# events/fragments.py
+"""
+Кэш фрагментов списка мероприятий.
+
+Каждая карточка кэшируется в шаблоне ({% cache %}) по ключу
+(id мероприятия, версия, класс зрителя). Версия хранится в кэше и меняется
+при любом изменении мероприятия: сигналы post_save / post_delete у Event и
+EventPhoto, изменения списка участников (см. events/signals.py и
+events/reservations.py). Старые фрагменты никто не удаляет — на них просто
+больше не ссылаются, и кэш вытесняет их сам.
+
+Версия — не счетчик, а отметка времени: если кэш потеряет ключ версии,
+новая не совпадет ни с одной старой, и устаревшая карточка не всплывет.
+
+Архив разбит на годы. Блок года рендерится и кэшируется целиком, у
+каждого года своя версия — ее меняет сохранение или удаление любого
+мероприятия, которое заканчивается (или заканчивалось до правки) в этом
+году. Блоки, которых нет в кэше, собираются вместе: мероприятия всех таких
+лет загружаются одним запросом.
+"""
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractYear
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from .models import Event
+
+# Классы зрителей: от них зависит, что видно в карточках
+ANONYMOUS = 'anonymous'
+VOLUNTEER = 'volunteer'
+MANAGER = 'manager'
+
+MANAGER_ROLES = ('moderator', 'president', 'worker', 'head_admin')
+
+
+def viewer_class(user):
+    if not user.is_authenticated:
+        return ANONYMOUS
+    if user.is_superuser or user.role in MANAGER_ROLES:
+        return MANAGER
+    return VOLUNTEER
+
+
+def _version_key(event_id):
+    return f'events:card-version:{event_id}'
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def _year_version_key(year):
+    return f'events:year-version:{year}'
+
+
+def _get_versions(keys):
+    """{ключ версии: объект} -> {объект: версия} одним обращением к кэшу; недостающие создаются."""
+    found = cache.get_many(keys)
+    versions = {keys[key]: value for key, value in found.items()}
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update({keys[key]: value for key, value in missing.items()})
+    return versions
+
+
+def get_versions(event_ids):
+    """Версии карточек одним обращением к кэшу; недостающие создаются."""
+    return _get_versions({_version_key(pk): pk for pk in event_ids})
+
+
+def get_year_versions(years):
+    return _get_versions({_year_version_key(year): year for year in years})
+
+
+def invalidate_event(event_id):
+    cache.set(_version_key(event_id), _new_version(), timeout=None)
+
+
+def invalidate_years(years):
+    cache.set_many({_year_version_key(year): _new_version() for year in years}, timeout=None)
+
+
+def invalidate_on_commit(event_id):
+    # Внутри транзакции — после коммита, иначе параллельный запрос успеет
+    # закэшировать карточку со старыми данными под новой версией
+    transaction.on_commit(lambda: invalidate_event(event_id))
+
+
+# --- ДАННЫЕ ДЛЯ СПИСКА ---
+def upcoming_cards():
+    upcoming = Event.objects.filter(is_approved=True, is_completed=False).order_by('start_time')
+    # Сначала версии, потом данные: если мероприятие изменится между ними,
+    # старые данные не попадут в кэш под новой версией
+    versions = get_versions(upcoming.values_list('pk', flat=True))
+    events = list(upcoming)
+    new = get_versions([event.pk for event in events if event.pk not in versions])
+    for event in events:
+        event.card_version = versions.get(event.pk) or new[event.pk]
+    return events
+
+
+def _visible_past(user, viewer):
+    past = Event.objects.filter(is_completed=True)
+    if viewer == MANAGER:
+        return past
+    # Черновик отчета видят только руководители и сам организатор
+    visible = Q(is_report_published=True)
+    if viewer == VOLUNTEER:
+        visible |= Q(organizer_id=user.pk)
+    return past.filter(visible)
+
+
+def _archive_years(past, user, viewer):
+    """
+    [(год, аудитория), ...], новые сверху. Аудитория — часть ключа блока:
+    класс зрителя, а у волонтера с собственными черновиками в этом году — он сам.
+    """
+    rows = past.annotate(year=ExtractYear('end_time')).values('year')
+    if viewer == VOLUNTEER:
+        rows = rows.annotate(own_drafts=Count('pk', filter=Q(organizer_id=user.pk, is_report_published=False)))
+    return [
+        (row['year'], f'{viewer}:{user.pk}' if row.get('own_drafts') else viewer)
+        for row in rows.order_by('-year').distinct()
+    ]
+
+
+def _year_block_key(year, version, audience):
+    return f'events:year:{year}:{version}:{audience}'
+
+
+def past_years(user, viewer):
+    """
+    Архив по годам (новые сверху): [{'year', 'html'}, ...].
+    Блоки берутся из кэша одним get_many; недостающие годы загружаются одним запросом.
+    """
+    past = _visible_past(user, viewer)
+    years = _archive_years(past, user, viewer)
+    # Сначала версии, потом данные (как в upcoming_cards)
+    versions = get_year_versions([year for year, _audience in years])
+    keys = {year: _year_block_key(year, versions[year], audience) for year, audience in years}
+    blocks = cache.get_many(keys.values())
+    missing = [year for year in keys if keys[year] not in blocks]
+    if missing:
+        events = defaultdict(list)
+        for event in past.filter(end_time__year__in=missing).order_by('-end_time'):
+            events[timezone.localtime(event.end_time).year].append(event)
+        rendered = {
+            keys[year]: render_to_string('events/past_year.html', {'events': events[year]})
+            for year in missing
+        }
+        cache.set_many(rendered, settings.EVENT_CARD_CACHE_TIMEOUT)
+        blocks.update(rendered)
+    return [{'year': year, 'html': mark_safe(blocks[keys[year]])} for year in keys]
+
+
+# --- ОБРАБОТЧИКИ СИГНАЛОВ ---
+def _archive_years_of(event):
+    """Годы архива, в которых мероприятие есть сейчас или было до правки."""
+    moments = [event.end_time, getattr(event, '_loaded_values', {}).get('end_time')]
+    return {timezone.localtime(moment).year for moment in moments if moment}
+
+
+def event_changed(sender, instance, **kwargs):
+    invalidate_on_commit(instance.pk)
+    years = _archive_years_of(instance)
+    transaction.on_commit(lambda: invalidate_years(years))
+
+
+def photo_changed(sender, instance, **kwargs):
+    invalidate_on_commit(instance.event_id)
@@ -0,0 +1,218 @@
+# events/gallery.py
+"""
+Массовая загрузка фотографий в отчет о мероприятии.
+
+Запрос только складывает файлы на диск (SpoolUploadHandler пишет их в
+папку по мере получения, не держа в памяти) и создает PhotoUploadBatch.
+Поворот по EXIF, уменьшение, удаление метаданных, миниатюры и вставка
+EventPhoto пачками идут в фоновой задаче process_photo_batch; страница
+отчета опрашивает прогресс пачки.
+"""
+import logging
+import multiprocessing
+import os
+import shutil
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+from django.db.models import F
+from django.utils import timezone
+
+from core.images import store_variants, try_prepare_upload
+from core.tasks import enqueue, task
+
+from . import fragments
+from .models import EventPhoto, PhotoUploadBatch
+
+logger = logging.getLogger(__name__)
+
+
+def batch_dir(batch_id):
+    return os.path.join(settings.PHOTO_UPLOAD_SPOOL_DIR, str(batch_id))
+
+
+# --- ПРИЕМ ФАЙЛОВ ---
+class SpooledUploadedFile(UploadedFile):
+    """Загруженный файл, который уже лежит в папке временной загрузки."""
+
+    def __init__(self, path, name, content_type, size, charset, content_type_extra=None):
+        # Файл не открываем: за один запрос их может прийти несколько сотен
+        super().__init__(None, name, content_type, size, charset, content_type_extra)
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+    def open(self, mode='rb'):
+        self.file = open(self.path, mode)
+        return self
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+class SpoolUploadHandler(FileUploadHandler):
+    """
+    Пишет файлы поля field_name сразу на диск, в отдельную папку запроса.
+    Остальные поля формы разбирают стандартные обработчики Django.
+    """
+
+    def __init__(self, request=None, field_name='photos'):
+        super().__init__(request)
+        self.field_name = field_name
+        self.directory = os.path.join(settings.PHOTO_UPLOAD_SPOOL_DIR, f'incoming-{uuid.uuid4().hex}')
+        self.destination = None
+        self.count = 0
+
+    def new_file(self, field_name, file_name, *args, **kwargs):
+        super().new_file(field_name, file_name, *args, **kwargs)
+        self.destination = None
+        if field_name != self.field_name:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self.count += 1
+        # Номер впереди сохраняет порядок и не дает одинаковым именам затереть друг друга
+        self.path = os.path.join(self.directory, f'{self.count:04d}_{self.file_name}')
+        self.destination = open(self.path, 'wb')
+        raise StopFutureHandlers()
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.destination is None:
+            return raw_data
+        self.destination.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if self.destination is None:
+            return None
+        self.destination.close()
+        self.destination = None
+        return SpooledUploadedFile(
+            self.path, self.file_name, self.content_type, file_size, self.charset, self.content_type_extra
+        )
+
+    def upload_interrupted(self):
+        if self.destination is not None:
+            self.destination.close()
+        self.cleanup()
+
+    def cleanup(self):
+        """Удаляет то, что не забрала ни одна пачка (форма не прошла проверку и т.п.)."""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def start_photo_batch(event, user, files):
+    """
+    Переносит загруженные файлы в папку новой пачки и ставит ее обработку в очередь.
+    Имя файла в папке ('0001_<метка пачки>_IMG.jpg') уникально и определяет
+    имя фото в хранилище (см. _photo_name).
+    """
+    batch = PhotoUploadBatch.objects.create(event=event, uploaded_by=user, total=len(files))
+    directory = batch_dir(batch.pk)
+    os.makedirs(directory, exist_ok=True)
+    label = uuid.uuid4().hex[:12]
+    for number, upload in enumerate(files, start=1):
+        target = os.path.join(directory, f'{number:04d}_{label}_{os.path.basename(upload.name)}')
+        if isinstance(upload, SpooledUploadedFile):
+            # Та же файловая система — переименование, без копирования
+            os.replace(upload.temporary_file_path(), target)
+            continue
+        with open(target, 'wb') as output:
+            for chunk in upload.chunks():
+                output.write(chunk)
+    enqueue(process_photo_batch, batch.pk)
+    return batch
+
+
+# --- ОБРАБОТКА ---
+def _prepare_all(paths):
+    """Готовит фото пулом процессов; результаты отдаются по мере готовности, в порядке paths."""
+    prepare = partial(try_prepare_upload, max_size=settings.PHOTO_UPLOAD_MAX_SIZE)
+    workers = settings.PHOTO_UPLOAD_WORKERS
+    if workers <= 0 or len(paths) < 2:
+        yield from map(prepare, paths)
+        return
+    # spawn, а не fork: задача может выполняться в потоке веб-сервера.
+    # Рабочая функция из core.images не трогает модели, django.setup() не нужен.
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths)), mp_context=context) as pool:
+        yield from pool.map(prepare, paths)
+
+
+def _photo_name(path):
+    """
+    Имя фото в хранилище зависит только от файла в папке пачки
+    ('0001_<метка>_IMG.png' -> 'event_gallery/0001_<метка>_IMG.jpg'). Повтор
+    задачи после сбоя перезапишет тот же файл, а не оставит рядом сироту с суффиксом.
+    """
+    stem, _ext = os.path.splitext(os.path.basename(path))
+    # Фото перекодируется в JPEG
+    return EventPhoto._meta.get_field('image').generate_filename(None, f'{stem}.jpg')
+
+
+def _flush(batch, photos, paths):
+    if not photos:
+        return
+    EventPhoto.objects.bulk_create(photos)
+    # bulk_create не шлет post_save — сбрасываем кэш карточки сами
+    fragments.invalidate_event(batch.event_id)
+    PhotoUploadBatch.objects.filter(pk=batch.pk).update(processed=F('processed') + len(photos))
+    # Уже добавленные файлы убираем сразу: при повторе задача их не продублирует
+    for path in paths:
+        os.remove(path)
+    photos.clear()
+    paths.clear()
+
+
+@task
+def process_photo_batch(batch_id):
+    batch = PhotoUploadBatch.objects.filter(pk=batch_id).first()
+    if batch is None or batch.status == PhotoUploadBatch.DONE:
+        return
+    directory = batch_dir(batch.pk)
+    names = sorted(os.listdir(directory)) if os.path.isdir(directory) else []
+    PhotoUploadBatch.objects.filter(pk=batch.pk).update(status=PhotoUploadBatch.PROCESSING)
+
+    photo_names = {os.path.join(directory, name): _photo_name(name) for name in names}
+    # Сбой между вставкой фото и удалением их файлов из папки: такие уже в отчете
+    stored = set(EventPhoto.objects.filter(
+        event_id=batch.event_id, image__in=photo_names.values(),
+    ).values_list('image', flat=True))
+    for path, name in photo_names.items():
+        if name in stored:
+            os.remove(path)
+    paths = [path for path, name in photo_names.items() if name not in stored]
+
+    photos, done_paths = [], []
+    try:
+        for path, prepared, error in _prepare_all(paths):
+            if error:
+                logger.warning("Фото %s из пачки #%s не обработано: %s", path, batch.pk, error)
+                PhotoUploadBatch.objects.filter(pk=batch.pk).update(failed=F('failed') + 1)
+                os.remove(path)
+                continue
+            data, variants = prepared
+            name = photo_names[path]
+            if default_storage.exists(name):
+                default_storage.delete(name)  # остался от прерванного запуска
+            default_storage.save(name, ContentFile(data))
+            # Варианты уже готовы, поэтому сигнал их генерации не нужен (а bulk_create его и не шлет)
+            store_variants(name, variants)
+            photos.append(EventPhoto(event_id=batch.event_id, image=name))
+            done_paths.append(path)
+            if len(photos) >= settings.PHOTO_UPLOAD_BATCH_SIZE:
+                _flush(batch, photos, done_paths)
+        _flush(batch, photos, done_paths)
+    except Exception:
+        PhotoUploadBatch.objects.filter(pk=batch.pk).update(status=PhotoUploadBatch.FAILED)
+        raise
+
+    shutil.rmtree(directory, ignore_errors=True)
+    PhotoUploadBatch.objects.filter(pk=batch.pk).update(status=PhotoUploadBatch.DONE, finished_at=timezone.now())
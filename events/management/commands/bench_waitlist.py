@@ -0,0 +1,75 @@
+import os
+import statistics
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from events import reservations
+from events.models import Event, WaitlistEntry
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк листа ожидания: сколько стоит отмена записи с продвижением "
+        "первого в очереди при разной длине очереди. Работает на временной "
+        "файловой копии схемы SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='10,1000,20000', help="Длины очереди через запятую",
+        )
+        parser.add_argument('--repeat', type=int, default=200, help="Отмен на каждую длину очереди")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Бенчмарк рассчитан на SQLite.")
+        try:
+            sizes = [int(size) for size in options['sizes'].split(',')]
+        except ValueError:
+            raise CommandError("--sizes: ожидаются числа через запятую")
+        with tempfile.TemporaryDirectory() as directory:
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory, 'bench_waitlist.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                for size in sizes:
+                    self.run(size, options['repeat'])
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, size, repeat):
+        now = timezone.now()
+        # bulk_create — без сигналов (QR-коды, индексы), они здесь только мешают
+        User.objects.bulk_create(User(username=f'bench-{size}-{i}') for i in range(size + 1))
+        users = list(User.objects.filter(username__startswith=f'bench-{size}-').order_by('pk'))
+        event = Event.objects.create(
+            title=f"Очередь {size}", description='...', organizer=users[0],
+            start_time=now, end_time=now, is_approved=True, max_participants=1,
+        )
+        reservations.join_event(event, users[0])
+        WaitlistEntry.objects.bulk_create(WaitlistEntry(event=event, user=user) for user in users[1:])
+        by_pk = {user.pk: user for user in users}
+
+        participant, timings, queries = users[0], [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as captured:
+                reservations.leave_event(event, participant)
+            timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+            # Ушедший встает в конец очереди — длина очереди не меняется
+            reservations.join_waitlist(event, participant)
+            participant = by_pk[event.participants.values_list('pk', flat=True).get()]
+
+        if WaitlistEntry.objects.filter(event=event).count() != size:
+            raise CommandError("Длина очереди изменилась — продвижение работает неверно")
+        timings.sort()
+        self.stdout.write(
+            f"очередь {size:>6}: отмена с продвижением p50 {statistics.median(timings):.2f} мс, "
+            f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} мс; запросов: {max(queries)}"
+        )
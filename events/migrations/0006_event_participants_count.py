@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:15
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_participants_count(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Through = Event.participants.through
+    counts = Through.objects.order_by().values_list('event_id').annotate(n=Count('pk'))
+    for event_id, count in counts:
+        Event.objects.filter(pk=event_id).update(participants_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0005_photouploadbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='participants_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Записалось'),
+        ),
+        migrations.RunPython(fill_participants_count, migrations.RunPython.noop),
+    ]
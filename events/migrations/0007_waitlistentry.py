@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0006_event_participants_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist', to='events.event')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='event_waitlist', to=settings.AUTH_USER_MODEL, verbose_name='Волонтер')),
+            ],
+            options={
+                'verbose_name': 'Место в очереди',
+                'verbose_name_plural': 'Лист ожидания',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['event', 'id'], name='events_waitlist_event_id')],
+                'constraints': [models.UniqueConstraint(fields=('event', 'user'), name='unique_event_waitlist_user')],
+            },
+        ),
+    ]
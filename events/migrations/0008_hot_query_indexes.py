@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0007_waitlistentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_approved', True), ('is_completed', False)), fields=['start_time'], name='events_event_upcoming'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_completed', True)), fields=['end_time'], name='events_event_completed_end'),
+        ),
+    ]
@@ -18,6 +18,8 @@ class Event(models.Model):
     
     max_participants = models.PositiveIntegerField(null=True, blank=True, verbose_name="Макс. участников")
     participants = models.ManyToManyField(User, related_name="attending_events", blank=True, verbose_name="Участники")
+    # Сколько мест занято; меняется условным UPDATE в events/reservations.py
+    participants_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Записалось")
 
     # Отчет
     report_text = models.TextField(blank=True, verbose_name="Текст отчета")
@@ -25,15 +27,95 @@ class Event(models.Model):
 
     class Meta:
         ordering = ['-start_time']
+        # Частичные индексы: Django пишет filter(is_approved=True) как голое
+        # "is_approved", и по обычному составному индексу SQLite такой фильтр
+        # не ищет. Условие индекса совпадает с условием запроса — ищет.
+        indexes = [
+            # Предстоящие (главная, афиша) и архив (по дате окончания)
+            models.Index(
+                fields=['start_time'], condition=models.Q(is_approved=True, is_completed=False),
+                name='events_event_upcoming',
+            ),
+            models.Index(fields=['end_time'], condition=models.Q(is_completed=True), name='events_event_completed_end'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Как у User: сигналы сравнивают с загруженными значениями без лишнего SELECT
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def save(self, *args, **kwargs):
+        # Счетчик мест меняют только условные UPDATE (events/reservations.py).
+        # Объект, загруженный раньше чужой записи, не должен затереть его при
+        # правке, завершении или отчете — иначе лимит мест перестает работать
+        if not self._state.adding and not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'participants_count' and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
+        # Сигналы уже отработали: дальше "загруженные" значения — сохраненные
+        deferred = self.get_deferred_fields()
+        self._loaded_values = {
+            field.attname: getattr(self, field.attname)
+            for field in self._meta.concrete_fields if field.attname not in deferred
+        }
+
+    @property
+    def has_limit(self):
+        # Пустое значение или 0 — без ограничения
+        return bool(self.max_participants)
+
+    @property
+    def is_full(self):
+        return self.has_limit and self.participants_count >= self.max_participants
+
 class EventPhoto(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='photos')
     image = models.ImageField(upload_to='event_gallery/', verbose_name="Фото")
     caption = models.CharField(max_length=200, blank=True, verbose_name="Подпись")
 
+class PhotoUploadBatch(models.Model):
+    """Пачка фото, загруженных одним запросом и обрабатываемых в фоне (events/gallery.py)."""
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'В очереди'),
+        (PROCESSING, 'Обрабатывается'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='photo_batches')
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    total = models.PositiveIntegerField(default=0, verbose_name="Всего файлов")
+    processed = models.PositiveIntegerField(default=0, verbose_name="Добавлено")
+    failed = models.PositiveIntegerField(default=0, verbose_name="С ошибкой")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING, verbose_name="Статус")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    @property
+    def is_active(self):
+        return self.status in (self.PENDING, self.PROCESSING)
+
+    @property
+    def percent(self):
+        if not self.total:
+            return 100
+        return min(100, (self.processed + self.failed) * 100 // self.total)
+
 class EventVideo(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='videos')
     video_url = models.URLField(verbose_name="Ссылка на видео")
@@ -41,4 +123,23 @@ class EventVideo(models.Model):
 class EventHero(models.Model):
     event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='heroes')
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="Волонтер")
-    role_name = models.CharField(max_length=100, verbose_name="Роль")
\ No newline at end of file
+    role_name = models.CharField(max_length=100, verbose_name="Роль")
+class WaitlistEntry(models.Model):
+    """Место в очереди на заполненное мероприятие. Порядок — по id (кто раньше встал)."""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='waitlist')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='event_waitlist', verbose_name="Волонтер")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Место в очереди"
+        verbose_name_plural = "Лист ожидания"
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'user'], name='unique_event_waitlist_user'),
+        ]
+        indexes = [
+            # Голова очереди и номер в ней — поиск по индексу, без сортировки всей очереди
+            models.Index(fields=['event', 'id'], name='events_waitlist_event_id'),
+        ]
+
+    def __str__(self): return f"{self.user} -> {self.event}"
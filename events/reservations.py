@@ -0,0 +1,276 @@
+# events/reservations.py
+"""
+Запись на мероприятия с ограничением мест.
+
+Место занимается одним условным UPDATE счетчика Event.participants_count:
+"увеличить, если мероприятие открыто и счетчик меньше лимита". Проверка и
+захват места — одна операция в БД, поэтому два одновременных запроса не
+займут последнее место дважды. Строка участника вставляется в той же
+транзакции; если человек уже записан (уникальный ключ), место возвращается.
+Освободившееся при отмене место сразу получает первый из листа ожидания.
+
+SQLite при одновременной записи может ответить "database is locked" —
+такие транзакции повторяются со случайной паузой, пока не выйдет RETRY_TIMEOUT.
+"""
+import random
+import time
+
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+
+from users.notifications import notify
+
+from . import fragments
+from .models import Event, WaitlistEntry
+
+# Результаты записи / отмены
+JOINED = 'joined'
+ALREADY_JOINED = 'already_joined'
+FULL = 'full'
+CLOSED = 'closed'
+LEFT = 'left'
+NOT_JOINED = 'not_joined'
+WAITLISTED = 'waitlisted'
+ALREADY_WAITLISTED = 'already_waitlisted'
+LEFT_WAITLIST = 'left_waitlist'
+NOT_WAITLISTED = 'not_waitlisted'
+
+RETRY_TIMEOUT = 5  # секунд, как timeout у SQLite
+RETRY_MAX_DELAY = 0.05
+
+Participant = Event.participants.through
+
+
+def _with_retry(func):
+    # Общий кэш SQLite (и тестовая БД в памяти) отвечает "table is locked"
+    # сразу, не дожидаясь timeout, — поэтому ждем и повторяем сами
+    deadline = time.monotonic() + RETRY_TIMEOUT
+    attempt = 0
+    while True:
+        try:
+            return func()
+        except OperationalError as exc:
+            if 'locked' not in str(exc) or time.monotonic() >= deadline:
+                raise
+            attempt += 1
+            time.sleep(random.uniform(0, min(RETRY_MAX_DELAY, 0.002 * 2 ** attempt)))
+
+
+def _has_free_seat():
+    return Q(max_participants__isnull=True) | Q(max_participants=0) | Q(participants_count__lt=F('max_participants'))
+
+
+def is_participant(event, user):
+    """Проверка по уникальному индексу (event, user), без загрузки списка участников."""
+    return Participant.objects.filter(event_id=event.pk, user_id=user.pk).exists()
+
+
+def _claim_seat(event_id):
+    """Занимает место, если оно есть: проверка и увеличение счетчика — один UPDATE."""
+    claimed = (
+        Event.objects.filter(pk=event_id, is_completed=False).filter(_has_free_seat())
+        .update(participants_count=F('participants_count') + 1)
+    )
+    if claimed:
+        fragments.invalidate_on_commit(event_id)
+    return bool(claimed)
+
+
+def _release_seat(event_id):
+    Event.objects.filter(pk=event_id, participants_count__gt=0).update(participants_count=F('participants_count') - 1)
+    fragments.invalidate_on_commit(event_id)
+
+
+def _add_participant(event_id, user_id):
+    """Вставляет строку участника; False, если он уже записан."""
+    try:
+        with transaction.atomic():
+            Participant.objects.create(event_id=event_id, user_id=user_id)
+    except IntegrityError:
+        return False
+    return True
+
+
+def _is_closed(event_id):
+    return Event.objects.filter(pk=event_id, is_completed=True).exists()
+
+
+def join_event(event, user):
+    """Записывает user на event, если есть место. Возвращает JOINED / ALREADY_JOINED / FULL / CLOSED."""
+    def attempt():
+        with transaction.atomic():
+            # Сначала запись (UPDATE): транзакция SQLite сразу берет блокировку
+            # на запись и не упрется в нее посередине
+            if not _claim_seat(event.pk):
+                if is_participant(event, user):
+                    return ALREADY_JOINED
+                return CLOSED if _is_closed(event.pk) else FULL
+            if not _add_participant(event.pk, user.pk):
+                # Уже записан — возвращаем место
+                _release_seat(event.pk)
+                return ALREADY_JOINED
+            WaitlistEntry.objects.filter(event_id=event.pk, user_id=user.pk).delete()
+            return JOINED
+    return _with_retry(attempt)
+
+
+def leave_event(event, user):
+    """
+    Отменяет запись user на event. Освободившееся место в той же транзакции
+    получает первый в очереди (см. _promote). Возвращает LEFT / NOT_JOINED / CLOSED.
+    """
+    def attempt():
+        with transaction.atomic():
+            deleted, _ = Participant.objects.filter(
+                event_id=event.pk, user_id=user.pk, event__is_completed=False
+            ).delete()
+            if not deleted:
+                return CLOSED if _is_closed(event.pk) else NOT_JOINED
+            _release_seat(event.pk)
+            _promote(event)
+            return LEFT
+    return _with_retry(attempt)
+
+
+# --- ЛИСТ ОЖИДАНИЯ ---
+# Очередь — строки WaitlistEntry, порядок по id. Голова очереди берется по
+# индексу (event, id), поэтому продвижение стоит одинаково при любой длине
+# очереди (проверка: manage.py bench_waitlist).
+def _promote(event):
+    """
+    Отдает свободное место первому в очереди. Вызывается внутри транзакции
+    отмены записи: место не может достаться кому-то в обход очереди, а две
+    одновременные отмены не продвинут одного и того же человека — строка
+    очереди удаляется условно, и проигравшая транзакция берет следующую.
+    Возвращает id записанного пользователя или None.
+    """
+    if not _claim_seat(event.pk):
+        return None
+    while True:
+        head = WaitlistEntry.objects.filter(event_id=event.pk).order_by('id').values_list('pk', 'user_id').first()
+        if head is None:
+            _release_seat(event.pk)
+            return None
+        entry_id, user_id = head
+        deleted, _ = WaitlistEntry.objects.filter(pk=entry_id).delete()
+        if deleted and _add_participant(event.pk, user_id):
+            break
+    # Уведомление создается в той же транзакции: нет записи без уведомления и наоборот
+    notify(
+        [user_id], f"Освободилось место — вы записаны на «{event.title}».",
+        link=reverse('event_detail', args=[event.pk]),
+    )
+    return user_id
+
+
+def join_waitlist(event, user):
+    """
+    Ставит user в конец очереди. Если место как раз есть, сразу записывает.
+    Возвращает WAITLISTED / ALREADY_WAITLISTED / JOINED / ALREADY_JOINED / CLOSED.
+    """
+    def attempt():
+        with transaction.atomic():
+            # Первой идет вставка: проверка мест ниже выполняется уже под
+            # блокировкой записи, и отмена не может "проскочить" между ними
+            try:
+                with transaction.atomic():
+                    entry = WaitlistEntry.objects.create(event_id=event.pk, user_id=user.pk)
+            except IntegrityError:
+                return ALREADY_WAITLISTED
+            if is_participant(event, user):
+                entry.delete()
+                return ALREADY_JOINED
+            if _claim_seat(event.pk):
+                entry.delete()
+                _add_participant(event.pk, user.pk)
+                return JOINED
+            if _is_closed(event.pk):
+                entry.delete()
+                return CLOSED
+            return WAITLISTED
+    return _with_retry(attempt)
+
+
+def leave_waitlist(event, user):
+    """Убирает user из очереди. Возвращает LEFT_WAITLIST / NOT_WAITLISTED."""
+    def attempt():
+        deleted, _ = WaitlistEntry.objects.filter(event_id=event.pk, user_id=user.pk).delete()
+        return LEFT_WAITLIST if deleted else NOT_WAITLISTED
+    return _with_retry(attempt)
+
+
+def waitlist_position(event, user):
+    """Номер user в очереди (с 1) или None. Считается по индексу (event, id)."""
+    entry_id = WaitlistEntry.objects.filter(event_id=event.pk, user_id=user.pk).values_list('pk', flat=True).first()
+    if entry_id is None:
+        return None
+    return WaitlistEntry.objects.filter(event_id=event.pk, pk__lte=entry_id).count()
+
+
+def _real_count():
+    rows = Participant.objects.filter(event_id=OuterRef('pk')).order_by().values('event_id')
+    return Coalesce(Subquery(rows.annotate(n=Count('pk')).values('n')), Value(0))
+
+
+def recount(event_ids):
+    """Пересчитывает счетчики указанных мероприятий одним UPDATE."""
+    if event_ids:
+        Event.objects.filter(pk__in=event_ids).update(participants_count=_real_count())
+        for event_id in event_ids:
+            fragments.invalidate_on_commit(event_id)
+
+
+def refresh_participant_counts(events=None):
+    """Пересчитывает счетчики по таблице участников (после ручных правок в БД)."""
+    events = Event.objects.all() if events is None else events
+    updated = 0
+    for event in events.annotate(real_count=Count('participants')).only('pk', 'participants_count'):
+        if event.participants_count != event.real_count:
+            Event.objects.filter(pk=event.pk).update(participants_count=event.real_count)
+            updated += 1
+    return updated
+
+
+# --- СИНХРОНИЗАЦИЯ СЧЕТЧИКА ---
+# join_event / leave_event меняют счетчик сами. Остальные изменения списка
+# участников (админка, event.participants.add(), user.attending_events.clear())
+# ловятся сигналами: затронутые мероприятия пересчитываются по таблице.
+def participants_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # После clear() уже не узнать, на что был записан пользователь
+        instance._cleared_event_ids = list(
+            Participant.objects.filter(user_id=instance.pk).values_list('event_id', flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        event_ids = [instance.pk]
+    elif action == 'post_clear':
+        event_ids = getattr(instance, '_cleared_event_ids', [])
+    else:
+        event_ids = list(pk_set or [])
+    recount(event_ids)
+
+
+def promote_waitlists(event_ids):
+    """Раздает свободные места указанных мероприятий очереди, каждое — своей транзакцией."""
+    for event in Event.objects.filter(pk__in=event_ids, is_completed=False).only('pk', 'title'):
+        def attempt(event=event):
+            with transaction.atomic():
+                return _promote(event)
+        _with_retry(attempt)
+
+
+def user_deleting(sender, instance, **kwargs):
+    # Строки участника удалит каскад (без m2m_changed) — освобождаем места заранее,
+    # в той же транзакции, что и удаление. Очередь продвигается после коммита:
+    # до него в очередях еще стоит сам удаляемый, и место могло достаться ему
+    event_ids = list(Participant.objects.filter(user_id=instance.pk).values_list('event_id', flat=True))
+    Event.objects.filter(pk__in=event_ids).update(participants_count=F('participants_count') - 1)
+    for event_id in event_ids:
+        fragments.invalidate_on_commit(event_id)
+    if event_ids:
+        transaction.on_commit(lambda: promote_waitlists(event_ids))
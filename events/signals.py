@@ -0,0 +1,23 @@
+# events/signals.py
+"""
+Подключение обработчиков сигналов приложения events.
+Импортируется из EventsConfig.ready().
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+
+from users.models import User
+
+from . import fragments, reservations
+from .models import Event, EventPhoto
+
+m2m_changed.connect(
+    reservations.participants_changed, sender=Event.participants.through,
+    dispatch_uid='events_participants_changed',
+)
+pre_delete.connect(reservations.user_deleting, sender=User, dispatch_uid='events_user_deleting')
+
+# Кэш карточек списка мероприятий (events/fragments.py)
+post_save.connect(fragments.event_changed, sender=Event, dispatch_uid='events_fragments_event_saved')
+post_delete.connect(fragments.event_changed, sender=Event, dispatch_uid='events_fragments_event_deleted')
+post_save.connect(fragments.photo_changed, sender=EventPhoto, dispatch_uid='events_fragments_photo_saved')
+post_delete.connect(fragments.photo_changed, sender=EventPhoto, dispatch_uid='events_fragments_photo_deleted')
@@ -1,3 +1,362 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.images import has_variants
+from users.models import Notification, User
+
+from . import fragments, reservations
+from .gallery import _prepare_all, process_photo_batch, start_photo_batch
+from .models import Event, EventPhoto, PhotoUploadBatch, WaitlistEntry
+
+
+def make_photo(name='IMG.jpg', size=(3000, 2000)):
+    from PIL import Image
+    buffer = BytesIO()
+    exif = Image.Exif()
+    exif[0x010F] = 'PhoneMaker'
+    exif[0x0112] = 6  # Orientation: снято "боком"
+    Image.new('RGB', size, 'orange').save(buffer, format='JPEG', exif=exif)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+@override_settings(PHOTO_UPLOAD_WORKERS=0, PHOTO_UPLOAD_MAX_SIZE=1000, PHOTO_UPLOAD_BATCH_SIZE=2)
+class PhotoUploadBatchTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='org', password='x')
+        self.event = Event.objects.create(
+            title='Субботник', description='...', organizer=self.organizer,
+            start_time=timezone.now(), end_time=timezone.now(),
+        )
+        self.url = reverse('event_report_edit', args=[self.event.pk])
+
+    def post_photos(self, client, photos):
+        return client.post(self.url, {'report_text': 'Отчет', 'photos': photos})
+
+    def test_photos_are_processed_off_request(self):
+        client = Client()
+        client.force_login(self.organizer)
+        broken = SimpleUploadedFile('notes.jpg', b'not an image', content_type='image/jpeg')
+        response = self.post_photos(client, [make_photo('a.jpg'), broken, make_photo('b.jpg'), make_photo('c.jpg')])
+        self.assertRedirects(response, self.url)
+
+        batch = PhotoUploadBatch.objects.get(event=self.event)
+        self.assertEqual((batch.total, batch.processed, batch.failed), (4, 3, 1))
+        self.assertEqual(batch.status, PhotoUploadBatch.DONE)
+
+        from PIL import Image
+        photos = list(EventPhoto.objects.filter(event=self.event))
+        self.assertEqual(len(photos), 3)
+        with default_storage.open(photos[0].image.name) as stored:
+            image = Image.open(stored)
+            # Повернуто по EXIF, уменьшено, метаданные убраны
+            self.assertEqual(image.size, (667, 1000))
+            self.assertNotIn(0x010F, image.getexif())
+        self.assertTrue(has_variants(photos[0].image.name))
+        # Временные файлы не остаются
+        self.assertEqual(os.listdir(settings.PHOTO_UPLOAD_SPOOL_DIR), [])
+
+        status = client.get(reverse('event_photo_batch_status', args=[self.event.pk, batch.pk])).json()
+        self.assertEqual(status['percent'], 100)
+        self.assertEqual(status['processed'], 3)
+
+    def test_csrf_is_still_checked(self):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.organizer)
+        response = self.post_photos(client, [make_photo()])
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(PhotoUploadBatch.objects.exists())
+
+    def test_retry_after_crash_reuses_file_names(self):
+        with self.settings(BACKGROUND_TASKS_MODE='queue'):
+            batch = start_photo_batch(self.event, self.organizer, [make_photo('a.jpg'), make_photo('b.jpg')])
+        # Файлы уже в хранилище, а строки фото не вставились
+        with mock.patch.object(EventPhoto.objects, 'bulk_create', side_effect=RuntimeError('БД недоступна')):
+            with self.assertRaises(RuntimeError):
+                process_photo_batch(batch.pk)
+        process_photo_batch(batch.pk)
+
+        photos = sorted(EventPhoto.objects.filter(event=self.event).values_list('image', flat=True))
+        self.assertEqual(len(photos), 2)
+        gallery = os.path.join(settings.MEDIA_ROOT, 'event_gallery')
+        label = os.path.basename(photos[0]).split('_')[1]
+        files = sorted(name for name in os.listdir(gallery) if label in name)
+        self.assertEqual(['event_gallery/' + name for name in files], photos)
+
+    def test_process_pool(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        paths = []
+        for name in ('a.jpg', 'b.jpg'):
+            path = os.path.join(directory, name)
+            with open(path, 'wb') as target:
+                target.write(make_photo(size=(1200, 800)).read())
+            paths.append(path)
+        with self.settings(PHOTO_UPLOAD_WORKERS=2):
+            results = list(_prepare_all(paths))
+        self.assertEqual([path for path, _prepared, _error in results], paths)
+        self.assertTrue(all(error is None for _path, _prepared, error in results))
+
+
+def make_event(organizer, **fields):
+    fields = {
+        'title': 'Акция', 'description': '...', 'is_approved': True,
+        'start_time': timezone.now(), 'end_time': timezone.now(), **fields,
+    }
+    return Event.objects.create(organizer=organizer, **fields)
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='org', password='x')
+        self.event = make_event(self.organizer, max_participants=1)
+
+    def test_capacity_is_enforced(self):
+        first = User.objects.create_user(username='first', password='x')
+        second = User.objects.create_user(username='second', password='x')
+        self.assertEqual(reservations.join_event(self.event, first), reservations.JOINED)
+        self.assertEqual(reservations.join_event(self.event, first), reservations.ALREADY_JOINED)
+        self.assertEqual(reservations.join_event(self.event, second), reservations.FULL)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participants_count, 1)
+
+        self.assertEqual(reservations.leave_event(self.event, first), reservations.LEFT)
+        self.assertEqual(reservations.leave_event(self.event, first), reservations.NOT_JOINED)
+        self.assertEqual(reservations.join_event(self.event, second), reservations.JOINED)
+
+    def test_stale_save_keeps_taken_seats(self):
+        first = User.objects.create_user(username='first', password='x')
+        second = User.objects.create_user(username='second', password='x')
+        # Форма редактирования загрузила мероприятие до того, как кто-то записался
+        stale = Event.objects.get(pk=self.event.pk)
+        self.assertEqual(reservations.join_event(self.event, first), reservations.JOINED)
+        stale.title = 'Новое название'
+        stale.save()
+
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.title, self.event.participants_count), ('Новое название', 1))
+        self.assertEqual(reservations.join_event(self.event, second), reservations.FULL)
+
+    def test_join_view_is_explicit(self):
+        member = User.objects.create_user(username='member', password='x')
+        self.client.force_login(member)
+        url = reverse('event_join', args=[self.event.pk])
+        self.client.post(url, {'action': 'join'})
+        # Повторный "записаться" (двойной клик) не отменяет запись
+        self.client.post(url, {'action': 'join'})
+        self.assertTrue(reservations.is_participant(self.event, member))
+        self.client.get(url)
+        self.assertTrue(reservations.is_participant(self.event, member))
+        self.client.post(url, {'action': 'leave'})
+        self.assertFalse(reservations.is_participant(self.event, member))
+
+
+class WaitlistTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='org', password='x')
+        self.event = make_event(self.organizer, max_participants=1)
+        self.member = User.objects.create_user(username='member', password='x')
+        self.first = User.objects.create_user(username='first', password='x')
+        self.second = User.objects.create_user(username='second', password='x')
+        reservations.join_event(self.event, self.member)
+
+    def test_leave_promotes_head_of_queue(self):
+        self.assertEqual(reservations.join_waitlist(self.event, self.first), reservations.WAITLISTED)
+        self.assertEqual(reservations.join_waitlist(self.event, self.second), reservations.WAITLISTED)
+        self.assertEqual(reservations.join_waitlist(self.event, self.first), reservations.ALREADY_WAITLISTED)
+        self.assertEqual(reservations.waitlist_position(self.event, self.second), 2)
+
+        self.assertEqual(reservations.leave_event(self.event, self.member), reservations.LEFT)
+        self.assertTrue(reservations.is_participant(self.event, self.first))
+        self.assertEqual(reservations.waitlist_position(self.event, self.second), 1)
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participants_count, 1)
+        self.assertTrue(Notification.objects.filter(recipient=self.first).exists())
+        self.assertFalse(Notification.objects.filter(recipient=self.second).exists())
+
+    def test_deleted_participant_seat_goes_to_queue(self):
+        reservations.join_waitlist(self.event, self.first)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.delete()
+        self.assertTrue(reservations.is_participant(self.event, self.first))
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.participants_count, 1)
+        self.assertTrue(Notification.objects.filter(recipient=self.first).exists())
+
+    def test_waitlist_view(self):
+        self.client.force_login(self.first)
+        url = reverse('event_join', args=[self.event.pk])
+        self.client.post(url, {'action': 'waitlist'})
+        response = self.client.get(reverse('event_detail', args=[self.event.pk]))
+        self.assertContains(response, 'Покинуть лист ожидания')
+        self.client.post(url, {'action': 'leave_waitlist'})
+        self.assertFalse(WaitlistEntry.objects.exists())
+
+
+class ParticipantCountTests(TestCase):
+    def setUp(self):
+        self.organizer = User.objects.create_user(username='org', password='x')
+        self.event = make_event(self.organizer, max_participants=10)
+        self.first = User.objects.create_user(username='first', password='x')
+        self.second = User.objects.create_user(username='second', password='x')
+
+    def count(self):
+        self.event.refresh_from_db()
+        return self.event.participants_count
+
+    def test_m2m_changes_keep_count(self):
+        self.event.participants.add(self.first, self.second)
+        self.event.participants.add(self.first)
+        self.assertEqual(self.count(), 2)
+        self.event.participants.remove(self.first, self.organizer)
+        self.assertEqual(self.count(), 1)
+        self.event.participants.clear()
+        self.assertEqual(self.count(), 0)
+
+        self.first.attending_events.add(self.event)
+        reservations.join_event(self.event, self.second)
+        self.assertEqual(self.count(), 2)
+        self.first.attending_events.clear()
+        self.assertEqual(self.count(), 1)
+        self.second.delete()
+        self.assertEqual(self.count(), 0)
+
+    @override_settings(PAGINATION_PAGE_SIZE=2)
+    def test_participants_are_listed_by_pages(self):
+        third = User.objects.create_user(username='third', password='x', last_name='В')
+        self.first.last_name, self.second.last_name = 'А', 'Б'
+        User.objects.bulk_update([self.first, self.second], ['last_name'])
+        self.event.participants.add(self.first, self.second, third)
+        self.client.force_login(self.organizer)
+
+        detail = self.client.get(reverse('event_detail', args=[self.event.pk]))
+        self.assertNotContains(detail, reverse('public_profile', args=[self.first.pk]))
+
+        data = self.client.get(reverse('event_participants', args=[self.event.pk])).json()
+        self.assertEqual([row['id'] for row in data['results']], [self.first.pk, self.second.pk])
+        self.assertEqual(data['results'][0]['profile_url'], reverse('public_profile', args=[self.first.pk]))
+        data = self.client.get(data['next_url']).json()
+        self.assertEqual([row['id'] for row in data['results']], [third.pk])
+        self.assertIsNone(data['next_url'])
+
+
+class EventListCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.organizer = User.objects.create_user(username='org', password='x')
+        self.member = User.objects.create_user(username='member', password='x')
+        self.event = make_event(self.organizer, max_participants=10)
+        self.url = reverse('event_list')
+
+    def test_cards_follow_changes(self):
+        self.client.force_login(self.member)
+        self.assertContains(self.client.get(self.url), '0 / 10')
+        with self.captureOnCommitCallbacks(execute=True):
+            reservations.join_event(self.event, self.member)
+        self.assertContains(self.client.get(self.url), '1 / 10')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.event.title = 'Новое название'
+            self.event.save()
+        self.assertContains(self.client.get(self.url), 'Новое название')
+
+    def test_past_years_are_cached_per_viewer(self):
+        for year, published in ((2023, True), (2024, True), (2024, False)):
+            moment = timezone.make_aware(datetime(year, 5, 1))
+            make_event(
+                self.organizer, title=f'Архив {year} {published}', is_completed=True,
+                is_report_published=published, start_time=moment, end_time=moment,
+            )
+        self.client.force_login(self.member)
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Архив 2023 True')
+        self.assertNotContains(response, 'Архив 2024 False')
+        # Второй раз блоки берутся из кэша: запросы за карточками архива не нужны
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+
+        self.client.force_login(self.organizer)
+        self.assertContains(self.client.get(self.url), 'Архив 2024 False')
+
+    def test_only_changed_years_are_rendered_again(self):
+        events = {}
+        for year in (2022, 2023, 2024):
+            moment = timezone.make_aware(datetime(year, 5, 1))
+            events[year] = make_event(
+                self.organizer, title=f'Архив {year}', is_completed=True, is_report_published=True,
+                start_time=moment, end_time=moment,
+            )
+        self.client.force_login(self.member)
+        self.client.get(self.url)
+
+        moved = Event.objects.get(pk=events[2023].pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            moved.title = 'Перенесено'
+            moved.end_time = timezone.make_aware(datetime(2024, 6, 1))
+            moved.save()
+        with mock.patch('events.fragments.render_to_string', wraps=fragments.render_to_string) as render:
+            response = self.client.get(self.url)
+        # 2023 опустел, перерисован только 2024; 2022 — из кэша
+        self.assertEqual(render.call_count, 1)
+        self.assertContains(response, 'Перенесено')
+        self.assertNotContains(response, '<h4 class="fw-bold text-muted mt-4 mb-3">2023</h4>', html=False)
+
+class ConcurrentReservationTests(TransactionTestCase):
+    def test_cap_holds_under_concurrent_joins(self):
+        organizer = User.objects.create_user(username='org', password='x')
+        event = make_event(organizer, max_participants=25)
+        # bulk_create — без сигналов (QR-коды и т.п.), нужны только строки
+        User.objects.bulk_create(User(username=f'volunteer{i}') for i in range(100))
+        volunteers = list(User.objects.filter(username__startswith='volunteer'))
+
+        def join(user):
+            try:
+                return reservations.join_event(event, user)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(join, volunteers + volunteers[:30]))
+
+        event.refresh_from_db()
+        self.assertEqual(results.count(reservations.JOINED), 25)
+        self.assertEqual(event.participants_count, 25)
+        self.assertEqual(event.participants.count(), 25)
+
+    def test_concurrent_leaves_promote_each_waiter_once(self):
+        organizer = User.objects.create_user(username='org', password='x')
+        event = make_event(organizer, max_participants=10)
+        User.objects.bulk_create(User(username=f'volunteer{i}') for i in range(30))
+        volunteers = list(User.objects.filter(username__startswith='volunteer').order_by('pk'))
+        for user in volunteers[:10]:
+            reservations.join_event(event, user)
+        for user in volunteers[10:]:
+            reservations.join_waitlist(event, user)
+
+        def leave(user):
+            try:
+                return reservations.leave_event(event, user)
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            list(pool.map(leave, volunteers[:10]))
+
+        event.refresh_from_db()
+        promoted = set(event.participants.values_list('pk', flat=True))
+        self.assertEqual(promoted, {user.pk for user in volunteers[10:20]})
+        self.assertEqual(event.participants_count, 10)
+        self.assertEqual(WaitlistEntry.objects.filter(event=event).count(), 10)
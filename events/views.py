@@ -1,14 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from .models import Event, EventPhoto, EventVideo, EventHero
+from django.http import JsonResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from .models import Event, EventPhoto, EventVideo, EventHero, PhotoUploadBatch
 from .forms import EventCreateForm, EventReportForm, EventVideoForm, EventHeroForm
-from users.models import AuditLog
+from . import fragments, reservations
+from .gallery import SpoolUploadHandler, start_photo_batch
+from users import audit
+from users.pagination import get_page_size, page_url, paginate_keyset
+from core import metrics
 
 # --- Логирование ("Призрак") ---
-def log_event_action(user, action_text):
+def log_event_action(user, action_text, code='', event=None, payload=None):
     if not user.is_superuser:
-        AuditLog.objects.create(actor=user, action=action_text)
+        audit.record(user, action_text, code=code, obj=event, payload=payload)
 
 # --- Права ---
 def can_manage_event(user, event):
@@ -23,22 +34,47 @@ def can_create_instantly(user):
 # events/views.py
 
 def event_list_view(request):
-    upcoming_events = Event.objects.filter(is_approved=True, is_completed=False).order_by('start_time')
-    
-    # ИСПРАВЛЕНИЕ: Показываем ВСЕ завершенные мероприятия, даже если отчет не опубликован
-    # (фильтрацию "кто что видит" сделаем в шаблоне)
-    past_events = Event.objects.filter(is_completed=True).order_by('-end_time')
-    
+    # Карточки и блоки архива по годам кэшируются (events/fragments.py):
+    # здесь только id, версии и то, что понадобится при промахе кэша
+    viewer = fragments.viewer_class(request.user)
     return render(request, 'events/event_list.html', {
-        'upcoming_events': upcoming_events,
-        'past_events': past_events
+        'upcoming_events': fragments.upcoming_cards(),
+        'past_years': fragments.past_years(request.user, viewer),
+        'viewer': viewer,
+        'card_cache_timeout': settings.EVENT_CARD_CACHE_TIMEOUT,
     })
+
 @login_required
 def event_detail_view(request, pk):
     event = get_object_or_404(Event, pk=pk)
-    is_participant = request.user in event.participants.all()
+    # Один запрос по индексу (event, user), а не загрузка всех участников
+    is_participant = reservations.is_participant(event, request.user)
+    waitlist_position = None if is_participant else reservations.waitlist_position(event, request.user)
     can_manage = can_manage_event(request.user, event)
-    return render(request, 'events/event_detail.html', {'event': event, 'is_participant': is_participant, 'can_manage': can_manage})
+    return render(request, 'events/event_detail.html', {
+        'event': event, 'is_participant': is_participant, 'can_manage': can_manage,
+        'waitlist_position': waitlist_position,
+        # Герои вместе с пользователями одним запросом (шаблон берет hero.user.*)
+        'heroes': list(event.heroes.select_related('user')),
+    })
+
+@login_required
+def event_participants_view(request, pk):
+    """Участники мероприятия по страницам (JSON): список подгружается, когда его раскрывают."""
+    event = get_object_or_404(Event.objects.only('pk'), pk=pk)
+    participants = event.participants.only('id', 'first_name', 'last_name', 'patronymic')
+    page = paginate_keyset(participants, request.GET.get('cursor'), get_page_size(request))
+    return JsonResponse({
+        'results': [
+            {
+                'id': participant.pk,
+                'full_name': participant.get_full_name(),
+                'profile_url': reverse('public_profile', args=[participant.pk]),
+            }
+            for participant in page
+        ],
+        'next_url': page_url(request, page.next_token),
+    })
 
 @login_required
 def event_create_view(request):
@@ -54,7 +90,7 @@ def event_create_view(request):
                 event.is_approved = False
                 msg = "Отправлено на модерацию."
             event.save()
-            log_event_action(request.user, f"Создал мероприятие '{event.title}'")
+            log_event_action(request.user, f"Создал мероприятие '{event.title}'", 'event.create', event)
             messages.success(request, msg)
             return redirect('event_detail', pk=event.pk)
     else:
@@ -70,7 +106,7 @@ def event_edit_view(request, pk):
         form = EventCreateForm(request.POST, request.FILES, instance=event)
         if form.is_valid():
             form.save()
-            log_event_action(request.user, f"Отредактировал мероприятие '{event.title}'")
+            log_event_action(request.user, f"Отредактировал мероприятие '{event.title}'", 'event.edit', event)
             messages.success(request, "Обновлено.")
             return redirect('event_detail', pk=pk)
     else:
@@ -85,45 +121,65 @@ def event_finish_view(request, pk):
     if request.method == 'POST':
         event.is_completed = True
         event.save()
-        log_event_action(request.user, f"Завершил мероприятие '{event.title}'")
+        log_event_action(request.user, f"Завершил мероприятие '{event.title}'", 'event.finish', event)
         messages.success(request, "Завершено! Заполните отчет.")
         return redirect('event_report_edit', pk=pk)
     return redirect('event_detail', pk=pk)
 
-@login_required
+@csrf_exempt
 def event_report_edit_view(request, pk):
+    # Обработчики загрузки можно менять только до первого чтения request.POST,
+    # а CsrfViewMiddleware читает его раньше view. Поэтому, как рекомендует
+    # документация Django, здесь только подключается обработчик, который пишет
+    # фото сразу на диск, а CSRF и все остальное проверяет _event_report_edit.
+    spool = None
+    if request.method == 'POST':
+        spool = SpoolUploadHandler(request, field_name='photos')
+        request.upload_handlers.insert(0, spool)
+    try:
+        return _event_report_edit(request, pk)
+    finally:
+        if spool is not None:
+            spool.cleanup()
+
+@login_required
+@csrf_protect
+def _event_report_edit(request, pk):
     event = get_object_or_404(Event, pk=pk)
     if not can_manage_event(request.user, event): return redirect('event_detail', pk=pk)
-
     if request.method == 'POST':
         report_form = EventReportForm(request.POST, instance=event)
         video_form = EventVideoForm(request.POST)
         hero_form = EventHeroForm(request.POST)
         
         log_details = []
+        log_payload = {}
 
         if report_form.is_valid():
             report_form.save()
             photos = request.FILES.getlist('photos')
             if photos:
-                for photo in photos:
-                    EventPhoto.objects.create(event=event, image=photo)
+                # Обработка идет в фоне, прогресс виден на этой же странице
+                start_photo_batch(event, request.user, photos)
                 log_details.append(f"добавил {len(photos)} фото")
+                log_payload['photos'] = len(photos)
             
             if video_form.is_valid() and video_form.cleaned_data['video_url']:
                 v = video_form.save(commit=False)
                 v.event = event
                 v.save()
                 log_details.append("добавил видео")
+                log_payload['video'] = v.pk
                 
             if hero_form.is_valid() and hero_form.cleaned_data['user']:
                 h = hero_form.save(commit=False)
                 h.event = event
                 h.save()
                 log_details.append(f"отметил героя {h.user.get_full_name()}")
+                log_payload['hero'] = h.user_id
 
             if log_details:
-                log_event_action(request.user, f"Обновил отчет '{event.title}': {', '.join(log_details)}")
+                log_event_action(request.user, f"Обновил отчет '{event.title}': {', '.join(log_details)}", 'event.report', event, log_payload)
 
             messages.success(request, "Отчет сохранен.")
             return redirect('event_report_edit', pk=pk)
@@ -134,19 +190,65 @@ def event_report_edit_view(request, pk):
         
     return render(request, 'events/event_report_edit.html', {
         'event': event, 'report_form': report_form, 
-        'video_form': video_form, 'hero_form': hero_form
+        'video_form': video_form, 'hero_form': hero_form,
+        'heroes': event.heroes.select_related('user'),
+        # Идущие обработки и недавние сбои; успешные пачки уже видны как фото
+        'photo_batches': event.photo_batches.exclude(status=PhotoUploadBatch.DONE).filter(
+            created_at__gte=timezone.now() - timedelta(days=1)
+        ),
+    })
+
+@login_required
+def event_photo_batch_status_view(request, pk, batch_id):
+    """Прогресс обработки пачки фото (JSON для опроса со страницы отчета)."""
+    batch = get_object_or_404(PhotoUploadBatch.objects.select_related('event'), pk=batch_id, event_id=pk)
+    if not can_manage_event(request.user, batch.event):
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    return JsonResponse({
+        'id': batch.pk,
+        'status': batch.status,
+        'total': batch.total,
+        'processed': batch.processed,
+        'failed': batch.failed,
+        'percent': batch.percent,
     })
 
+# Сообщения для результатов записи (events/reservations.py)
+JOIN_MESSAGES = {
+    reservations.JOINED: (messages.SUCCESS, "Вы записаны!"),
+    reservations.ALREADY_JOINED: (messages.INFO, "Вы уже записаны."),
+    reservations.FULL: (messages.WARNING, "Свободных мест больше нет."),
+    reservations.CLOSED: (messages.INFO, "Мероприятие уже завершено."),
+    reservations.LEFT: (messages.INFO, "Вы отменили запись."),
+    reservations.NOT_JOINED: (messages.INFO, "Вы не были записаны."),
+    reservations.WAITLISTED: (messages.SUCCESS, "Вы в листе ожидания. Как только место освободится, мы вас запишем."),
+    reservations.ALREADY_WAITLISTED: (messages.INFO, "Вы уже в листе ожидания."),
+    reservations.LEFT_WAITLIST: (messages.INFO, "Вы покинули лист ожидания."),
+    reservations.NOT_WAITLISTED: (messages.INFO, "Вас нет в листе ожидания."),
+}
+
+JOIN_ACTIONS = {
+    'join': reservations.join_event,
+    'leave': reservations.leave_event,
+    'waitlist': reservations.join_waitlist,
+    'leave_waitlist': reservations.leave_waitlist,
+}
+
 @login_required
 def event_join_view(request, pk):
     event = get_object_or_404(Event, pk=pk)
-    if not event.is_completed:
-        if request.user in event.participants.all():
-            event.participants.remove(request.user)
-            messages.info(request, "Вы отменили запись.")
-        else:
-            event.participants.add(request.user)
-            messages.success(request, "Вы записаны!")
+    if request.method != 'POST':
+        return redirect('event_detail', pk=pk)
+
+    # Действие задается явно: повторный клик не превратит запись в отмену
+    action = request.POST.get('action')
+    if action not in JOIN_ACTIONS:
+        action = 'leave' if reservations.is_participant(event, request.user) else 'join'
+    result = JOIN_ACTIONS[action](event, request.user)
+    metrics.inc('aya_event_reservations_total', action=action, result=result)
+
+    level, text = JOIN_MESSAGES[result]
+    messages.add_message(request, level, text)
     return redirect('event_detail', pk=pk)
 
 # --- УДАЛЕНИЕ ФОТО ---
@@ -162,7 +264,7 @@ def event_photo_delete_view(request, pk):
 
     if request.method == 'POST':
         # Лог (призрак)
-        log_event_action(request.user, f"Удалил фотографию из отчета '{event.title}'")
+        log_event_action(request.user, f"Удалил фотографию из отчета '{event.title}'", 'event.photo_delete', event, {'photo': photo.pk})
         
         photo.delete()
         messages.success(request, "Фотография удалена.")
@@ -181,11 +283,11 @@ def event_delete_view(request, pk):
     
     if request.method == 'POST':
         title = event.title # Сохраняем название для лога
+
+        # Лог (Призрак: супер-админ не пишется). До удаления, пока у события есть pk
+        log_event_action(request.user, f"Удалил мероприятие '{title}'", 'event.delete', event)
         event.delete()
         
-        # Лог (Призрак: супер-админ не пишется)
-        log_event_action(request.user, f"Удалил мероприятие '{title}'")
-        
         messages.warning(request, f"Мероприятие '{title}' было удалено.")
         return redirect('event_list')
         
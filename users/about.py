@@ -0,0 +1,59 @@
+# users/about.py
+"""
+Страница «О нас» (AboutPage) без запросов к БД.
+
+AboutPage — одна запись на весь сайт: ее читают страница «О нас» и футер
+каждой страницы (контакты). Запись держится в памяти процесса вместе с
+номером версии; сама версия лежит в общем кэше. При сохранении или
+удалении записи сигнал меняет версию, и каждый процесс перечитывает
+запись на первом же запросе после этого — остальные запросы обходятся
+одним чтением из кэша.
+
+Если процессов несколько, кэш (CACHES) должен быть общим для них
+(файловый, redis и т.п.), иначе версия разойдется между процессами.
+"""
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core import metrics
+
+from .models import AboutPage
+
+VERSION_KEY = 'about-page:version'
+
+# (версия, запись или None) — одна ссылка, поэтому замена атомарна и для потоков
+_local = (None, None)
+
+
+def _current_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        # add: если другой процесс успел первым, берем его версию
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def get_about_page():
+    """Запись AboutPage (или None, если ее еще не создали)."""
+    global _local
+    version = _current_version()
+    local_version, page = _local
+    metrics.inc('aya_cache_requests_total', cache='about', result='hit' if local_version == version else 'miss')
+    if local_version != version:
+        # Редактирование идет через get_or_create(pk=1), поэтому берем самую раннюю запись
+        page = AboutPage.objects.order_by('pk').first()
+        _local = (version, page)
+    return page
+
+
+def invalidate():
+    transaction.on_commit(lambda: cache.set(VERSION_KEY, time.time_ns(), timeout=None))
+
+
+# --- ОБРАБОТЧИК СИГНАЛОВ ---
+def about_page_changed(sender, instance, **kwargs):
+    invalidate()
@@ -1,6 +1,6 @@
 # users/admin.py
 from django.contrib import admin
-from .models import User, Direction, School, ActivityPeriod, Notification, AboutPage, AuditLog
+from .models import User, Direction, School, ActivityPeriod, Notification, AboutPage, AuditLog, VolunteerFacet
 
 # Регистрируем все модели, чтобы Суперадмин мог управлять ими
 admin.site.register(User)
@@ -9,4 +9,5 @@ admin.site.register(School)
 admin.site.register(ActivityPeriod)
 admin.site.register(Notification)
 admin.site.register(AboutPage)
-admin.site.register(AuditLog)
\ No newline at end of file
+admin.site.register(AuditLog)
+admin.site.register(VolunteerFacet)
\ No newline at end of file
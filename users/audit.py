@@ -0,0 +1,265 @@
+# users/audit.py
+"""
+Запись в журнал действий (AuditLog) с отложенной записью.
+
+record() не делает INSERT в запросе пользователя: запись попадает в буфер
+процесса, а буфер сбрасывается одним bulk_create, когда в нем накопилось
+AUDIT_LOG_BUFFER_SIZE записей или самой старой больше AUDIT_LOG_FLUSH_INTERVAL
+секунд. Сбрасывает фоновый поток процесса, поэтому блокировку записи SQLite
+берет одна транзакция на пачку, а не каждый запрос. При остановке процесса
+буфер сбрасывается обязательно (atexit).
+
+Если запись должна попасть в журнал вместе с самим изменением (или не
+попасть вовсе), используйте record(..., atomic=True): она пишется сразу,
+в текущей транзакции. В режиме BACKGROUND_TASKS_MODE='sync' (тесты,
+отладка) сразу пишутся все записи.
+
+Кроме текста для людей запись хранит код действия ('event.create'),
+тип и id объекта и словарь подробностей — по ним журнал фильтруется.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import AuditLog, User
+from .search import filter_by_search
+
+logger = logging.getLogger(__name__)
+
+_buffer = []
+_oldest = None  # time.monotonic() самой старой записи в буфере
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wakeup = threading.Event()
+_flusher = None
+
+
+# Коды действий и их названия (для фильтра в журнале)
+ACTIONS = {
+    'user.approve': "Одобрение пользователя",
+    'user.reject': "Отклонение пользователя",
+    'user.role': "Смена роли",
+    'user.demote': "Снятие руководителя отдела",
+    'user.active_title': "Звание «Активный волонтер»",
+    'user.edit': "Редактирование профиля",
+    'direction.create': "Создание направления",
+    'direction.delete': "Удаление направления",
+    'direction.leader_add': "Назначение руководителя направления",
+    'direction.leader_remove': "Снятие руководителя направления",
+    'school.create': "Создание школы",
+    'school.delete': "Удаление школы",
+    'school.leader_add': "Назначение руководителя школы",
+    'school.leader_remove': "Снятие руководителя школы",
+    'about.edit': "Редактирование страницы «О нас»",
+    'event.create': "Создание мероприятия",
+    'event.edit': "Редактирование мероприятия",
+    'event.finish': "Завершение мероприятия",
+    'event.report': "Обновление отчета",
+    'event.photo_delete': "Удаление фото из отчета",
+    'event.delete': "Удаление мероприятия",
+}
+
+# Типы объектов (app_label.model)
+OBJECT_TYPES = {
+    'users.user': "Пользователи",
+    'users.direction': "Направления",
+    'users.school': "Школы",
+    'users.aboutpage': "Страница «О нас»",
+    'events.event': "Мероприятия",
+}
+
+
+def _pk(obj):
+    return getattr(obj, 'pk', obj)
+
+
+def record(actor, action, target=None, atomic=False, code='', obj=None, payload=None):
+    """
+    Добавляет запись в журнал. actor и target — пользователи или их id;
+    obj — объект действия (мероприятие, школа...), payload — подробности.
+    Для удаляемого объекта вызывайте до delete(): потом у него уже нет pk.
+    """
+    entry = AuditLog(
+        actor_id=_pk(actor), action=action, target_user_id=_pk(target), created_at=timezone.now(),
+        action_code=code, object_type=obj._meta.label_lower if obj is not None else '',
+        object_id=obj.pk if obj is not None else None, payload=payload or {},
+    )
+    if atomic or getattr(settings, 'BACKGROUND_TASKS_MODE', 'thread') == 'sync':
+        entry.save()
+        return entry
+    # Если действие откатится вместе с транзакцией, записи в журнале не будет
+    transaction.on_commit(lambda: _append(entry))
+    return entry
+
+
+def _append(entry):
+    global _oldest
+    with _lock:
+        if not _buffer:
+            _oldest = time.monotonic()
+        _buffer.append(entry)
+        size = len(_buffer)
+    if size >= settings.AUDIT_LOG_MAX_BUFFER:
+        # Фоновый поток не успевает (или БД недоступна) — пишем прямо здесь
+        flush()
+        return
+    _start_flusher()
+    if size >= settings.AUDIT_LOG_BUFFER_SIZE:
+        _wakeup.set()
+
+
+def pending():
+    with _lock:
+        return len(_buffer)
+
+
+def flush():
+    """Записывает все накопленное. Возвращает число записанных строк."""
+    global _oldest
+    with _flush_lock:
+        with _lock:
+            entries = _buffer[:]
+            _buffer.clear()
+            _oldest = None
+        if not entries:
+            return 0
+        try:
+            _write(entries)
+        except Exception:
+            logger.exception("Не удалось записать в журнал %s записей, повторим позже", len(entries))
+            with _lock:
+                # Возвращаем в начало буфера, но не храним больше лимита
+                _buffer[:0] = entries
+                del _buffer[settings.AUDIT_LOG_MAX_BUFFER:]
+                _oldest = time.monotonic()
+            return 0
+        return len(entries)
+
+
+def _write(entries):
+    batch_size = settings.AUDIT_LOG_BUFFER_SIZE
+    try:
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(entries, batch_size=batch_size)
+    except IntegrityError:
+        # Пока запись ждала в буфере, пользователя могли удалить —
+        # обнуляем ссылки на несуществующих (как сделал бы SET_NULL)
+        ids = {pk for entry in entries for pk in (entry.actor_id, entry.target_user_id) if pk}
+        existing = set(User.objects.filter(pk__in=ids).values_list('pk', flat=True))
+        for entry in entries:
+            if entry.actor_id not in existing:
+                entry.actor_id = None
+            if entry.target_user_id not in existing:
+                entry.target_user_id = None
+        with transaction.atomic():
+            AuditLog.objects.bulk_create(entries, batch_size=batch_size)
+
+
+def _is_due():
+    with _lock:
+        if not _buffer:
+            return False
+        return (
+            len(_buffer) >= settings.AUDIT_LOG_BUFFER_SIZE
+            or time.monotonic() - _oldest >= settings.AUDIT_LOG_FLUSH_INTERVAL
+        )
+
+
+def _flusher_loop():
+    while True:
+        _wakeup.wait(timeout=settings.AUDIT_LOG_FLUSH_INTERVAL / 2)
+        _wakeup.clear()
+        if _is_due():
+            flush()
+            connections.close_all()
+
+
+def _start_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flusher_loop, name='aya-audit-flusher', daemon=True)
+            _flusher.start()
+
+
+# --- ФИЛЬТРАЦИЯ ЖУРНАЛА ---
+def _day_start(value):
+    day = parse_date(value or '')
+    if day is None:
+        return None
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def parse_filters(params):
+    """
+    Разбирает GET-параметры журнала в словарь условий:
+    actor (id), target (id или часть ФИО), type (тип объекта), object (id),
+    action (код), date_from / date_to (ГГГГ-ММ-ДД, включительно).
+    Используется и для таблицы, и для архива (users/audit_archive.py).
+    """
+    criteria = {}
+    actor = params.get('actor') or ''
+    target = (params.get('target') or '').strip()
+    object_id = params.get('object') or ''
+    if actor.isdigit():
+        criteria['actor'] = int(actor)
+    if target.isdigit():
+        criteria['target'] = int(target)
+    elif target:
+        criteria['target_query'] = target
+    if params.get('type'):
+        criteria['object_type'] = params['type']
+        if object_id.isdigit():
+            criteria['object_id'] = int(object_id)
+    if params.get('action'):
+        criteria['action_code'] = params['action']
+
+    date_from = _day_start(params.get('date_from'))
+    date_to = _day_start(params.get('date_to'))
+    if date_from:
+        criteria['since'] = date_from
+    if date_to:
+        # Граница — начало следующего дня, а не created_at__date: так работает индекс
+        criteria['until'] = date_to + timedelta(days=1)
+    return criteria
+
+
+def filter_logs(queryset, params):
+    """Применяет к queryset журнала фильтры из GET-параметров (см. parse_filters)."""
+    criteria = parse_filters(params)
+    if 'actor' in criteria:
+        queryset = queryset.filter(actor_id=criteria['actor'])
+    if 'target' in criteria:
+        queryset = queryset.filter(target_user_id=criteria['target'])
+    if 'target_query' in criteria:
+        queryset = queryset.filter(target_user__in=filter_by_search(User.objects.all(), criteria['target_query'], usernames=True))
+    for field in ('object_type', 'object_id', 'action_code'):
+        if field in criteria:
+            queryset = queryset.filter(**{field: criteria[field]})
+    if 'since' in criteria:
+        queryset = queryset.filter(created_at__gte=criteria['since'])
+    if 'until' in criteria:
+        queryset = queryset.filter(created_at__lt=criteria['until'])
+    return queryset
+
+
+def _reset_after_fork():
+    # Дочерний процесс не должен второй раз записать буфер родителя
+    global _buffer, _oldest, _lock, _flush_lock, _wakeup, _flusher
+    _buffer, _oldest, _flusher = [], None, None
+    _lock, _flush_lock, _wakeup = threading.Lock(), threading.Lock(), threading.Event()
+
+
+atexit.register(flush)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
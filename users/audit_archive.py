@@ -0,0 +1,320 @@
+# users/audit_archive.py
+"""
+Архив журнала действий.
+
+Записи старше AUDIT_LOG_ARCHIVE_AFTER_DAYS дней переносятся из таблицы
+AuditLog в помесячные сегменты — сжатые файлы JSON Lines:
+    <AUDIT_LOG_ARCHIVE_DIR>/2024-05.jsonl.gz
+Каждая пачка переноса дописывается в сегмент отдельным gzip-блоком,
+отсортированным по (время, id), поэтому уже записанное не переписывается.
+Рядом лежит index.json: для каждого сегмента — интервал времени, число
+записей, какие пользователи, цели и типы объектов в нем встречаются, и
+список блоков (смещение, размер, интервал времени и id). По индексу при
+поиске пропускаются сегменты и блоки, в которых заведомо нет подходящих
+записей, а читаются блоки потоком: в памяти — только те, что пересекаются
+по времени (их записи сливаются по порядку).
+
+Журнал (audit_log_view) листается сквозь таблицу и архив одним курсором:
+archived_rows() подключается к paginate_keyset как дополнительный источник.
+"""
+import gzip
+import io
+import json
+import operator
+import os
+from collections import deque
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import audit
+from .models import AuditLog, User
+from .search import filter_by_search
+
+INDEX_NAME = 'index.json'
+
+# Поля, которые сохраняются в архиве
+FIELDS = (
+    'id', 'created_at', 'actor_id', 'target_user_id', 'action',
+    'action_code', 'object_type', 'object_id', 'payload',
+)
+
+
+def archive_dir():
+    return settings.AUDIT_LOG_ARCHIVE_DIR
+
+
+def segment_path(key):
+    return os.path.join(archive_dir(), f'{key}.jsonl.gz')
+
+
+# --- ИНДЕКС ---
+def load_index():
+    try:
+        with open(os.path.join(archive_dir(), INDEX_NAME), encoding='utf-8') as index_file:
+            return json.load(index_file)
+    except FileNotFoundError:
+        return {'segments': {}}
+
+
+def save_index(index):
+    # Через временный файл: читатель никогда не увидит недописанный индекс
+    path = os.path.join(archive_dir(), INDEX_NAME)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as index_file:
+        json.dump(index, index_file, ensure_ascii=False, indent=1, sort_keys=True)
+        index_file.flush()
+        os.fsync(index_file.fileno())
+    os.replace(f'{path}.tmp', path)
+
+
+def _update_meta(meta, chunk, rows):
+    """Добавляет блок в описание сегмента. Все сводные поля выводятся из блоков заново."""
+    meta['chunks'] = [*meta.get('chunks', []), chunk]
+    meta['count'] = sum(item['count'] for item in meta['chunks'])
+    meta['from'] = min(item['from'] for item in meta['chunks'])
+    meta['to'] = max(item['to'] for item in meta['chunks'])
+    for name, field in (('actors', 'actor_id'), ('targets', 'target_user_id'), ('object_types', 'object_type')):
+        values = set(meta.get(name, [])) | {row[field] for row in rows if row[field]}
+        meta[name] = sorted(values)
+
+
+# --- ПЕРЕНОС В АРХИВ ---
+def _utc(value):
+    # Время хранится строкой в UTC с микросекундами: такие строки сравниваются так же, как даты
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%f+00:00')
+
+
+def serialize_row(row):
+    return {**row, 'created_at': _utc(row['created_at'])}
+
+
+def _position(row):
+    return row['created_at'], row['id']
+
+
+def _segment_end(meta):
+    return max((chunk['offset'] + chunk['size'] for chunk in meta.get('chunks', [])), default=0)
+
+
+def _append_segment(key, meta, rows):
+    """Дописывает rows (уже отсортированные) новым блоком. Возвращает описание блока для индекса."""
+    end = _segment_end(meta)
+    with open(segment_path(key), 'ab') as raw:
+        # Хвост от прерванного запуска, который не попал в индекс, — отбрасываем
+        raw.truncate(end)
+        with gzip.GzipFile(fileobj=raw, mode='wb') as segment:
+            for row in rows:
+                segment.write(json.dumps(row, ensure_ascii=False).encode('utf-8') + b'\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+        size = os.fstat(raw.fileno()).st_size - end
+    ids = [row['id'] for row in rows]
+    return {
+        'offset': end, 'size': size, 'count': len(rows),
+        'from': rows[0]['created_at'], 'to': rows[-1]['created_at'], 'min_id': min(ids), 'max_id': max(ids),
+    }
+
+
+def _not_archived(key, meta, rows):
+    """
+    rows без тех, что уже есть в сегменте: сбой между записью индекса и
+    удалением строк из таблицы не должен дать повтор при следующем запуске.
+    Читаются только блоки, чей интервал id пересекается с пачкой.
+    """
+    low, high = rows[0]['id'], rows[-1]['id']
+    archived = {
+        row['id']
+        for chunk in meta.get('chunks', []) if chunk['min_id'] <= high and chunk['max_id'] >= low
+        for row in _chunk_rows(key, chunk)
+    }
+    return [row for row in rows if row['id'] not in archived]
+
+
+def _month_bounds(day):
+    start = timezone.make_aware(datetime(day.year, day.month, 1))
+    end = timezone.make_aware(datetime(day.year + day.month // 12, day.month % 12 + 1, 1))
+    return start, end
+
+
+def archive_logs(before=None, batch_size=2000, dry_run=False):
+    """
+    Переносит записи старше before (по умолчанию — AUDIT_LOG_ARCHIVE_AFTER_DAYS
+    дней назад) в сегменты и удаляет их из таблицы. Возвращает {месяц: число}.
+    Строки удаляются только после записи сегмента и индекса, поэтому сбой
+    посередине не теряет записи, а повторный запуск не дублирует их.
+    """
+    before = before or timezone.now() - timedelta(days=settings.AUDIT_LOG_ARCHIVE_AFTER_DAYS)
+    audit.flush()
+    old = AuditLog.objects.filter(created_at__lt=before)
+    moved = {}
+    if not dry_run:
+        os.makedirs(archive_dir(), exist_ok=True)
+    index = load_index()
+    for day in old.dates('created_at', 'month'):
+        start, end = _month_bounds(day)
+        key = start.strftime('%Y-%m')
+        month = old.filter(created_at__gte=start, created_at__lt=end).order_by('id')
+        if dry_run:
+            moved[key] = month.count()
+            continue
+        last_id = 0
+        while True:
+            rows = [serialize_row(row) for row in month.filter(id__gt=last_id).values(*FIELDS)[:batch_size]]
+            if not rows:
+                break
+            meta = index['segments'].setdefault(key, {})
+            fresh = sorted(_not_archived(key, meta, rows), key=_position)
+            if fresh:
+                _update_meta(meta, _append_segment(key, meta, fresh), fresh)
+                save_index(index)
+            AuditLog.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+            last_id = rows[-1]['id']
+            moved[key] = moved.get(key, 0) + len(rows)
+    return moved
+
+
+# --- ЧТЕНИЕ ---
+def _chunk_rows(key, chunk):
+    """Записи одного блока по порядку (время, id), по строке за раз."""
+    with open(segment_path(key), 'rb') as raw:
+        raw.seek(chunk['offset'])
+        data = raw.read(chunk['size'])
+    with gzip.GzipFile(fileobj=io.BytesIO(data)) as lines:
+        for line in lines:
+            yield json.loads(line)
+
+
+def segment_rows(key, meta, reverse=False, start=None):
+    """
+    Записи сегмента по порядку (время, id), при reverse — от новых к старым.
+    start — время (строка, как в архиве), с которого начинать: блоки целиком
+    по другую его сторону не читаются.
+
+    Блоки сливаются по порядку, а открывается блок только тогда, когда до его
+    границы дошла очередь, поэтому в памяти одновременно лишь пересекающиеся
+    по времени блоки (обратный порядок требует прочитать блок целиком —
+    он не больше пачки переноса). Повторы идут подряд и отбрасываются.
+    """
+    chunks = meta.get('chunks', [])
+    if start is not None:
+        chunks = [chunk for chunk in chunks if (chunk['from'] <= start if reverse else chunk['to'] >= start)]
+    bound = 'to' if reverse else 'from'
+    pending = deque(sorted(enumerate(chunks), key=lambda item: item[1][bound], reverse=reverse))
+    comes_first = operator.gt if reverse else operator.lt
+    heads = {}  # номер блока -> (позиция, запись, итератор)
+    previous = None
+    while pending or heads:
+        number = (max if reverse else min)(heads, key=lambda item: heads[item][0]) if heads else None
+        if pending and (number is None or not comes_first(heads[number][0][0], pending[0][1][bound])):
+            # В очередном блоке могут быть записи раньше текущей — подключаем его
+            chunk_number, chunk = pending.popleft()
+            rows = reversed(list(_chunk_rows(key, chunk))) if reverse else _chunk_rows(key, chunk)
+            _advance(heads, chunk_number, iter(rows))
+            continue
+        position, row, rows = heads.pop(number)
+        if position != previous:
+            previous = position
+            yield row
+        _advance(heads, number, rows)
+
+
+def _advance(heads, number, rows):
+    row = next(rows, None)
+    if row is not None:
+        heads[number] = (_position(row), row, rows)
+
+
+def iter_archive(reverse=False):
+    """Все записи архива по порядку времени (для выгрузки) — потоком, без загрузки сегментов целиком."""
+    segments = load_index()['segments']
+    for key in sorted(segments, reverse=reverse):
+        yield from segment_rows(key, segments[key], reverse)
+
+
+class ArchivedLog:
+    """Запись журнала из архива — с теми же атрибутами, что и AuditLog, для шаблона."""
+    is_archived = True
+
+    def __init__(self, row):
+        self.__dict__.update(row)
+        self.pk = row['id']
+        self.created_at = parse_datetime(row['created_at'])
+        self.actor = self.target_user = None
+
+
+def _segment_may_match(meta, criteria):
+    if 'since' in criteria and meta['to'] < _utc(criteria['since']):
+        return False
+    if 'until' in criteria and meta['from'] >= _utc(criteria['until']):
+        return False
+    if 'actor' in criteria and criteria['actor'] not in meta.get('actors', []):
+        return False
+    if 'target_ids' in criteria and not criteria['target_ids'].intersection(meta.get('targets', [])):
+        return False
+    if 'object_type' in criteria and criteria['object_type'] not in meta.get('object_types', []):
+        return False
+    return True
+
+
+def row_matches(row, criteria):
+    checks = (
+        ('actor', 'actor_id'), ('object_type', 'object_type'),
+        ('object_id', 'object_id'), ('action_code', 'action_code'),
+    )
+    if any(field in criteria and row[column] != criteria[field] for field, column in checks):
+        return False
+    if 'target_ids' in criteria and row['target_user_id'] not in criteria['target_ids']:
+        return False
+    if 'since' in criteria and row['created_at'] < _utc(criteria['since']):
+        return False
+    if 'until' in criteria and row['created_at'] >= _utc(criteria['until']):
+        return False
+    return True
+
+
+def archived_rows(criteria, values, forward, limit):
+    """
+    Источник для paginate_keyset(keys=('-created_at', '-id'), extra=...):
+    до limit записей архива строго после курсора values (forward — к старым)
+    или строго перед ним (к новым). Пользователи подгружаются одним запросом.
+    """
+    segments = load_index()['segments']
+    if not segments:
+        return []
+    criteria = dict(criteria)
+    if 'target' in criteria:
+        criteria['target_ids'] = {criteria.pop('target')}
+    if 'target_query' in criteria:
+        query = criteria.pop('target_query')
+        criteria['target_ids'] = set(filter_by_search(User.objects.all(), query, usernames=True).values_list('pk', flat=True))
+
+    cursor = None
+    if values is not None:
+        moment = parse_datetime(values[0]) if isinstance(values[0], str) else values[0]
+        cursor = (_utc(moment), values[1])
+
+    found = []
+    for key in sorted(segments, reverse=forward):
+        meta = segments[key]
+        if cursor and (meta['from'] > cursor[0] if forward else meta['to'] < cursor[0]):
+            continue
+        if not _segment_may_match(meta, criteria):
+            continue
+        for row in segment_rows(key, meta, reverse=forward, start=cursor[0] if cursor else None):
+            position = _position(row)
+            if cursor and (position >= cursor if forward else position <= cursor):
+                continue
+            if row_matches(row, criteria):
+                found.append(ArchivedLog(row))
+                if len(found) >= limit:
+                    break
+        if len(found) >= limit:
+            break
+
+    users = User.objects.in_bulk({pk for log in found for pk in (log.actor_id, log.target_user_id) if pk})
+    for log in found:
+        log.actor = users.get(log.actor_id)
+        log.target_user = users.get(log.target_user_id)
+    return found
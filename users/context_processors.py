@@ -1,15 +1,26 @@
 # users/context_processors.py
+from .about import get_about_page
 from .models import Notification
 
 def notifications_processor(request):
     """
     Этот процессор добавляет информацию о непрочитанных уведомлениях
     в контекст каждого шаблона, чтобы колокольчик 🔔 работал на всех страницах.
+
+    Число берется из денормализованного счетчика пользователя (без запроса
+    к Notification), а список — ленивый queryset: запрос выполнится, только
+    если шаблон действительно начнет его перебирать.
     """
     if request.user.is_authenticated:
-        unread_notifications = Notification.objects.filter(recipient=request.user, is_read=False)
         return {
-            'unread_notifications': unread_notifications,
-            'unread_notifications_count': unread_notifications.count(),
+            'unread_notifications': Notification.objects.filter(recipient=request.user, is_read=False),
+            'unread_notifications_count': request.user.unread_notifications_count,
         }
-    return {}
\ No newline at end of file
+    return {}
+
+def site_contacts_processor(request):
+    """
+    Контакты организации для футера (AboutPage). Запись берется из памяти
+    процесса (users/about.py), так что на каждой странице это 0 запросов к БД.
+    """
+    return {'site_contacts': get_about_page()}
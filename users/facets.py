@@ -0,0 +1,202 @@
+# users/facets.py
+"""
+Индекс фильтров (фасетов) для базы волонтеров.
+
+Вместо трех DISTINCT-запросов по таблице User на каждый показ страницы
+значения факультетов, курсов и городов вместе с количеством волонтеров
+хранятся в сводной таблице VolunteerFacet. Таблица обновляется сигналами
+User точечно, через F()-выражения: pre_save / pre_delete запоминают старые
+значения, post_save / post_delete переносят пользователя между фасетами.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import User, VolunteerFacet
+from .search import filter_by_search
+
+# Поля пользователя, по которым строятся фильтры
+FACET_FIELDS = ('faculty', 'course', 'city')
+
+# Поля, изменение которых влияет на индекс
+TRACKED_FIELDS = frozenset(FACET_FIELDS) | {'is_approved'}
+
+
+# --- ФИЛЬТРАЦИЯ СПИСКА ВОЛОНТЕРОВ ---
+def apply_volunteer_filters(queryset, params, skip=None):
+    """
+    Применяет к queryset фильтры из GET-параметров страницы волонтеров.
+    skip — имя фасета, фильтр по которому нужно пропустить
+    (нужно для подсчета "сколько будет, если выбрать это значение").
+    """
+    query = params.get('query')
+    gender = params.get('gender')
+    direction = params.get('direction')
+    status = params.get('status')
+
+    if query:
+        queryset = filter_by_search(queryset, query)
+    for field in FACET_FIELDS:
+        value = params.get(field)
+        if value and field != skip:
+            queryset = queryset.filter(**{field: value})
+    if gender:
+        queryset = queryset.filter(gender=gender)
+    if direction:
+        queryset = queryset.filter(directions__id=direction)
+    if status:
+        if status == 'active':
+            queryset = queryset.filter(is_active_volunteer_title=True)
+        if status == 'leader':
+            queryset = queryset.filter(role='leader')
+        if status == 'school_leader':
+            queryset = queryset.filter(school_leader_of__isnull=False).distinct()
+        if status == 'president':
+            queryset = queryset.filter(role='president')
+    return queryset
+
+
+def _has_filters(params, skip=None):
+    keys = ('query', 'gender', 'direction', 'status') + FACET_FIELDS
+    return any(params.get(key) for key in keys if key != skip)
+
+
+def _sort_key(facet):
+    # Курсы сортируем как числа, остальное — по алфавиту
+    if facet == 'course':
+        return lambda item: int(item['value']) if item['value'].isdigit() else 0
+    return lambda item: item['value']
+
+
+def get_facet_counts(params=None):
+    """
+    Возвращает {'faculty': [...], 'course': [...], 'city': [...]}, где каждый
+    элемент — словарь {'value', 'count', 'picked_count'}.
+    count — сколько всего одобренных волонтеров с этим значением (из индекса,
+    один запрос на все фасеты); picked_count — сколько их останется, если
+    выбрать это значение при текущих остальных фильтрах.
+    """
+    params = params or {}
+    facets = {field: [] for field in FACET_FIELDS}
+    for facet, value, count in VolunteerFacet.objects.filter(count__gt=0).values_list('facet', 'value', 'count'):
+        facets[facet].append({'value': value, 'count': count, 'picked_count': count})
+
+    for field in FACET_FIELDS:
+        items = facets[field]
+        items.sort(key=_sort_key(field))
+        if not items or not _has_filters(params, skip=field):
+            continue
+        # Есть другие активные фильтры — считаем условные количества одним GROUP BY
+        base = apply_volunteer_filters(User.objects.filter(is_approved=True), params, skip=field)
+        picked = {
+            str(row[field]): row['n']
+            for row in base.order_by().values(field).annotate(n=Count('pk', distinct=True))
+        }
+        for item in items:
+            item['picked_count'] = picked.get(item['value'], 0)
+    return facets
+
+
+# --- ПОДДЕРЖКА ИНДЕКСА ---
+def facet_values(values):
+    """Какие пары (фасет, значение) дает пользователь с такими полями."""
+    if not values.get('is_approved'):
+        return set()
+    pairs = set()
+    for field in FACET_FIELDS:
+        value = values.get(field)
+        if value is None or value == '':
+            continue
+        pairs.add((field, str(value)))
+    return pairs
+
+
+def _increment(facet, value):
+    updated = VolunteerFacet.objects.filter(facet=facet, value=value).update(count=F('count') + 1)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            VolunteerFacet.objects.create(facet=facet, value=value, count=1)
+    except IntegrityError:
+        # Параллельный запрос успел создать строку — просто увеличиваем
+        VolunteerFacet.objects.filter(facet=facet, value=value).update(count=F('count') + 1)
+
+
+def _decrement(facet, value):
+    VolunteerFacet.objects.filter(facet=facet, value=value, count__gt=0).update(count=F('count') - 1)
+    VolunteerFacet.objects.filter(facet=facet, value=value, count=0).delete()
+
+
+def apply_change(old_values, new_values):
+    """Переносит одного пользователя из старых значений фасетов в новые."""
+    old_pairs = facet_values(old_values) if old_values is not None else set()
+    new_pairs = facet_values(new_values) if new_values is not None else set()
+    for facet, value in old_pairs - new_pairs:
+        _decrement(facet, value)
+    for facet, value in new_pairs - old_pairs:
+        _increment(facet, value)
+
+
+def rebuild_facets():
+    """Полностью пересчитывает индекс по таблице User (для команды rebuild_facets)."""
+    rows = []
+    approved = User.objects.filter(is_approved=True).order_by()
+    for field in FACET_FIELDS:
+        values = approved.exclude(**{f'{field}__isnull': True})
+        if field != 'course':
+            values = values.exclude(**{field: ''})
+        for row in values.values(field).annotate(n=Count('pk')):
+            rows.append(VolunteerFacet(facet=field, value=str(row[field]), count=row['n']))
+    with transaction.atomic():
+        VolunteerFacet.objects.all().delete()
+        VolunteerFacet.objects.bulk_create(rows)
+    return len(rows)
+
+
+# --- ОБРАБОТЧИКИ СИГНАЛОВ ---
+def _old_values(instance):
+    """
+    Значения отслеживаемых полей в БД до сохранения (None — строки нет).
+    Берутся из _loaded_values (User.from_db); поля, которых там нет
+    (.only()/.defer(), объект создан вручную), — одним SELECT этой строки.
+    """
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    old = {field: loaded[field] for field in TRACKED_FIELDS if field in loaded}
+    missing = TRACKED_FIELDS.difference(old)
+    if missing:
+        row = type(instance)._base_manager.filter(pk=instance.pk).values(*missing).first()
+        if row is None:
+            return None
+        old.update(row)
+    return old
+
+
+def user_pre_save(sender, instance, update_fields=None, **kwargs):
+    if instance.pk is None:
+        return
+    if update_fields is not None and not TRACKED_FIELDS.intersection(update_fields):
+        return
+    instance._facet_old_values = _old_values(instance)
+
+
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not TRACKED_FIELDS.intersection(update_fields):
+        return
+    old_values = None if created else instance.__dict__.pop('_facet_old_values', None)
+    # Отложенные поля save() не записывает — их значение не изменилось
+    deferred = instance.get_deferred_fields()
+    new_values = {
+        field: old_values[field] if old_values is not None and field in deferred else getattr(instance, field)
+        for field in TRACKED_FIELDS
+    }
+    apply_change(old_values, new_values)
+    # Следующее сохранение этого же объекта должно сравниваться с новыми значениями
+    instance._loaded_values = {**(getattr(instance, '_loaded_values', None) or {}), **new_values}
+
+
+def user_pre_delete(sender, instance, **kwargs):
+    instance._facet_old_values = _old_values(instance)
+
+
+def user_deleted(sender, instance, **kwargs):
+    apply_change(instance.__dict__.pop('_facet_old_values', None), None)
@@ -0,0 +1,30 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from users.audit_archive import archive_logs
+
+
+class Command(BaseCommand):
+    help = "Переносит старые записи журнала действий в помесячные сжатые архивы (users/audit_archive.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help="Архивировать записи старше N дней (по умолчанию AUDIT_LOG_ARCHIVE_AFTER_DAYS)",
+        )
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--dry-run', action='store_true', help="Только показать, сколько записей будет перенесено")
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else settings.AUDIT_LOG_ARCHIVE_AFTER_DAYS
+        moved = archive_logs(
+            before=timezone.now() - timedelta(days=days),
+            batch_size=options['batch_size'], dry_run=options['dry_run'],
+        )
+        for month, count in sorted(moved.items()):
+            self.stdout.write(f"{month}: {count}")
+        verb = "Будет перенесено" if options['dry_run'] else "Перенесено в архив"
+        self.stdout.write(self.style.SUCCESS(f"{verb}: {sum(moved.values())} записей."))
@@ -0,0 +1,80 @@
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+
+from users import audit
+from users.models import AuditLog, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк журнала действий: задержка запросов администраторов, работающих "
+        "одновременно, при прямой записи в AuditLog и через буфер (users/audit.py). "
+        "Работает на временной файловой копии схемы SQLite."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Сколько администраторов работает одновременно")
+        parser.add_argument('--requests', type=int, default=300, help="Запросов на одного администратора")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError("Бенчмарк рассчитан на SQLite.")
+        with tempfile.TemporaryDirectory() as directory:
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = os.path.join(directory, 'bench_audit.sqlite3')
+            old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            try:
+                # Буфер должен работать по-настоящему, даже если включен режим 'sync'
+                with override_settings(BACKGROUND_TASKS_MODE='thread'):
+                    self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        threads, requests = options['threads'], options['requests']
+        # bulk_create — без сигналов (QR-коды, индексы), они здесь только мешают
+        User.objects.bulk_create(User(username=f'bench-admin-{i}', role='worker') for i in range(threads))
+        admins = list(User.objects.values_list('pk', flat=True))
+
+        for mode in ('direct', 'buffered'):
+            AuditLog.objects.all().delete()
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                timings = sum(pool.map(lambda pk: self.admin_session(pk, mode, requests), admins), [])
+            elapsed = time.perf_counter() - started
+            audit.flush()
+            written = AuditLog.objects.count()
+
+            timings.sort()
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            p99 = timings[int(len(timings) * 0.99) - 1]
+            self.stdout.write(
+                f"{mode:>8}: {len(timings)} запросов за {elapsed:.2f} с; "
+                f"p50 {statistics.median(timings):.2f} мс, p95 {p95:.2f} мс, p99 {p99:.2f} мс, "
+                f"max {timings[-1]:.2f} мс; записей в журнале: {written}"
+            )
+            if written != len(timings):
+                raise CommandError(f"Потеряны записи журнала: {written} из {len(timings)}")
+
+    def admin_session(self, actor_id, mode, requests):
+        timings = []
+        try:
+            for i in range(requests):
+                started = time.perf_counter()
+                # "Запрос": прочитать карточку пользователя и записать действие в журнал
+                name = User.objects.filter(pk=actor_id).values_list('username', flat=True).first()
+                action = f"Отредактировал профиль: {name} (#{i})"
+                if mode == 'direct':
+                    AuditLog.objects.create(actor_id=actor_id, action=action, target_user_id=actor_id)
+                else:
+                    audit.record(actor_id, action, target=actor_id)
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            connections.close_all()
+        return timings
@@ -0,0 +1,105 @@
+import random
+import sqlite3
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.search import (
+    CREATE_TABLE_SQL, build_search_key, fetch_candidates, normalize, rank_candidates,
+)
+
+# Фамилии собираются из корня и окончания, чтобы распределение было похоже
+# на настоящее: несколько тысяч разных фамилий, часть из них частые.
+ROOTS = [
+    'Алӣ', 'Бобо', 'Вали', 'Ғанӣ', 'Давлат', 'Ёқуб', 'Ҷӯра', 'Зоир', 'Исмоил', 'Карим',
+    'Латиф', 'Маҳмуд', 'Назар', 'Одина', 'Пӯлод', 'Раҳим', 'Сафар', 'Турсун', 'Умар',
+    'Файзулло', 'Ҳаким', 'Шариф', 'Эмом', 'Юсуф', 'Ятим', 'Қодир', 'Ҳасан', 'Ҷалол',
+    'Ғафур', 'Иван', 'Саид', 'Нур', 'Амин', 'Бахтиёр', 'Дилшод', 'Фарҳод', 'Собир',
+    'Толиб', 'Мирзо', 'Шодмон', 'Баҳром', 'Зафар', 'Нозим', 'Ориф', 'Рустам', 'Сино',
+    'Хуршед', 'Ҷамшед', 'Комрон', 'Меҳроб', 'Неъмат', 'Олим', 'Саъдӣ', 'Темур',
+]
+SUFFIXES = ['ов', 'ев', 'зода', 'ӣ', 'иён', 'заде', 'ова', 'ева', 'пур', 'бек']
+FIRST_NAMES = [
+    'Анвар', 'Бахтиёр', 'Далер', 'Зарина', 'Илҳом', 'Камила', 'Лола', 'Манучеҳр',
+    'Нигина', 'Парвиз', 'Рустам', 'Сабина', 'Таҳмина', 'Умед', 'Фарангис', 'Шаҳзод',
+    'Мадина', 'Фирӯза', 'Сиёвуш', 'Ситора', 'Хусрав', 'Шабнам', 'Ёсуман', 'Азиз',
+]
+
+
+class _Cursor:
+    """Курсор sqlite3 с плейсхолдерами %s, как у курсора Django."""
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def execute(self, sql, params):
+        self.cursor.execute(sql.replace('%s', '?'), params)
+
+    def fetchall(self):
+        return self.cursor.fetchall()
+
+
+class Command(BaseCommand):
+    help = (
+        "Бенчмарк поиска волонтеров: строит FTS5-индекс на N синтетических "
+        "пользователей в памяти и замеряет время запросов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--budget-ms', type=float, default=10.0, help="Допустимое p95 одного поиска")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def make_user(self, rng, i):
+        # Частота фамилий убывает по закону Ципфа, как в реальных списках
+        root = ROOTS[min(int(rng.paretovariate(1.2)) - 1, len(ROOTS) - 1)] if rng.random() < 0.3 else rng.choice(ROOTS)
+        first = rng.choice(FIRST_NAMES)
+        return {
+            'id': i,
+            'last_name': root + rng.choice(SUFFIXES),
+            'first_name': first,
+            'patronymic': rng.choice(ROOTS) + rng.choice(['ович', 'овна', '']),
+            'username': f'{normalize(first)}{i}',
+        }
+
+    def make_query(self, rng, user):
+        # Кусок фамилии или имени, как при наборе с клавиатуры, в случайной раскладке
+        name = rng.choice([user['last_name'], user['first_name']])
+        start = rng.randint(0, max(0, len(name) - 4))
+        chunk = name[start:start + rng.randint(3, 6)]
+        return normalize(chunk) if rng.random() < 0.3 else chunk
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        db = sqlite3.connect(':memory:')
+        db.execute(CREATE_TABLE_SQL.format(table='users_usersearch'))
+
+        users = [self.make_user(rng, i) for i in range(1, options['users'] + 1)]
+        started = time.perf_counter()
+        db.executemany(
+            'INSERT INTO users_usersearch(rowid, key) VALUES (?, ?)',
+            ((user['id'], build_search_key(user)) for user in users),
+        )
+        db.commit()
+        self.stdout.write(f"Индекс на {len(users)} пользователей построен за {time.perf_counter() - started:.2f} с")
+
+        timings = []
+        cursor = _Cursor(db.cursor())
+        for _ in range(options['queries']):
+            query = self.make_query(rng, rng.choice(users))
+            # Тот же путь, что и ranked_search: кандидаты из индекса + ранжирование
+            started = time.perf_counter()
+            rank_candidates(fetch_candidates(cursor, query), query, 10)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        p50 = statistics.median(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"Запросов: {len(timings)}; p50 {p50:.2f} мс, p95 {p95:.2f} мс, max {timings[-1]:.2f} мс"
+        )
+        if p95 > options['budget_ms']:
+            raise CommandError(f"p95 {p95:.2f} мс превышает бюджет {options['budget_ms']} мс")
+        self.stdout.write(self.style.SUCCESS("Поиск укладывается в бюджет."))
@@ -0,0 +1,62 @@
+import gzip
+import json
+import sys
+
+from django.core.management.base import BaseCommand
+
+from users.audit import parse_filters
+from users.audit_archive import FIELDS, iter_archive, row_matches, serialize_row
+from users.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Выгружает журнал действий (архив + таблица) в JSON Lines по порядку времени. "
+        "Записи читаются потоком, весь журнал в память не загружается."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', '-o', default='-', help="Файл (*.gz — со сжатием) или '-' для stdout")
+        parser.add_argument('--actor', help="id пользователя")
+        parser.add_argument('--type', help="Тип объекта, например events.event")
+        parser.add_argument('--action', help="Код действия, например user.role")
+        parser.add_argument('--date-from', help="ГГГГ-ММ-ДД")
+        parser.add_argument('--date-to', help="ГГГГ-ММ-ДД, включительно")
+
+    def open_output(self, path):
+        if path == '-':
+            return sys.stdout.buffer
+        if path.endswith('.gz'):
+            return gzip.open(path, 'wb')
+        return open(path, 'wb')
+
+    def handle(self, *args, **options):
+        params = {
+            'actor': options['actor'], 'type': options['type'], 'action': options['action'],
+            'date_from': options['date_from'], 'date_to': options['date_to'],
+        }
+        criteria = parse_filters({key: value for key, value in params.items() if value})
+
+        output = self.open_output(options['output'])
+        count = 0
+        try:
+            for row in iter_archive():
+                if row_matches(row, criteria):
+                    output.write(json.dumps(row, ensure_ascii=False).encode('utf-8') + b'\n')
+                    count += 1
+            live = AuditLog.objects.filter(**_live_filters(criteria)).order_by('created_at', 'id')
+            for row in live.values(*FIELDS).iterator(chunk_size=2000):
+                output.write(json.dumps(serialize_row(row), ensure_ascii=False).encode('utf-8') + b'\n')
+                count += 1
+        finally:
+            if output is not sys.stdout.buffer:
+                output.close()
+        self.stderr.write(self.style.SUCCESS(f"Выгружено записей: {count}"))
+
+
+def _live_filters(criteria):
+    lookups = {
+        'actor': 'actor_id', 'object_type': 'object_type', 'object_id': 'object_id',
+        'action_code': 'action_code', 'since': 'created_at__gte', 'until': 'created_at__lt',
+    }
+    return {lookup: criteria[key] for key, lookup in lookups.items() if key in criteria}
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users.facets import rebuild_facets
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает индекс фильтров базы волонтеров (факультеты, курсы, города)."
+
+    def handle(self, *args, **options):
+        count = rebuild_facets()
+        self.stdout.write(self.style.SUCCESS(f"Индекс фильтров пересчитан: {count} значений."))
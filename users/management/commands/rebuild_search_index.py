@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from users.models import User
+from users.search import SEARCH_FIELDS, rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = "Пересобирает поисковый индекс волонтеров (FTS5, SQLite)."
+
+    def handle(self, *args, **options):
+        count = rebuild_search_index(User.objects.values('id', *SEARCH_FIELDS).iterator())
+        self.stdout.write(self.style.SUCCESS(f"Поисковый индекс пересобран: {count} пользователей."))
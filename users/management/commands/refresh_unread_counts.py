@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from users.notifications import refresh_unread_counts
+
+
+class Command(BaseCommand):
+    help = "Пересчитывает счетчики непрочитанных уведомлений по таблице Notification."
+
+    def handle(self, *args, **options):
+        count = refresh_unread_counts()
+        self.stdout.write(self.style.SUCCESS(f"Счетчики обновлены: {count} пользователей с непрочитанными."))
@@ -0,0 +1,33 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.models import User
+from users.qr import build_qr_png, profile_url, save_qr_code
+
+
+class Command(BaseCommand):
+    help = "Перерисовывает QR-коды профилей параллельно на всех ядрах."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default=None, help=f"Адрес сайта (по умолчанию SITE_BASE_URL = {settings.SITE_BASE_URL})")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--missing-only', action='store_true', help="Только пользователи без QR-кода")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['missing_only']:
+            users = users.filter(qr_code='')
+        users = list(users.only('pk', 'username', 'qr_code'))
+        urls = [profile_url(user.pk, options['base_url']) for user in users]
+
+        # PNG рисуются в отдельных процессах; запись файлов и БД — здесь,
+        # чтобы дочерним процессам не нужно было соединение с базой.
+        chunksize = max(1, len(urls) // (options['workers'] * 4))
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for user, png in zip(users, pool.map(build_qr_png, urls, chunksize=chunksize)):
+                save_qr_code(user, png)
+
+        self.stdout.write(self.style.SUCCESS(f"QR-коды перерисованы: {len(users)}."))
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:46
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_facets(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    VolunteerFacet = apps.get_model('users', 'VolunteerFacet')
+    approved = User.objects.filter(is_approved=True).order_by()
+    rows = []
+    for field in ('faculty', 'course', 'city'):
+        values = approved.exclude(**{f'{field}__isnull': True})
+        if field != 'course':
+            values = values.exclude(**{field: ''})
+        for row in values.values(field).annotate(n=Count('pk')):
+            rows.append(VolunteerFacet(facet=field, value=str(row[field]), count=row['n']))
+    VolunteerFacet.objects.bulk_create(rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0018_remove_direction_leader_direction_leaders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VolunteerFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[('faculty', 'Факультет'), ('course', 'Курс'), ('city', 'Город')], max_length=20, verbose_name='Фильтр')),
+                ('value', models.CharField(max_length=200, verbose_name='Значение')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество волонтеров')),
+            ],
+            options={
+                'verbose_name': 'Значение фильтра',
+                'verbose_name_plural': 'Значения фильтров',
+                'ordering': ['facet', 'value'],
+                'constraints': [models.UniqueConstraint(fields=('facet', 'value'), name='unique_volunteer_facet_value')],
+            },
+        ),
+        migrations.RunPython(fill_facets, migrations.RunPython.noop),
+    ]
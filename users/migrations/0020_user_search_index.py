@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# Замороженная копия users/search.py на момент миграции: код приложения
+# может меняться, а миграция должна строить индекс всегда одинаково.
+SEARCH_TABLE = 'users_usersearch'
+SEARCH_FIELDS = ('last_name', 'first_name', 'patronymic', 'username')
+CREATE_TABLE_SQL = "CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(key, tokenize='trigram')"
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n',
+    'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f',
+    'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '',
+    'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'ғ': 'gh', 'ӣ': 'i', 'қ': 'q', 'ӯ': 'u', 'ҳ': 'h', 'ҷ': 'j',
+}
+
+
+def normalize(text):
+    text = (text or '').casefold().replace('ё', 'е')
+    return ''.join(TRANSLIT.get(char, char) for char in text)
+
+
+def build_search_key(values):
+    return ' '.join(normalize(values[field]) for field in SEARCH_FIELDS if values[field])
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 есть только в SQLite; на других СУБД поиск работает через icontains
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    User = apps.get_model('users', 'User')
+    schema_editor.execute(CREATE_TABLE_SQL.format(table=SEARCH_TABLE))
+    rows = [(row['id'], build_search_key(row)) for row in User.objects.values('id', *SEARCH_FIELDS).iterator()]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.executemany(f'INSERT INTO {SEARCH_TABLE}(rowid, key) VALUES (%s, %s)', rows)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0019_volunteerfacet'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 00:52
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_unread_counts(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Notification = apps.get_model('users', 'Notification')
+    counts = (
+        Notification.objects.filter(is_read=False)
+        .order_by().values_list('recipient').annotate(n=Count('pk'))
+    )
+    for user_id, count in counts:
+        User.objects.filter(pk=user_id).update(unread_notifications_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0020_user_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='unread_notifications_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Непрочитанных уведомлений'),
+        ),
+        migrations.RunPython(fill_unread_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,119 @@
+# Generated by Django 5.2.7 on 2026-10-18 01:08
+
+import re
+
+from django.db import migrations, models
+
+# Замороженная копия разбора старых текстов из users/audit.py: миграция не
+# должна меняться вместе с кодом приложения.
+LEGACY_PATTERNS = [(re.compile(pattern), code, object_type) for pattern, code, object_type in [
+    (r"^Одобрил пользователя: ", 'user.approve', 'users.user'),
+    (r"^Отклонил \(удалил\) пользователя: ", 'user.reject', 'users.user'),
+    (r"^Автоматически разжаловал .+ до Работника", 'user.demote', 'users.user'),
+    (r"^Изменил роль для .+ на '(?P<role>.*)'$", 'user.role', 'users.user'),
+    (r"^(?P<change>присвоил|снял) статус 'Активный волонтер'", 'user.active_title', 'users.user'),
+    (r"^Отредактировал профиль: ", 'user.edit', 'users.user'),
+    (r"^Создал направление: (?P<object>.+)$", 'direction.create', 'users.direction'),
+    (r"^Удалил направление: (?P<object>.+)$", 'direction.delete', 'users.direction'),
+    (r"^Назначил .+ руководителем направления '(?P<object>.+)'$", 'direction.leader_add', 'users.direction'),
+    (r"^Снял .+ с руководства направлением '(?P<object>.+)'$", 'direction.leader_remove', 'users.direction'),
+    (r"^Создал школу: (?P<object>.+)$", 'school.create', 'users.school'),
+    (r"^Удалил школу: (?P<object>.+)$", 'school.delete', 'users.school'),
+    (r"^Назначил .+ руководителем школы '(?P<object>.+)'$", 'school.leader_add', 'users.school'),
+    (r"^Снял .+ с руководства школой '(?P<object>.+)'$", 'school.leader_remove', 'users.school'),
+    (r"^Отредактировал страницу 'О нас'$", 'about.edit', 'users.aboutpage'),
+    (r"^Создал мероприятие '(?P<object>.+)'$", 'event.create', 'events.event'),
+    (r"^Отредактировал мероприятие '(?P<object>.+)'$", 'event.edit', 'events.event'),
+    (r"^Завершил мероприятие '(?P<object>.+)'$", 'event.finish', 'events.event'),
+    (r"^Обновил отчет '(?P<object>.+)': (?P<details>.*)$", 'event.report', 'events.event'),
+    (r"^Удалил фотографию из отчета '(?P<object>.+)'$", 'event.photo_delete', 'events.event'),
+    (r"^Удалил мероприятие '(?P<object>.+)'$", 'event.delete', 'events.event'),
+]]
+
+
+def parse_action(text):
+    for pattern, code, object_type in LEGACY_PATTERNS:
+        match = pattern.match(text or '')
+        if match:
+            return code, object_type, {key: value for key, value in match.groupdict().items() if value}
+    return '', '', {}
+
+
+def _ids_by_name(model, field):
+    """{название: id} только для однозначных названий."""
+    ids = {}
+    for pk, name in model.objects.values_list('pk', field):
+        ids[name] = None if name in ids else pk
+    return ids
+
+
+def fill_structured_fields(apps, schema_editor):
+    AuditLog = apps.get_model('users', 'AuditLog')
+    names = {
+        'users.direction': _ids_by_name(apps.get_model('users', 'Direction'), 'name'),
+        'users.school': _ids_by_name(apps.get_model('users', 'School'), 'name'),
+        'events.event': _ids_by_name(apps.get_model('events', 'Event'), 'title'),
+    }
+    changed = []
+    for log in AuditLog.objects.filter(action_code='').only('pk', 'action', 'target_user_id').iterator():
+        code, object_type, groups = parse_action(log.action)
+        if not code:
+            continue
+        log.action_code, log.object_type = code, object_type
+        if object_type == 'users.user':
+            log.object_id = log.target_user_id
+        elif object_type == 'users.aboutpage':
+            log.object_id = 1
+        else:
+            log.object_id = names[object_type].get(groups.pop('object', None))
+        log.payload = groups
+        changed.append(log)
+    AuditLog.objects.bulk_update(changed, ['action_code', 'object_type', 'object_id', 'payload'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0022_auditlog_created_at_default'),
+        ('events', '0005_photouploadbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='action_code',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Код действия'),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='object_id',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='ID объекта'),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='object_type',
+            field=models.CharField(blank=True, max_length=50, verbose_name='Тип объекта'),
+        ),
+        migrations.AddField(
+            model_name='auditlog',
+            name='payload',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Подробности'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['created_at'], name='users_audit_created'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['actor', 'created_at'], name='users_audit_actor_created'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['target_user', 'created_at'], name='users_audit_target_created'),
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['object_type', 'object_id'], name='users_audit_object'),
+        ),
+        migrations.RunPython(fill_structured_fields, migrations.RunPython.noop),
+    ]
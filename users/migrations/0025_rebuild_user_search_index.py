@@ -0,0 +1,53 @@
+from django.db import migrations
+
+# Замороженная копия users/search.py на момент миграции: ключ больше не
+# содержит логин, а латинские варианты написания свернуты в один вид.
+SEARCH_TABLE = 'users_usersearch'
+SEARCH_FIELDS = ('last_name', 'first_name', 'patronymic')
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n',
+    'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f',
+    'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '',
+    'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'ғ': 'gh', 'ӣ': 'i', 'қ': 'q', 'ӯ': 'u', 'ҳ': 'h', 'ҷ': 'j',
+}
+LATIN_FOLDS = (
+    ('shch', 'ş'), ('dzh', 'j'), ('dž', 'j'),
+    ('zh', 'ž'), ('sh', 'ş'), ('š', 'ş'), ('ch', 'ç'), ('č', 'ç'),
+    ('kh', 'h'), ('x', 'h'), ('gh', 'ğ'), ('q', 'k'),
+    ('yo', 'e'), ('jo', 'e'), ('ī', 'i'), ('ı', 'i'), ('ū', 'u'),
+)
+
+
+def normalize(text):
+    text = (text or '').casefold().replace('ё', 'е')
+    text = ''.join(TRANSLIT.get(char, char) for char in text)
+    for variant, canonical in LATIN_FOLDS:
+        text = text.replace(variant, canonical)
+    return text
+
+
+def rebuild_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    User = apps.get_model('users', 'User')
+    rows = [
+        (row['id'], ' '.join(normalize(row[field]) for field in SEARCH_FIELDS if row[field]))
+        for row in User.objects.values('id', *SEARCH_FIELDS).iterator()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.executemany(f'INSERT INTO {SEARCH_TABLE}(rowid, key) VALUES (%s, %s)', rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0024_hot_query_indexes'),
+    ]
+
+    operations = [
+        # Обратно не пересобираем: старый ключ отличается только вариантами написания
+        migrations.RunPython(rebuild_search_index, migrations.RunPython.noop),
+    ]
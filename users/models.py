@@ -1,9 +1,7 @@
 # users/models.py
 from django.db import models
 from django.contrib.auth.models import AbstractUser
-from io import BytesIO
-from django.core.files import File
-import qrcode
+from django.utils import timezone
 
 class Direction(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name="Название направления")
@@ -57,25 +55,66 @@ class User(AbstractUser):
     phone_privacy = models.CharField(max_length=15, choices=PRIVACY_CHOICES, default='private')
     telegram_privacy = models.CharField(max_length=15, choices=PRIVACY_CHOICES, default='private')
     qr_code = models.ImageField(upload_to='qr_codes/', blank=True, verbose_name="QR-код")
+    # Денормализованный счетчик непрочитанных уведомлений (для колокольчика в base.html).
+    # Поддерживается users/notifications.py, читать его можно без запроса к Notification.
+    unread_notifications_count = models.PositiveIntegerField(default=0, editable=False, verbose_name="Непрочитанных уведомлений")
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Список волонтеров: одобренные по фамилии (id в SQLite входит в индекс сам).
+            # Частичный индекс — см. комментарий у индексов Event
+            models.Index(fields=['last_name'], condition=models.Q(is_approved=True), name='users_user_approved_name'),
+            # Президент на главной, администрация, получатели рассылок
+            models.Index(fields=['role', 'is_approved'], name='users_user_role_approved'),
+            # Очередь модерации (панель модератора, /metrics)
+            models.Index(fields=['date_joined'], condition=models.Q(is_approved=False), name='users_user_pending'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Запоминаем значения, загруженные из БД, чтобы сигналы могли понять,
+        # что именно изменилось при сохранении (без лишнего SELECT).
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
 
     def get_full_name(self): return f"{self.last_name} {self.first_name} {self.patronymic}".strip()
     def get_role_display_custom(self): return dict(self.ROLE_CHOICES).get(self.role, self.role.capitalize())
     def save(self, *args, **kwargs):
-        from django.urls import reverse
         is_new = self.pk is None
         super().save(*args, **kwargs)
         if is_new and not self.qr_code:
-            try:
-                public_profile_url = reverse('public_profile', kwargs={'pk': self.pk})
-                full_url = f"http://127.0.0.1:8000{public_profile_url}"
-                qr_image = qrcode.make(full_url)
-                qr_offset = BytesIO()
-                qr_image.save(qr_offset, format='PNG')
-                file_name = f'qr_code_{self.username}.png'
-                self.qr_code.save(file_name, File(qr_offset), save=True)
-            except Exception: pass
+            # QR-код рисуется в фоне (users/qr.py), регистрация его не ждет
+            from core.tasks import enqueue
+            from .qr import generate_qr_code
+            enqueue(generate_qr_code, self.pk)
     def __str__(self): return self.get_full_name() or self.username
 
+class VolunteerFacet(models.Model):
+    """
+    Сводная таблица для фильтров базы волонтеров: сколько одобренных
+    волонтеров имеет каждое значение факультета, курса и города.
+    Поддерживается сигналами User (см. users/facets.py).
+    """
+    FACET_CHOICES = (
+        ('faculty', 'Факультет'),
+        ('course', 'Курс'),
+        ('city', 'Город'),
+    )
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES, verbose_name="Фильтр")
+    value = models.CharField(max_length=200, verbose_name="Значение")
+    count = models.PositiveIntegerField(default=0, verbose_name="Количество волонтеров")
+
+    class Meta:
+        ordering = ['facet', 'value']
+        verbose_name = "Значение фильтра"
+        verbose_name_plural = "Значения фильтров"
+        constraints = [
+            models.UniqueConstraint(fields=['facet', 'value'], name='unique_volunteer_facet_value'),
+        ]
+
+    def __str__(self): return f"{self.facet}: {self.value} ({self.count})"
+
 class ActivityPeriod(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_periods')
     start_date = models.DateField(verbose_name="Дата начала периода")
@@ -93,6 +132,25 @@ class Notification(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     class Meta:
         ordering = ['-created_at']; verbose_name = "Уведомление"; verbose_name_plural = "Уведомления"
+        indexes = [
+            # Непрочитанные пользователя, новые сверху
+            models.Index(fields=['recipient', 'created_at'], condition=models.Q(is_read=False), name='users_notif_unread'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+
+    def mark_as_read(self):
+        """
+        Атомарно помечает уведомление прочитанным и уменьшает счетчик получателя.
+        Возвращает True, если уведомление действительно было непрочитанным.
+        """
+        from .notifications import mark_as_read
+        return mark_as_read(self)
+
     def __str__(self): return f"Уведомление для {self.recipient.username}"
 
 class AboutPage(models.Model):
@@ -123,6 +181,22 @@ class AboutPage(models.Model):
 
     def __str__(self): return self.title
 
+    @staticmethod
+    def _contact_url(value, base):
+        # В поля можно вписать и ссылку, и просто ник
+        value = value.strip()
+        if not value or value.startswith(('http://', 'https://')):
+            return value
+        return base + value.lstrip('@')
+
+    @property
+    def telegram_url(self):
+        return self._contact_url(self.telegram, 'https://t.me/')
+
+    @property
+    def instagram_url(self):
+        return self._contact_url(self.instagram, 'https://instagram.com/')
+
     # --- НОВАЯ МОДЕЛЬ ДЛЯ ЖУРНАЛА ДЕЙСТВИЙ ---
 class AuditLog(models.Model):
     actor = models.ForeignKey(
@@ -141,22 +215,25 @@ class AuditLog(models.Model):
         related_name='target_logs',
         verbose_name="Целевой пользователь (если применимо)"
     )
-    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Время")
-
-    class Meta:
-        ordering = ['-created_at']
-        verbose_name = "Запись в журнале"
-        verbose_name_plural = "Журнал действий"
+    # Время задается при записи действия, а не при сбросе буфера (users/audit.py)
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Время")
 
-    def __str__(self):
-        return f"{self.actor} - {self.action[:50]}..."
-    
-    # --- Добавить в конец users/models.py ---
+    # Структурированное описание действия (коды и типы — в users/audit.py)
+    action_code = models.CharField(max_length=50, blank=True, verbose_name="Код действия")
+    object_type = models.CharField(max_length=50, blank=True, verbose_name="Тип объекта")
+    object_id = models.PositiveIntegerField(null=True, blank=True, verbose_name="ID объекта")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Подробности")
 
     class Meta:
         ordering = ['-created_at']
         verbose_name = "Запись в журнале"
         verbose_name_plural = "Журнал действий"
+        indexes = [
+            models.Index(fields=['created_at'], name='users_audit_created'),
+            models.Index(fields=['actor', 'created_at'], name='users_audit_actor_created'),
+            models.Index(fields=['target_user', 'created_at'], name='users_audit_target_created'),
+            models.Index(fields=['object_type', 'object_id'], name='users_audit_object'),
+        ]
 
     def __str__(self):
         return f"{self.actor} - {self.action[:50]}..."
\ No newline at end of file
@@ -0,0 +1,115 @@
+# users/notifications.py
+"""
+Уведомления и счетчик непрочитанных.
+
+У каждого пользователя есть поле unread_notifications_count. Оно меняется
+только атомарными UPDATE ... SET count = count ± 1, поэтому контекстный
+процессор может показывать число на колокольчике, вообще не обращаясь
+к таблице Notification.
+"""
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, F
+
+from core.tasks import run_in_background
+
+from .models import Notification, User
+
+
+def _change_unread(user_ids, delta):
+    users = User.objects.filter(pk__in=user_ids)
+    if delta > 0:
+        users.update(unread_notifications_count=F('unread_notifications_count') + delta)
+    else:
+        # Не уходим ниже нуля, даже если счетчик когда-то разошелся с таблицей
+        users.filter(unread_notifications_count__gte=-delta).update(
+            unread_notifications_count=F('unread_notifications_count') + delta
+        )
+
+
+def mark_as_read(notification):
+    """Помечает уведомление прочитанным; счетчик уменьшается, только если оно было непрочитанным."""
+    with transaction.atomic():
+        updated = Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True)
+        if updated:
+            _change_unread([notification.recipient_id], -1)
+    notification.is_read = True
+    notification._loaded_values = {**getattr(notification, '_loaded_values', {}), 'is_read': True}
+    return bool(updated)
+
+
+def refresh_unread_counts(user_ids=None):
+    """Пересчитывает счетчики по таблице Notification (если их меняли в обход этого модуля)."""
+    users = User.objects.all() if user_ids is None else User.objects.filter(pk__in=user_ids)
+    counts = dict(
+        Notification.objects.filter(is_read=False, recipient__in=users)
+        .order_by().values_list('recipient').annotate(n=Count('pk'))
+    )
+    with transaction.atomic():
+        users.exclude(pk__in=counts).exclude(unread_notifications_count=0).update(unread_notifications_count=0)
+        for user_id, count in counts.items():
+            User.objects.filter(pk=user_id).update(unread_notifications_count=count)
+    return len(counts)
+
+
+# --- РАССЫЛКА ---
+def _recipient_ids(recipients):
+    """Получатели -> список id. Queryset разрешается одним запросом."""
+    if isinstance(recipients, User):
+        return [recipients.pk]
+    if isinstance(recipients, models.QuerySet):
+        return list(recipients.order_by().values_list('pk', flat=True).distinct())
+    return [getattr(item, 'pk', item) for item in recipients]
+
+
+def _dispatch(recipients, message, link, batch_size):
+    ids = _recipient_ids(recipients)
+    batch_size = batch_size or settings.NOTIFICATIONS_BATCH_SIZE
+    for start in range(0, len(ids), batch_size):
+        batch = ids[start:start + batch_size]
+        with transaction.atomic():
+            # bulk_create не вызывает post_save, поэтому счетчики обновляем сами
+            Notification.objects.bulk_create(
+                [Notification(recipient_id=pk, message=message, link=link) for pk in batch]
+            )
+            _change_unread(batch, +1)
+    return len(ids)
+
+
+def notify(recipients, message, link=None, batch_size=None, background=False):
+    """
+    Отправляет одно и то же уведомление всем получателям.
+
+    recipients — пользователь, queryset пользователей или список пользователей/id.
+    Вставка идет пачками через bulk_create. С background=True рассылка
+    выполняется после ответа пользователю (см. core.tasks).
+    """
+    if background:
+        run_in_background(_dispatch, recipients, message, link, batch_size)
+        return None
+    return _dispatch(recipients, message, link, batch_size)
+
+
+def staff_recipients():
+    """Все, кто модерирует новых волонтеров (модераторы и выше, супер-админы)."""
+    return User.objects.filter(
+        models.Q(role__in=['moderator', 'worker', 'head_admin', 'president']) | models.Q(is_superuser=True)
+    )
+
+
+# --- ОБРАБОТЧИКИ СИГНАЛОВ ---
+def notification_saved(sender, instance, created, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None)
+    if created:
+        if not instance.is_read:
+            _change_unread([instance.recipient_id], +1)
+    elif loaded is not None and 'is_read' in loaded and loaded['is_read'] != instance.is_read:
+        # Статус поменяли обычным save() (например, в админке)
+        _change_unread([instance.recipient_id], -1 if instance.is_read else +1)
+    instance._loaded_values = {**(loaded or {}), 'is_read': instance.is_read}
+
+
+def notification_deleted(sender, instance, **kwargs):
+    loaded = getattr(instance, '_loaded_values', None) or {}
+    if not loaded.get('is_read', instance.is_read):
+        _change_unread([instance.recipient_id], -1)
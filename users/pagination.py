@@ -0,0 +1,139 @@
+# users/pagination.py
+"""
+Курсорная (keyset) пагинация.
+
+Вместо OFFSET, который на дальних страницах заставляет БД пролистывать
+все предыдущие строки, страница выбирается условием по ключу сортировки:
+"(last_name, id) > (последняя фамилия, последний id)". Такой курсор не
+"съезжает", если между запросами появились новые записи.
+"""
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+
+TOKEN_SALT = 'users.pagination'
+
+
+class KeysetPage:
+    def __init__(self, items, next_token=None, prev_token=None):
+        self.items = items
+        self.next_token = next_token
+        self.prev_token = prev_token
+
+    @property
+    def has_next(self): return self.next_token is not None
+
+    @property
+    def has_previous(self): return self.prev_token is not None
+
+    def __iter__(self): return iter(self.items)
+
+    def __len__(self): return len(self.items)
+
+
+def get_page_size(request, default=None):
+    """Размер страницы из ?page_size=, но не больше PAGINATION_MAX_PAGE_SIZE."""
+    default = default or settings.PAGINATION_PAGE_SIZE
+    try:
+        size = int(request.GET.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, settings.PAGINATION_MAX_PAGE_SIZE))
+
+
+def _encode(values, direction):
+    return signing.dumps({'k': values, 'd': direction}, salt=TOKEN_SALT, compress=True)
+
+
+def _decode(token, length):
+    try:
+        data = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        return None, None
+    values, direction = data.get('k'), data.get('d')
+    if not isinstance(values, list) or len(values) != length or direction not in ('next', 'prev'):
+        return None, None
+    return values, direction
+
+
+def _key_value(obj, field):
+    value = getattr(obj, field)
+    # Даты кладем в токен строкой, Django сам разберет ее при фильтрации
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def _after(keys, values, forward):
+    """
+    Условие "строго после курсора" в порядке keys (например ('last_name', 'id')
+    или ('-created_at', '-id')). forward=False — "строго перед курсором".
+    """
+    condition = Q()
+    for i, key in enumerate(keys):
+        field = key.lstrip('-')
+        descending = key.startswith('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        step = Q(**{f'{field}__{lookup}': values[i]})
+        for prev_key, prev_value in zip(keys[:i], values[:i]):
+            step &= Q(**{prev_key.lstrip('-'): prev_value})
+        condition |= step
+    return condition
+
+
+def _reverse(keys):
+    return [key[1:] if key.startswith('-') else f'-{key}' for key in keys]
+
+
+def _sort(rows, keys):
+    # Стабильная сортировка с последнего ключа учитывает направление каждого
+    for key in reversed(keys):
+        rows.sort(key=lambda row: getattr(row, key.lstrip('-')), reverse=key.startswith('-'))
+    return rows
+
+
+def paginate_keyset(queryset, token=None, page_size=None, keys=('last_name', 'id'), extra=None):
+    """
+    Возвращает KeysetPage для queryset, отсортированного по keys.
+    Последний ключ должен быть уникальным (обычно id).
+
+    extra(values, forward, limit) — дополнительный источник строк вне БД
+    (например, архив журнала). Возвращает до limit объектов строго после
+    курсора values (None — с начала) в порядке keys, а при forward=False —
+    строго перед ним в обратном порядке. Строки обоих источников сливаются.
+    """
+    keys = list(keys)
+    page_size = page_size or settings.PAGINATION_PAGE_SIZE
+    values, direction = _decode(token, len(keys)) if token else (None, None)
+    fields = [key.lstrip('-') for key in keys]
+
+    if direction == 'prev':
+        rows = list(queryset.filter(_after(keys, values, forward=False)).order_by(*_reverse(keys))[:page_size + 1])
+        if extra is not None:
+            rows = _sort(rows + list(extra(values, False, page_size + 1)), _reverse(keys))[:page_size + 1]
+        has_more_before = len(rows) > page_size
+        items = rows[:page_size][::-1]
+        has_more_after = True
+    else:
+        if values is not None:
+            queryset = queryset.filter(_after(keys, values, forward=True))
+        rows = list(queryset.order_by(*keys)[:page_size + 1])
+        if extra is not None:
+            rows = _sort(rows + list(extra(values, True, page_size + 1)), keys)[:page_size + 1]
+        has_more_after = len(rows) > page_size
+        items = rows[:page_size]
+        has_more_before = values is not None
+
+    next_token = prev_token = None
+    if items and has_more_after:
+        next_token = _encode([_key_value(items[-1], f) for f in fields], 'next')
+    if items and has_more_before:
+        prev_token = _encode([_key_value(items[0], f) for f in fields], 'prev')
+    return KeysetPage(items, next_token, prev_token)
+
+
+def page_url(request, token):
+    """Текущий URL с тем же набором фильтров, но другим курсором."""
+    if token is None:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = token
+    return f'{request.path}?{params.urlencode()}'
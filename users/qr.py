@@ -0,0 +1,50 @@
+# users/qr.py
+"""
+QR-коды публичных профилей.
+
+Картинка рисуется фоновой задачей (core.tasks), а не внутри User.save,
+чтобы регистрация не ждала кодирования PNG. Массовая перегенерация —
+команда `python manage.py regenerate_qr_codes`.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.urls import reverse
+
+from core.tasks import task
+
+
+def profile_url(user_pk, base_url=None):
+    base_url = (base_url or settings.SITE_BASE_URL).rstrip('/')
+    return f"{base_url}{reverse('public_profile', kwargs={'pk': user_pk})}"
+
+
+def build_qr_png(url):
+    """Рисует QR-код и возвращает байты PNG. Чистая функция — годится для пула процессов."""
+    import qrcode
+    buffer = BytesIO()
+    qrcode.make(url).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def qr_file_name(username):
+    return f'qr_code_{username}.png'
+
+
+def save_qr_code(user, png):
+    """Сохраняет PNG в хранилище и записывает путь одним UPDATE (без полного save())."""
+    from .models import User
+    if user.qr_code:
+        user.qr_code.delete(save=False)
+    user.qr_code.save(qr_file_name(user.username), ContentFile(png), save=False)
+    User.objects.filter(pk=user.pk).update(qr_code=user.qr_code.name)
+
+
+@task
+def generate_qr_code(user_id, base_url=None, force=False):
+    from .models import User
+    user = User.objects.filter(pk=user_id).first()
+    if user is None or (user.qr_code and not force):
+        return
+    save_qr_code(user, build_qr_png(profile_url(user.pk, base_url)))
@@ -0,0 +1,230 @@
+# users/search.py
+"""
+Поиск волонтеров по ФИО.
+
+Для каждого пользователя хранится нормализованный поисковый ключ в
+отдельной таблице SQLite FTS5 с триграммным токенизатором. Ключ и запрос
+приводятся к одному виду: регистр сброшен, кириллица транслитерирована в
+латиницу, а разные латинские написания одного звука свернуты в одно
+(yo/jo/ё → e, kh/h/x → h, sh/ş → ş, ch/ç → ç, q → k и т. д.). Поэтому
+"Ёкубов", "екубов", "yokubov" и "ekubov" находят одного и того же человека,
+а поиск по подстроке идет по индексу, а не полным перебором таблицы.
+
+Логин в публичный ключ не входит: по нему ищут только страницы
+администрации (filter_by_search(..., usernames=True)).
+
+На других СУБД (без FTS5) используется прежний поиск через icontains.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'users_usersearch'
+
+# Поля пользователя, из которых собирается ключ
+SEARCH_FIELDS = ('last_name', 'first_name', 'patronymic')
+
+# Сколько совпадений из индекса ранжировать для подсказок
+RANK_CANDIDATES = 500
+
+CREATE_TABLE_SQL = "CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5(key, tokenize='trigram')"
+
+# Русский и таджикский алфавит → латиница
+TRANSLIT = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n',
+    'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f',
+    'х': 'kh', 'ц': 'ts', 'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '',
+    'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+    'ғ': 'gh', 'ӣ': 'i', 'қ': 'q', 'ӯ': 'u', 'ҳ': 'h', 'ҷ': 'j',
+}
+
+# Варианты латинского написания → один канонический вид. Замены идут по
+# порядку (dzh → j раньше, чем jo → e), поэтому порядок важен.
+LATIN_FOLDS = (
+    ('shch', 'ş'), ('dzh', 'j'), ('dž', 'j'),
+    ('zh', 'ž'), ('sh', 'ş'), ('š', 'ş'), ('ch', 'ç'), ('č', 'ç'),
+    ('kh', 'h'), ('x', 'h'), ('gh', 'ğ'), ('q', 'k'),
+    ('yo', 'e'), ('jo', 'e'), ('ī', 'i'), ('ı', 'i'), ('ū', 'u'),
+)
+
+
+def normalize(text):
+    """Приводит строку к виду поискового ключа: нижний регистр, латиница, свернутые варианты написания."""
+    text = (text or '').casefold().replace('ё', 'е')
+    text = ''.join(TRANSLIT.get(char, char) for char in text)
+    for variant, canonical in LATIN_FOLDS:
+        text = text.replace(variant, canonical)
+    return text
+
+
+def build_search_key(values):
+    """values — словарь или объект с полями SEARCH_FIELDS."""
+    get = values.get if isinstance(values, dict) else lambda field: getattr(values, field, '')
+    return ' '.join(normalize(get(field)) for field in SEARCH_FIELDS if get(field))
+
+
+def is_supported():
+    return connection.vendor == 'sqlite'
+
+
+# --- ПОСТРОЕНИЕ ЗАПРОСА ---
+def _terms(query):
+    return [term for term in normalize(query).split() if term]
+
+
+def build_match(query, anchored=None):
+    """
+    Возвращает (where_sql, params) для таблицы поиска.
+    Слова от трех символов ищутся через MATCH по триграммам; более короткие
+    триграммы не покрывают, для них используется LIKE (тоже по FTS-таблице).
+    anchored — слово запроса, с которого должен начинаться ключ (^ в FTS5).
+    """
+    long_terms, short_terms = [], []
+    for term in _terms(query):
+        (long_terms if len(term) >= 3 else short_terms).append(term)
+    clauses, params = [], []
+    if long_terms:
+        clauses.append(f'{SEARCH_TABLE} MATCH %s')
+        params.append(' '.join(
+            '{}"{}"'.format('^' if term == anchored else '', term.replace('"', '""')) for term in long_terms
+        ))
+    for term in short_terms:
+        clauses.append("key LIKE %s ESCAPE '\\'")
+        escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        params.append(f'{escaped}%' if term == anchored else f'%{escaped}%')
+    return ' AND '.join(clauses), params
+
+
+def filter_by_search(queryset, query, usernames=False):
+    """
+    Оставляет в queryset пользователей, подходящих под поисковый запрос.
+    usernames=True — еще и по подстроке логина (только для страниц администрации).
+    """
+    if not _terms(query):
+        return queryset
+    if is_supported():
+        where, params = build_match(query)
+        condition = Q(pk__in=RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {where}', params))
+    else:
+        condition = Q()
+        for term in query.split():
+            condition &= Q(first_name__icontains=term) | Q(last_name__icontains=term) | Q(patronymic__icontains=term)
+    if usernames:
+        condition |= Q(username__icontains=query.strip())
+    return queryset.filter(condition)
+
+
+def rank_candidates(rows, query, limit):
+    """
+    Сортирует кандидатов (rowid, key) по релевантности: сначала совпадение
+    с началом ключа (фамилии), затем с началом любого слова, затем внутри
+    слова; при равенстве — более короткий ключ. Возвращает rowid лучших.
+    """
+    terms = _terms(query)
+
+    def score(row):
+        key = row[1]
+        padded = f' {key}'
+        points = 0
+        for term in terms:
+            if key.startswith(term):
+                continue
+            points += 1 if f' {term}' in padded else 2
+        return points, len(key), row[0]
+
+    return [row[0] for row in sorted(rows, key=score)[:limit]]
+
+
+def candidate_queries(query, queryset=None):
+    """
+    Запросы (sql, params) кандидатов (rowid, key) по убыванию релевантности;
+    значение LIMIT %s в конце добавляет fetch_candidates. Сначала ключи, которые начинаются с
+    одного из слов запроса (совпадение с фамилией — лучшее для
+    rank_candidates), затем все остальные совпадения. queryset ограничивает
+    кандидатов в том же SQL, до LIMIT.
+
+    bm25 здесь не подходит: чтобы отсортировать по нему, SQLite оценивает
+    все совпадения частой триграммы (на 100 тыс. пользователей это ~10 мс),
+    а якорь ^ читает индекс только до LIMIT.
+    """
+    extra, extra_params = '', []
+    if queryset is not None:
+        subquery, extra_params = queryset.order_by().values('pk').query.sql_with_params()
+        extra = f' AND rowid IN ({subquery})'
+    queries = []
+    for anchored in [*dict.fromkeys(_terms(query)), None]:
+        where, params = build_match(query, anchored)
+        queries.append((f'SELECT rowid, key FROM {SEARCH_TABLE} WHERE {where}{extra} LIMIT %s', [*params, *extra_params]))
+    return queries
+
+
+def fetch_candidates(cursor, query, queryset=None, limit=None):
+    """Кандидаты (rowid, key) из индекса, не больше RANK_CANDIDATES штук, лучшие — первыми."""
+    limit = limit or RANK_CANDIDATES
+    found = {}
+    for sql, params in candidate_queries(query, queryset):
+        # Уже найденные строки могут вернуться снова — запрашиваем с запасом
+        cursor.execute(sql, [*params, limit + len(found)])
+        for rowid, key in cursor.fetchall():
+            found.setdefault(rowid, key)
+        if len(found) >= limit:
+            break
+    return list(found.items())[:limit]
+
+
+def ranked_search(query, queryset, limit=10):
+    """
+    Лучшие совпадения среди пользователей queryset в порядке релевантности.
+    Из индекса берутся RANK_CANDIDATES совпадений, начиная с совпадений по
+    началу ключа (queryset проверяется в том же запросе), и уже они
+    ранжируются rank_candidates.
+    """
+    if not _terms(query):
+        return []
+    if not is_supported():
+        return list(filter_by_search(queryset, query).order_by('last_name', 'id')[:limit])
+    with connection.cursor() as cursor:
+        rows = fetch_candidates(cursor, query, queryset)
+    ids = rank_candidates(rows, query, limit)
+    users = queryset.model.objects.in_bulk(ids)
+    return [users[pk] for pk in ids if pk in users]
+
+
+# --- СИНХРОНИЗАЦИЯ ИНДЕКСА ---
+def index_user(user):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [user.pk])
+        cursor.execute(f'INSERT INTO {SEARCH_TABLE}(rowid, key) VALUES (%s, %s)', [user.pk, build_search_key(user)])
+
+
+def unindex_user(pk):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [pk])
+
+
+def rebuild_search_index(users, db_connection=None):
+    """Заполняет индекс заново. users — итерируемое словарей с id и SEARCH_FIELDS."""
+    db_connection = db_connection or connection
+    if db_connection.vendor != 'sqlite':
+        return 0
+    rows = [(row['id'], build_search_key(row)) for row in users]
+    with db_connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.executemany(f'INSERT INTO {SEARCH_TABLE}(rowid, key) VALUES (%s, %s)', rows)
+    return len(rows)
+
+
+# --- ОБРАБОТЧИКИ СИГНАЛОВ ---
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not set(SEARCH_FIELDS).intersection(update_fields):
+        return
+    index_user(instance)
+
+
+def user_deleted(sender, instance, **kwargs):
+    unindex_user(instance.pk)
@@ -0,0 +1,20 @@
+# users/signals.py
+"""
+Подключение обработчиков сигналов приложения users.
+Импортируется из UsersConfig.ready().
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+
+from . import about, facets, notifications, search
+from .models import AboutPage, Notification, User
+
+pre_save.connect(facets.user_pre_save, sender=User, dispatch_uid='users_facets_user_pre_save')
+post_save.connect(facets.user_saved, sender=User, dispatch_uid='users_facets_user_saved')
+pre_delete.connect(facets.user_pre_delete, sender=User, dispatch_uid='users_facets_user_pre_delete')
+post_delete.connect(facets.user_deleted, sender=User, dispatch_uid='users_facets_user_deleted')
+post_save.connect(search.user_saved, sender=User, dispatch_uid='users_search_user_saved')
+post_delete.connect(search.user_deleted, sender=User, dispatch_uid='users_search_user_deleted')
+post_save.connect(notifications.notification_saved, sender=Notification, dispatch_uid='users_notification_saved')
+post_delete.connect(notifications.notification_deleted, sender=Notification, dispatch_uid='users_notification_deleted')
+post_save.connect(about.about_page_changed, sender=AboutPage, dispatch_uid='users_about_page_saved')
+post_delete.connect(about.about_page_changed, sender=AboutPage, dispatch_uid='users_about_page_deleted')
@@ -1,3 +1,490 @@
-from django.test import TestCase
+import gzip
+import importlib
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import audit, audit_archive
+from .facets import get_facet_counts, rebuild_facets
+from .about import get_about_page
+from .models import AboutPage, AuditLog, Direction, Notification, User, VolunteerFacet
+from .notifications import notify, refresh_unread_counts, staff_recipients
+from .search import filter_by_search, normalize, ranked_search
+
+
+class VolunteerFacetTests(TestCase):
+    def make_user(self, username, **fields):
+        fields.setdefault('is_approved', True)
+        return User.objects.create_user(username=username, password='x', **fields)
+
+    def counts(self, facet):
+        return dict(VolunteerFacet.objects.filter(facet=facet).values_list('value', 'count'))
+
+    def test_index_follows_user_changes(self):
+        anna = self.make_user('anna', faculty='Физика', course=1, city='Душанбе')
+        self.make_user('bobur', faculty='Физика', course=2, city='Худжанд')
+        self.make_user('pending', faculty='Химия', is_approved=False)
+        self.assertEqual(self.counts('faculty'), {'Физика': 2})
+        self.assertEqual(self.counts('course'), {'1': 1, '2': 1})
+
+        anna = User.objects.get(pk=anna.pk)
+        anna.faculty = 'Химия'
+        anna.save()
+        self.assertEqual(self.counts('faculty'), {'Физика': 1, 'Химия': 1})
+
+        anna.delete()
+        self.assertEqual(self.counts('faculty'), {'Физика': 1})
+        self.assertEqual(self.counts('city'), {'Худжанд': 1})
+
+    def test_approval_adds_user_to_index(self):
+        user = self.make_user('late', city='Бохтар', is_approved=False)
+        self.assertEqual(self.counts('city'), {})
+        user = User.objects.get(pk=user.pk)
+        user.is_approved = True
+        user.save()
+        self.assertEqual(self.counts('city'), {'Бохтар': 1})
+
+    def test_partial_instances_are_diffed_without_rebuild(self):
+        user = self.make_user('partial', faculty='Физика', city='Душанбе')
+        # Чужая строка индекса: полный пересчет ее бы стер
+        VolunteerFacet.objects.create(facet='city', value='Исфара', count=7)
+
+        user = User.objects.only('pk', 'city').get(pk=user.pk)
+        user.city = 'Худжанд'
+        user.save()
+        self.assertEqual(self.counts('city'), {'Худжанд': 1, 'Исфара': 7})
+
+        detached = User(pk=user.pk, username='partial', faculty='Химия', city='Худжанд', is_approved=True)
+        detached.save()
+        self.assertEqual(self.counts('faculty'), {'Химия': 1})
+        self.assertEqual(self.counts('city')['Исфара'], 7)
+
+        User.objects.defer('faculty').get(pk=user.pk).delete()
+        self.assertEqual(self.counts('faculty'), {})
+        self.assertEqual(self.counts('city'), {'Исфара': 7})
+
+    def test_rebuild_matches_incremental_index(self):
+        self.make_user('a', faculty='Физика', course=3)
+        self.make_user('b', faculty='Химия', course=3)
+        before = list(VolunteerFacet.objects.values_list('facet', 'value', 'count'))
+        rebuild_facets()
+        self.assertEqual(list(VolunteerFacet.objects.values_list('facet', 'value', 'count')), before)
+
+    def test_picked_counts_respect_other_filters(self):
+        self.make_user('a', faculty='Физика', city='Душанбе')
+        self.make_user('b', faculty='Физика', city='Худжанд')
+        self.make_user('c', faculty='Химия', city='Душанбе')
+        facets = get_facet_counts({'city': 'Душанбе'})
+        faculties = {item['value']: (item['count'], item['picked_count']) for item in facets['faculty']}
+        self.assertEqual(faculties, {'Физика': (2, 1), 'Химия': (1, 1)})
+        # Свой собственный фильтр не сужает варианты того же фасета
+        cities = {item['value']: item['picked_count'] for item in facets['city']}
+        self.assertEqual(cities, {'Душанбе': 2, 'Худжанд': 1})
+
+    def test_volunteer_list_does_not_scan_for_distinct_values(self):
+        self.make_user('a', faculty='Физика', course=1, city='Душанбе')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('volunteer_list'))
+        self.assertContains(response, 'Физика (1)')
+        self.assertFalse([q for q in queries.captured_queries if 'DISTINCT' in q['sql']])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        for i, last_name in enumerate(['Алиев', 'Алиев', 'Бобоев', 'Валиев', 'Ганиев']):
+            User.objects.create_user(username=f'u{i}', password='x', last_name=last_name, is_approved=True)
+
+    def walk(self, url):
+        names, pages = [], 0
+        while url:
+            data = self.client.get(url).json()
+            names += [item['id'] for item in data['results']]
+            url, pages = data['next_url'], pages + 1
+        return names, pages
+
+    def test_pages_cover_all_users_in_order(self):
+        expected = list(User.objects.order_by('last_name', 'id').values_list('id', flat=True))
+        ids, pages = self.walk(reverse('volunteer_list') + '?format=json&page_size=2')
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_cursor_survives_concurrent_inserts(self):
+        first = self.client.get(reverse('volunteer_list') + '?format=json&page_size=2').json()
+        # Новый волонтер "перед" курсором не должен сдвигать следующую страницу
+        User.objects.create_user(username='new', password='x', last_name='Аббосов', is_approved=True)
+        second = self.client.get(first['next_url']).json()
+        self.assertEqual([item['full_name'] for item in second['results']], ['Бобоев', 'Валиев'])
+        back = self.client.get(second['previous_url']).json()
+        self.assertEqual(back['results'], first['results'])
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        data = self.client.get(reverse('volunteer_list') + '?format=json&page_size=2&cursor=garbage').json()
+        self.assertEqual(len(data['results']), 2)
+        self.assertIsNone(data['previous'])
+
+    def test_user_management_pages(self):
+        admin = User.objects.create_user(username='boss', password='x', role='head_admin', is_approved=True)
+        self.client.force_login(admin)
+        response = self.client.get(reverse('user_management') + '?page_size=2')
+        self.assertEqual(len(response.context['users_list']), 2)
+        self.assertIsNotNone(response.context['next_url'])
+        data = self.client.get(reverse('user_management') + '?format=json&search=Бобоев').json()
+        self.assertEqual({item['username'] for item in data['results']}, {'u2'})
+
+
+class VolunteerSearchTests(TestCase):
+    def setUp(self):
+        self.yokubov = User.objects.create_user(
+            username='yokubov', password='x', first_name='Анвар', last_name='Ёқубов', is_approved=True,
+        )
+        self.karimova = User.objects.create_user(
+            username='k1', password='x', first_name='Лола', last_name='Каримова', is_approved=True,
+        )
+
+    def test_normalization(self):
+        self.assertEqual(normalize('Ёқубов'), 'ekubov')
+        self.assertEqual(normalize('ҶАЛОЛОВ'), normalize('jalolov'))
+
+    def test_latin_spellings_fold_to_one_form(self):
+        for spellings in [
+            ('Ёкубов', 'Ёқубов', 'yokubov', 'Jokubov', 'Ekubov', 'Yoqubov'),
+            ('Хакимов', 'Ҳакимов', 'Hakimov', 'Xakimov', 'Khakimov'),
+            ('Шарипов', 'Sharipov', 'Şaripov', 'Šaripov'),
+            ('Чориев', 'Choriev', 'Çoriev'),
+            ('Джураев', 'Ҷураев', 'Juraev', 'Dzhuraev'),
+        ]:
+            with self.subTest(spellings[0]):
+                self.assertEqual({normalize(text) for text in spellings}, {normalize(spellings[0])})
+
+    def test_latin_query_finds_cyrillic_name(self):
+        User.objects.create_user(username='h1', password='x', last_name='Хакимов', is_approved=True)
+        self.assertEqual(self.found('Xakimov'), {'h1'})
+        self.assertEqual(self.found('yokub'), {'yokubov'})
+
+    def test_username_is_searched_only_on_admin_pages(self):
+        self.assertEqual(self.found('k1'), set())
+        self.assertEqual(set(filter_by_search(User.objects.all(), 'k1', usernames=True).values_list('username', flat=True)), {'k1'})
+
+    def found(self, query, queryset=None):
+        queryset = queryset if queryset is not None else User.objects.all()
+        return set(filter_by_search(queryset, query).values_list('username', flat=True))
+
+    def test_cross_script_and_case_insensitive_lookup(self):
+        self.assertEqual(self.found('ЕҚУБ'), {'yokubov'})
+        self.assertEqual(self.found('karim'), {'k1'})
+        self.assertEqual(self.found('лола карим'), {'k1'})
+        self.assertEqual(self.found('ка'), {'k1'})
+
+    def test_index_follows_renames_and_deletes(self):
+        self.karimova.last_name = 'Раҳимова'
+        self.karimova.save()
+        self.assertEqual(self.found('karim'), set())
+        self.assertEqual(self.found('rahim'), {'k1'})
+        self.karimova.delete()
+        self.assertEqual(self.found('rahim'), set())
+
+    def test_ranked_search_prefers_surname_prefix(self):
+        User.objects.create_user(username='x', password='x', first_name='Карим', last_name='Сафаров', is_approved=True)
+        results = ranked_search('карим', User.objects.filter(is_approved=True))
+        self.assertEqual(results[0], self.karimova)
+        response = self.client.get(reverse('volunteer_search'), {'q': 'equb'})
+        self.assertEqual([item['id'] for item in response.json()['results']], [self.yokubov.pk])
+
+    def test_candidates_are_filtered_and_ordered_before_the_limit(self):
+        # Неодобренные и худшие (внутри слова) совпадения не вытесняют лучшее
+        for number in range(3):
+            User.objects.create_user(username=f'p{number}', password='x', last_name='Каримов', is_approved=False)
+            User.objects.create_user(username=f'a{number}', password='x', last_name='Абдукаримов', is_approved=True)
+        with mock.patch('users.search.RANK_CANDIDATES', 2):
+            results = ranked_search('карим', User.objects.filter(is_approved=True))
+        self.assertEqual(results[0], self.karimova)
+        self.assertNotIn('p0', {user.username for user in results})
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='reader', password='x', is_approved=True)
+
+    def unread(self):
+        return User.objects.get(pk=self.user.pk).unread_notifications_count
+
+    def test_counter_follows_create_read_and_delete(self):
+        first = Notification.objects.create(recipient=self.user, message='1')
+        second = Notification.objects.create(recipient=self.user, message='2')
+        Notification.objects.create(recipient=self.user, message='3', is_read=True)
+        self.assertEqual(self.unread(), 2)
+
+        self.assertTrue(first.mark_as_read())
+        self.assertFalse(first.mark_as_read())
+        self.assertEqual(self.unread(), 1)
+
+        second = Notification.objects.get(pk=second.pk)
+        second.is_read = True
+        second.save()
+        self.assertEqual(self.unread(), 0)
+
+        Notification.objects.create(recipient=self.user, message='4').delete()
+        self.assertEqual(self.unread(), 0)
+        self.assertEqual(refresh_unread_counts(), 0)
+
+    def test_context_processor_does_not_query_notifications(self):
+        Notification.objects.create(recipient=self.user, message='1')
+        self.client.force_login(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('about_page'))
+        self.assertEqual(response.context['unread_notifications_count'], 1)
+        self.assertFalse([q for q in queries.captured_queries if 'users_notification' in q['sql']])
+
+
+
+class AboutPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_singleton_is_read_once_until_saved(self):
+        self.assertIsNone(get_about_page())
+        with self.captureOnCommitCallbacks(execute=True):
+            AboutPage.objects.create(pk=1, telegram='@aya_team')
+        page = get_about_page()
+        self.assertEqual(page.telegram_url, 'https://t.me/aya_team')
+        with self.assertNumQueries(0):
+            get_about_page()
+
+        admin = User.objects.create_user(username='boss', password='x', role='president', is_approved=True)
+        self.client.force_login(admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('about_page_edit'), {
+                'title': 'О нас', 'mission_title': 'Миссия', 'telegram': 'https://t.me/aya_new',
+                'stat_1_num': '1', 'stat_1_text': 'a', 'stat_2_num': '2', 'stat_2_text': 'b',
+                'stat_3_num': '3', 'stat_3_text': 'c',
+            })
+        self.assertEqual(get_about_page().telegram_url, 'https://t.me/aya_new')
+        # Футер берет контакты из памяти процесса
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('volunteer_list'))
+        self.assertContains(response, 'https://t.me/aya_new')
+        self.assertFalse([q for q in queries.captured_queries if 'users_aboutpage' in q['sql']])
+
+class NotificationDispatchTests(TestCase):
+    def test_notify_fans_out_in_constant_queries(self):
+        staff = [User.objects.create_user(username=f'mod{i}', password='x', role='moderator') for i in range(30)]
+        User.objects.create_superuser(username='root', password='x')
+        # 1 запрос на получателей + 4 пачки по (savepoint, вставка, счетчики, release)
+        with self.assertNumQueries(1 + 4 * 4):
+            sent = notify(staff_recipients(), 'Проверка', batch_size=10)
+        self.assertEqual(sent, 31)
+        self.assertEqual(Notification.objects.count(), 31)
+        self.assertEqual(User.objects.get(pk=staff[0].pk).unread_notifications_count, 1)
+
+    def test_signup_notifies_staff(self):
+        moderator = User.objects.create_user(username='mod', password='x', role='moderator')
+        response = self.client.post(reverse('signup'), {
+            'username': 'newbie', 'first_name': 'Умед', 'last_name': 'Назаров', 'email': 'n@example.com',
+            'password1': 'S3cure-pass-123', 'password2': 'S3cure-pass-123',
+        })
+        self.assertRedirects(response, reverse('login'))
+        notification = Notification.objects.get(recipient=moderator)
+        self.assertIn('Назаров', notification.message)
+
+
+@override_settings(BACKGROUND_TASKS_MODE='thread', AUDIT_LOG_BUFFER_SIZE=100, AUDIT_LOG_FLUSH_INTERVAL=3600)
+class AuditBufferTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='x', role='head_admin')
+        self.target = User.objects.create_user(username='target', password='x')
+        self.addCleanup(audit.flush)
+
+    def test_entries_are_written_in_one_batch(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = audit.record(self.admin, 'Первое действие', target=self.target)
+            for i in range(9):
+                audit.record(self.admin, f'Действие {i}')
+        self.assertEqual(audit.pending(), 10)
+        self.assertFalse(AuditLog.objects.exists())
+
+        with self.assertNumQueries(3):  # savepoint, INSERT, release
+            self.assertEqual(audit.flush(), 10)
+        stored = AuditLog.objects.get(action='Первое действие')
+        # Время — момент действия, а не сброса буфера
+        self.assertEqual(stored.created_at, first.created_at)
+        self.assertEqual(stored.target_user, self.target)
+
+    def test_rolled_back_action_is_not_logged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                audit.record(self.admin, 'Не случилось')
+                transaction.set_rollback(True)
+        self.assertEqual(audit.pending(), 0)
+
+    def test_atomic_entry_is_written_immediately(self):
+        self.client.force_login(self.admin)
+        self.client.post(reverse('update_user_role', args=[self.target.pk]), {'role': 'moderator'})
+        self.assertEqual(audit.pending(), 0)
+        self.assertTrue(AuditLog.objects.filter(actor=self.admin, target_user=self.target).exists())
+
+
+class StructuredAuditLogTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='x', role='head_admin')
+        self.worker = User.objects.create_user(username='worker', password='x', role='worker')
+
+    def test_legacy_rows_are_parsed(self):
+        direction = Direction.objects.create(name='Экология')
+        legacy = AuditLog.objects.create(actor=self.admin, action="Назначил Иван Иванов руководителем направления 'Экология'")
+        role = AuditLog.objects.create(actor=self.admin, action="Изменил роль для Иван Иванов на 'Работник'", target_user=self.worker)
+        unknown = AuditLog.objects.create(actor=self.admin, action="Что-то совсем другое")
+
+        migration = importlib.import_module('users.migrations.0023_auditlog_structured')
+        migration.fill_structured_fields(apps, None)
+
+        legacy.refresh_from_db()
+        self.assertEqual((legacy.action_code, legacy.object_type, legacy.object_id), ('direction.leader_add', 'users.direction', direction.pk))
+        role.refresh_from_db()
+        self.assertEqual((role.action_code, role.object_id, role.payload), ('user.role', self.worker.pk, {'role': 'Работник'}))
+        unknown.refresh_from_db()
+        self.assertEqual(unknown.action_code, '')
+
+    def test_view_filters_and_pages(self):
+        self.client.force_login(self.admin)
+        self.client.post(reverse('update_user_role', args=[self.worker.pk]), {'role': 'moderator'})
+        entry = AuditLog.objects.get(action_code='user.role')
+        self.assertEqual((entry.object_type, entry.object_id), ('users.user', self.worker.pk))
+        self.assertEqual(entry.payload, {'role': 'moderator', 'previous': 'worker'})
+
+        old = timezone.now() - timedelta(days=40)
+        for i in range(5):
+            AuditLog.objects.create(actor=self.worker, action=f'Старое {i}', created_at=old, action_code='event.edit', object_type='events.event', object_id=7)
+
+        url = reverse('audit_log')
+        response = self.client.get(url, {'actor': self.worker.pk, 'type': 'events.event', 'page_size': 3})
+        self.assertEqual(len(response.context['audit_logs']), 3)
+        self.assertIsNotNone(response.context['next_url'])
+        response = self.client.get(response.context['next_url'])
+        self.assertEqual(len(response.context['audit_logs']), 2)
+
+        day = timezone.localdate(old).isoformat()
+        response = self.client.get(url, {'date_from': day, 'date_to': day})
+        self.assertEqual(len(response.context['audit_logs']), 5)
+        response = self.client.get(url, {'target': 'worker', 'action': 'user.role'})
+        self.assertEqual([log.pk for log in response.context['audit_logs']], [entry.pk])
+
+
+@override_settings(AUDIT_LOG_ARCHIVE_AFTER_DAYS=180)
+class AuditArchiveTests(TestCase):
+    def setUp(self):
+        archive = tempfile.TemporaryDirectory()
+        self.addCleanup(archive.cleanup)
+        archive_settings = override_settings(AUDIT_LOG_ARCHIVE_DIR=archive.name)
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+        self.admin = User.objects.create_user(username='admin', password='x', role='head_admin')
+        self.worker = User.objects.create_user(username='worker', password='x', role='worker')
+        now = timezone.now()
+        for i in range(5):
+            # Два разных месяца больше года назад
+            AuditLog.objects.create(actor=self.worker, action=f'Старое {i}', created_at=now - timedelta(days=400 + 20 * i))
+        for i in range(3):
+            AuditLog.objects.create(actor=self.admin, action=f'Новое {i}', created_at=now - timedelta(hours=i))
+
+    def test_old_rows_move_to_monthly_segments(self):
+        moved = audit_archive.archive_logs()
+        self.assertEqual(sum(moved.values()), 5)
+        self.assertGreaterEqual(len(moved), 2)
+        self.assertEqual(AuditLog.objects.count(), 3)
+        index = audit_archive.load_index()
+        for key, count in moved.items():
+            self.assertEqual(index['segments'][key]['count'], count)
+            self.assertEqual(index['segments'][key]['actors'], [self.worker.pk])
+            with gzip.open(audit_archive.segment_path(key), 'rt', encoding='utf-8') as segment:
+                self.assertEqual(len(segment.readlines()), count)
+        # Повторный запуск ничего не дублирует
+        self.assertEqual(audit_archive.archive_logs(), {})
+
+    def segment_lines(self):
+        index = audit_archive.load_index()
+        lines = {}
+        for key in index['segments']:
+            with gzip.open(audit_archive.segment_path(key), 'rt', encoding='utf-8') as segment:
+                lines[key] = len(segment.readlines())
+        return index, lines
+
+    def test_rerun_after_crash_does_not_duplicate(self):
+        # Сбой после записи сегмента, до индекса: хвост без индекса отбрасывается
+        with mock.patch.object(audit_archive, 'save_index', side_effect=RuntimeError('диск')):
+            with self.assertRaises(RuntimeError):
+                audit_archive.archive_logs()
+        # Сбой после индекса, до удаления строк: строки уже в архиве
+        with mock.patch('django.db.models.query.QuerySet.delete', side_effect=RuntimeError('БД')):
+            with self.assertRaises(RuntimeError):
+                audit_archive.archive_logs()
+        audit_archive.archive_logs()
+
+        index, lines = self.segment_lines()
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertEqual(sum(meta['count'] for meta in index['segments'].values()), 5)
+        self.assertEqual({key: meta['count'] for key, meta in index['segments'].items()}, lines)
+
+    def test_overlapping_blocks_are_merged_in_order(self):
+        audit_archive.archive_logs()
+        # Вторая волна в те же месяцы: id больше, а время вперемешку со старыми
+        base = timezone.now() - timedelta(days=400)
+        for i in range(6):
+            AuditLog.objects.create(actor=self.admin, action=f'Позднее {i}', created_at=base - timedelta(days=3 * i, hours=1))
+        audit_archive.archive_logs(batch_size=2)
+        index, lines = self.segment_lines()
+        self.assertGreater(max(len(meta['chunks']) for meta in index['segments'].values()), 2)
+
+        rows = list(audit_archive.iter_archive())
+        positions = [(row['created_at'], row['id']) for row in rows]
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(positions, sorted(positions))
+        self.assertEqual([row['id'] for row in audit_archive.iter_archive(reverse=True)], [row['id'] for row in reversed(rows)])
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('audit_log'), {'actor': self.admin.pk, 'page_size': 4})
+        seen = [log.action for log in response.context['audit_logs']]
+        while response.context['next_url']:
+            response = self.client.get(response.context['next_url'])
+            seen += [log.action for log in response.context['audit_logs']]
+        self.assertEqual(seen, ['Новое 0', 'Новое 1', 'Новое 2'] + [f'Позднее {i}' for i in range(6)])
+
+    def test_view_pages_through_table_and_archive(self):
+        audit_archive.archive_logs()
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('audit_log'), {'page_size': 4})
+        first = [log.action for log in response.context['audit_logs']]
+        self.assertEqual(first, ['Новое 0', 'Новое 1', 'Новое 2', 'Старое 0'])
+        self.assertContains(response, 'архив')
+
+        response = self.client.get(response.context['next_url'])
+        self.assertEqual([log.action for log in response.context['audit_logs']], ['Старое 1', 'Старое 2', 'Старое 3', 'Старое 4'])
+        self.assertIsNone(response.context['next_url'])
+        self.assertEqual(response.context['audit_logs'].items[0].actor, self.worker)
+
+        response = self.client.get(response.context['prev_url'])
+        self.assertEqual([log.action for log in response.context['audit_logs']], first)
+
+        response = self.client.get(reverse('audit_log'), {'actor': self.worker.pk, 'type': 'events.event'})
+        self.assertEqual(len(response.context['audit_logs']), 0)
+        response = self.client.get(reverse('audit_log'), {'actor': self.worker.pk})
+        self.assertEqual(len(response.context['audit_logs']), 5)
+
+    def test_export_streams_archive_and_table(self):
+        audit_archive.archive_logs()
+        path = os.path.join(audit_archive.archive_dir(), 'export.jsonl.gz')
+        call_command('export_audit_log', output=path, stderr=StringIO())
+        with gzip.open(path, 'rt', encoding='utf-8') as exported:
+            actions = [json.loads(line)['action'] for line in exported]
+        self.assertEqual(actions, [f'Старое {i}' for i in range(4, -1, -1)] + [f'Новое {i}' for i in range(2, -1, -1)])
@@ -10,6 +10,7 @@ urlpatterns = [
 
     # НОВЫЙ ПУТЬ: База данных волонтеров
     path('volunteers/', views.volunteer_list_view, name='volunteer_list'),
+    path('volunteers/search/', views.volunteer_search_view, name='volunteer_search'),
 
     # Аутентификация
     path('signup/', views.signup_view, name='signup'),
@@ -46,6 +47,7 @@ urlpatterns = [
     path('administration/structure/', views.administration_page_view, name='administration_page'), 
     # --- НОВЫЙ URL ДЛЯ ЖУРНАЛА ---
     path('administration/logs/', views.audit_log_view, name='audit_log'),
+    path('administration/slow-queries/', views.slow_query_log_view, name='slow_query_log'),
 
     # Уведомления
     path('notifications/', views.notification_list_view, name='notifications'),
@@ -3,22 +3,32 @@
 import json
 import datetime
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
 from django.contrib import messages
+from django.conf import settings
 from django.urls import reverse
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Q, prefetch_related_objects
 from django.utils import timezone
 from django.utils.dateparse import parse_date, parse_datetime
 
 from .forms import UserRegisterForm, UserUpdateForm, AdminUpdateForm, AboutPageForm
 from .models import User, Direction, School, ActivityPeriod, Notification, AboutPage, AuditLog
+from . import audit, audit_archive
+from .about import get_about_page
+from .facets import apply_volunteer_filters, get_facet_counts
+from .pagination import get_page_size, page_url, paginate_keyset
+from .search import filter_by_search, ranked_search
+from .notifications import notify, staff_recipients
+from core import slow_queries
+from core.page_cache import anonymous_page_cache
 from events.models import Event
 
 
 # --- HELPER: ЗАПИСЬ В ЖУРНАЛ (С РЕЖИМОМ ПРИЗРАКА) ---
-def log_action(user, action, target=None):
+def log_action(user, action, target=None, atomic=False, **details):
     """
     Записывает действие в журнал, ТОЛЬКО если пользователь НЕ супер-админ.
     """
@@ -26,9 +36,15 @@ def log_action(user, action, target=None):
     if user.is_superuser:
         return
         
-    # Иначе создаем запись
+    # atomic=True: запись идет в текущей транзакции вместе с изменением,
+    # поэтому ее ошибку не глушим — пусть откатится все
+    if atomic:
+        audit.record(user, action, target=target, atomic=True, **details)
+        return
+
+    # Иначе создаем запись (через буфер, см. users/audit.py)
     try:
-        AuditLog.objects.create(actor=user, action=action, target_user=target)
+        audit.record(user, action, target=target, **details)
     except Exception:
         pass # Чтобы ошибка логирования не ломала сайт
 
@@ -69,9 +85,42 @@ def get_user_power_level(user):
     return base_level
 
 
+# --- HELPER: JSON-ВАРИАНТ СПИСКОВ С КУРСОРНОЙ ПАГИНАЦИЕЙ ---
+def _volunteer_to_json(user):
+    return {
+        'id': user.pk,
+        'full_name': user.get_full_name(),
+        'photo': user.photo.url if user.photo else None,
+        'role': user.role,
+        'faculty': user.faculty,
+        'course': user.course,
+        'city': user.city,
+        'gender': user.gender,
+        'is_active_volunteer_title': user.is_active_volunteer_title,
+        'profile_url': reverse('public_profile', kwargs={'pk': user.pk}),
+    }
+
+
+def _managed_user_to_json(user):
+    data = _volunteer_to_json(user)
+    data.update({'username': user.username, 'is_approved': user.is_approved})
+    return data
+
+
+def _keyset_json_response(request, page, serializer):
+    return JsonResponse({
+        'results': [serializer(item) for item in page],
+        'next': page.next_token,
+        'previous': page.prev_token,
+        'next_url': page_url(request, page.next_token),
+        'previous_url': page_url(request, page.prev_token),
+    })
+
+
 # --- Главные view ---
 # users/views.py
 
+@anonymous_page_cache('home')
 def home_view(request):
     # 1. Получаем Президента (для блока на главной)
     president = User.objects.filter(role='president', is_approved=True).first()
@@ -87,78 +136,52 @@ def home_view(request):
     return render(request, 'users/home.html', context)
 
 
+@anonymous_page_cache('about')
 def about_view(request):
-    about_content = AboutPage.objects.first()
+    about_content = get_about_page()
     return render(request, 'users/about.html', {'about_content': about_content})
 
 
 def volunteer_list_view(request):
-    queryset = User.objects.filter(is_approved=True).order_by('last_name')
-    faculties = (
-        User.objects.filter(is_approved=True, faculty__isnull=False)
-        .exclude(faculty='')
-        .values_list('faculty', flat=True)
-        .distinct()
-        .order_by('faculty')
-    )
-    courses = (
-        User.objects.filter(is_approved=True, course__isnull=False)
-        .values_list('course', flat=True)
-        .distinct()
-        .order_by('course')
-    )
-    cities = (
-        User.objects.filter(is_approved=True, city__isnull=False)
-        .exclude(city='')
-        .values_list('city', flat=True)
-        .distinct()
-        .order_by('city')
-    )
+    # Значения фильтров и количества берем из индекса (users/facets.py),
+    # а не тремя DISTINCT-запросами по всей таблице User
+    queryset = User.objects.filter(is_approved=True)
+    queryset = apply_volunteer_filters(queryset, request.GET)
+    page = paginate_keyset(queryset, request.GET.get('cursor'), get_page_size(request))
+
+    if request.GET.get('format') == 'json':
+        return _keyset_json_response(request, page, _volunteer_to_json)
+
+    # Карточка дважды спрашивает school_leader_of.exists — одним запросом на всю страницу
+    prefetch_related_objects(page.items, 'school_leader_of')
+    facets = get_facet_counts(request.GET)
     directions = Direction.objects.all().order_by('name')
 
-    query = request.GET.get('query')
-    faculty = request.GET.get('faculty')
-    course = request.GET.get('course')
-    city = request.GET.get('city')
-    gender = request.GET.get('gender')
-    direction = request.GET.get('direction')
-    status = request.GET.get('status')
-
-    if query:
-        queryset = queryset.filter(
-            Q(first_name__icontains=query)
-            | Q(last_name__icontains=query)
-            | Q(patronymic__icontains=query)
-        )
-    if faculty:
-        queryset = queryset.filter(faculty=faculty)
-    if course:
-        queryset = queryset.filter(course=course)
-    if city:
-        queryset = queryset.filter(city=city)
-    if gender:
-        queryset = queryset.filter(gender=gender)
-    if direction:
-        queryset = queryset.filter(directions__id=direction)
-    if status:
-        if status == 'active':
-            queryset = queryset.filter(is_active_volunteer_title=True)
-        if status == 'leader':
-            queryset = queryset.filter(role='leader')
-        if status == 'school_leader':
-            queryset = queryset.filter(school_leader_of__isnull=False).distinct()
-        if status == 'president':
-            queryset = queryset.filter(role='president')
-
     context = {
-        'volunteers': queryset,
-        'faculties': faculties,
-        'courses': courses,
-        'cities': cities,
+        'volunteers': page,
+        'page': page,
+        'next_url': page_url(request, page.next_token),
+        'prev_url': page_url(request, page.prev_token),
+        'faculties': facets['faculty'],
+        'courses': facets['course'],
+        'cities': facets['city'],
         'directions': directions,
         'form_values': request.GET,
     }
     return render(request, 'users/volunteer_list.html', context)
+
+
+def volunteer_search_view(request):
+    """
+    Быстрый поиск для подсказок при вводе: лучшие совпадения по релевантности.
+    Отдает JSON, чтобы страница могла дергать его на каждое нажатие клавиши.
+    """
+    query = request.GET.get('q', '').strip()
+    volunteers = ranked_search(query, User.objects.filter(is_approved=True), limit=10)
+    return JsonResponse({'results': [_volunteer_to_json(user) for user in volunteers]})
+
+
+@anonymous_page_cache('administration')
 def administration_page_view(request):
     # 1. Руководитель отдела (только один, исключая супер-админа если вдруг)
     head_admin = User.objects.filter(role='head_admin', is_approved=True).exclude(is_superuser=True).first()
@@ -185,17 +208,14 @@ def signup_view(request):
             user.save()
 
             # --- УВЕДОМЛЕНИЕ ДЛЯ МОДЕРАТОРОВ ---
-            moderators = User.objects.filter(role__in=['moderator', 'worker', 'head_admin', 'president'])
-            superusers = User.objects.filter(is_superuser=True)
-            all_staff = moderators | superusers
-
-            for staff_member in all_staff.distinct():
-                Notification.objects.create(
-                    recipient=staff_member,
-                    message=f'Новый волонтер "{user.get_full_name()}" зарегистрировался.',
-                    # ИСПРАВЛЕНИЕ: Ссылка ведет на профиль для просмотра
-                    link=reverse('public_profile', kwargs={'pk': user.pk}) 
-                )
+            # Рассылка идет пачками и в фоне, чтобы регистрация не ждала всех модераторов
+            notify(
+                staff_recipients(),
+                f'Новый волонтер "{user.get_full_name()}" зарегистрировался.',
+                # ИСПРАВЛЕНИЕ: Ссылка ведет на профиль для просмотра
+                link=reverse('public_profile', kwargs={'pk': user.pk}),
+                background=True,
+            )
             messages.success(request, 'Ваш аккаунт создан и отправлен на модерацию!')
             return redirect('login')
     else:
@@ -212,6 +232,7 @@ def logout_view(request):
 # --- Профиль ---
 @login_required
 def my_profile_view(request):
+    prefetch_related_objects([request.user], 'school_leader_of')
     activity_periods = request.user.activity_periods.all()
     context = {
         'profile_user': request.user, 
@@ -245,7 +266,7 @@ def profile_edit_view(request):
 
 
 def public_profile_view(request, pk):
-    profile_user = get_object_or_404(User, pk=pk)
+    profile_user = get_object_or_404(User.objects.prefetch_related('school_leader_of'), pk=pk)
 
     if not profile_user.is_approved and not (request.user.is_authenticated and is_moderator_or_higher(request.user)):
         messages.error(request, "Этот профиль еще не прошел модерацию.")
@@ -290,12 +311,8 @@ def approve_user_view(request, pk):
         user_to_approve = get_object_or_404(User, pk=pk)
         user_to_approve.is_approved = True
         user_to_approve.save()
-        AuditLog.objects.create(actor=request.user, action=f"Одобрил пользователя: {user_to_approve.get_full_name()}", target_user=user_to_approve)
-        Notification.objects.create(
-            recipient=user_to_approve,
-            message="Поздравляем! Ваш профиль был одобрен.",
-            link=reverse('my_profile'),
-        )
+        audit.record(request.user, f"Одобрил пользователя: {user_to_approve.get_full_name()}", target=user_to_approve, code='user.approve', obj=user_to_approve)
+        notify(user_to_approve, "Поздравляем! Ваш профиль был одобрен.", link=reverse('my_profile'))
         messages.success(request, f'Профиль {user_to_approve.get_full_name()} одобрен.')
     return redirect('moderator_dashboard')
 
@@ -307,12 +324,10 @@ def reject_user_view(request, pk):
     user_to_reject = get_object_or_404(User, pk=pk)
     if request.method == 'POST':
         reason = request.POST.get('reason', 'Причина не указана.')
-        Notification.objects.create(
-            recipient=user_to_reject,
-            message=f'Ваша регистрация была отклонена. Причина: "{reason}"',
-        )
+        notify(user_to_reject, f'Ваша регистрация была отклонена. Причина: "{reason}"')
+        # Пишем до удаления, пока у объекта есть pk
+        audit.record(request.user, f"Отклонил (удалил) пользователя: {user_to_reject.get_full_name()}", code='user.reject', obj=user_to_reject, payload={'reason': reason})
         user_to_reject.delete()
-        AuditLog.objects.create(actor=request.user, action=f"Отклонил (удалил) пользователя: {user_to_reject.get_full_name()}", target_user=user_to_reject)
         messages.warning(
             request, f'Профиль {user_to_reject.get_full_name()} отклонен и удален.'
         )
@@ -347,7 +362,7 @@ def approve_user_view(request, pk):
         user_to_approve = get_object_or_404(User, pk=pk)
         user_to_approve.is_approved = True
         user_to_approve.save()
-        Notification.objects.create(recipient=user_to_approve, message="Поздравляем! Ваш профиль был одобрен.", link=reverse('my_profile'))
+        notify(user_to_approve, "Поздравляем! Ваш профиль был одобрен.", link=reverse('my_profile'))
         messages.success(request, f'Профиль {user_to_approve.get_full_name()} одобрен.')
     return redirect('moderator_dashboard')
 
@@ -378,7 +393,7 @@ def approve_changes_view(request, pk):
             user_to_update.pending_changes = None
             user_to_update.moderation_comment = ""
             user_to_update.save()
-            Notification.objects.create(recipient=user_to_update, message="Ваши изменения в профиле были одобрены модератором.", link=reverse('my_profile'))
+            notify(user_to_update, "Ваши изменения в профиле были одобрены модератором.", link=reverse('my_profile'))
             messages.success(request, f'Изменения для {user_to_update.get_full_name()} одобрены.')
     return redirect('pending_changes')
 
@@ -391,7 +406,7 @@ def reject_changes_view(request, pk):
         user_to_update.pending_changes = None
         user_to_update.moderation_comment = reason
         user_to_update.save()
-        Notification.objects.create(recipient=user_to_update, message=f'Ваши изменения отклонены. Причина: "{reason}"', link=reverse('my_profile'))
+        notify(user_to_update, f'Ваши изменения отклонены. Причина: "{reason}"', link=reverse('my_profile'))
         messages.warning(request, f'Изменения для {user_to_update.get_full_name()} были отклонены.')
     return redirect('pending_changes')
 
@@ -409,27 +424,30 @@ def user_management_view(request):
     if not is_admin_or_higher(request.user): return redirect('home')
     
     # Базовый список (исключая супер-админа)
-    users_list = User.objects.exclude(is_superuser=True).order_by('last_name')
+    users_list = User.objects.exclude(is_superuser=True)
     
     # --- ПОИСК ---
     search_query = request.GET.get('search', '')
     role_filter = request.GET.get('role_filter', '')
     
     if search_query:
-        users_list = users_list.filter(
-            Q(first_name__icontains=search_query) | 
-            Q(last_name__icontains=search_query) | 
-            Q(patronymic__icontains=search_query) |
-            Q(username__icontains=search_query)
-        )
+        users_list = filter_by_search(users_list, search_query, usernames=True)
     
     if role_filter:
         users_list = users_list.filter(role=role_filter)
     
+    # Курсорная пагинация по (last_name, id) вместо всей таблицы сразу
+    page = paginate_keyset(users_list, request.GET.get('cursor'), get_page_size(request))
+    if request.GET.get('format') == 'json':
+        return _keyset_json_response(request, page, _managed_user_to_json)
+
     role_choices = User.ROLE_CHOICES
     
     context = {
-        'users_list': users_list, 
+        'users_list': page,
+        'page': page,
+        'next_url': page_url(request, page.next_token),
+        'prev_url': page_url(request, page.prev_token),
         'role_choices': role_choices,
         'search_query': search_query,
         'role_filter': role_filter
@@ -467,18 +485,25 @@ def update_user_role_view(request, pk):
                      messages.error(request, "Назначать Руководителя отдела может только Супер-админ или текущий Руководитель.")
                      return redirect('user_management')
                 
-                # Снимаем старого руководителя (если есть)
-                old_head = User.objects.filter(role='head_admin').first()
-                if old_head:
-                    old_head.role = 'worker' # Становится работником
-                    old_head.save()
-                    log_action(request.user, f"Автоматически разжаловал {old_head.get_full_name()} до Работника (смена власти)", target=old_head)
-
-            user_to_update.role = new_role
-            user_to_update.save()
-            
-            role_name = dict(User.ROLE_CHOICES).get(new_role)
-            log_action(request.user, f"Изменил роль для {user_to_update.get_full_name()} на '{role_name}'", target=user_to_update)
+            # Смена ролей и записи о ней в журнале — одной транзакцией
+            with transaction.atomic():
+                if new_role == 'head_admin':
+                    # Снимаем старого руководителя (если есть)
+                    old_head = User.objects.filter(role='head_admin').first()
+                    if old_head:
+                        old_head.role = 'worker' # Становится работником
+                        old_head.save()
+                        log_action(request.user, f"Автоматически разжаловал {old_head.get_full_name()} до Работника (смена власти)", target=old_head, atomic=True, code='user.demote', obj=old_head)
+
+                old_role = user_to_update.role
+                user_to_update.role = new_role
+                user_to_update.save()
+                
+                role_name = dict(User.ROLE_CHOICES).get(new_role)
+                log_action(
+                    request.user, f"Изменил роль для {user_to_update.get_full_name()} на '{role_name}'", target=user_to_update,
+                    atomic=True, code='user.role', obj=user_to_update, payload={'role': new_role, 'previous': old_role},
+                )
             
             messages.success(request, f'Роль обновлена.')
     return redirect('user_management')
@@ -493,7 +518,7 @@ def toggle_active_volunteer_view(request, pk):
         user_to_update.is_active_volunteer_title = not user_to_update.is_active_volunteer_title
         user_to_update.save()
         action_text = "присвоил" if user_to_update.is_active_volunteer_title else "снял"
-        AuditLog.objects.create(actor=request.user, action=f"{action_text} статус 'Активный волонтер' для {user_to_update.get_full_name()}", target_user=user_to_update)
+        audit.record(request.user, f"{action_text} статус 'Активный волонтер' для {user_to_update.get_full_name()}", target=user_to_update, code='user.active_title', obj=user_to_update, payload={'granted': user_to_update.is_active_volunteer_title})
         if user_to_update.is_active_volunteer_title:
             messages.success(request, f'Волонтеру {user_to_update.get_full_name()} присвоено звание "Активный волонтер".')
         else:
@@ -513,8 +538,8 @@ def direction_create_view(request):
     if request.method == 'POST':
         name = request.POST.get('name')
         if name and not Direction.objects.filter(name=name).exists():
-            Direction.objects.create(name=name)
-            AuditLog.objects.create(actor=request.user, action=f"Создал направление: {name}")
+            direction = Direction.objects.create(name=name)
+            audit.record(request.user, f"Создал направление: {name}", code='direction.create', obj=direction)
             messages.success(request, f'Направление "{name}" создано.')
         else: messages.error(request, 'Направление с таким именем уже существует или имя не указано.')
     return redirect('direction_management')
@@ -524,8 +549,8 @@ def direction_delete_view(request, pk):
     if not is_admin_or_higher(request.user): return redirect('home')
     direction = get_object_or_404(Direction, pk=pk)
     if request.method == 'POST':
+        audit.record(request.user, f"Удалил направление: {direction.name}", code='direction.delete', obj=direction)
         direction.delete()
-        AuditLog.objects.create(actor=request.user, action=f"Удалил направление: {direction.name}")
         messages.warning(request, f'Направление "{direction.name}" удалено.')
     return redirect('direction_management')
 
@@ -546,7 +571,7 @@ def assign_direction_leader_view(request, pk):
             direction.leaders.remove(user_to_assign)
             # Если у него нет других направлений, можно понизить роль (опционально)
             # но пока оставим роль 'leader', вдруг он руководит школой
-            log_action(request.user, f"Снял {user_to_assign.get_full_name()} с руководства направлением '{direction.name}'", target=user_to_assign)
+            log_action(request.user, f"Снял {user_to_assign.get_full_name()} с руководства направлением '{direction.name}'", target=user_to_assign, code='direction.leader_remove', obj=direction)
             messages.info(request, f'{user_to_assign.get_full_name()} снят с направления "{direction.name}".')
             
         # Если он не лидер — назначаем
@@ -554,7 +579,7 @@ def assign_direction_leader_view(request, pk):
             direction.leaders.add(user_to_assign)
             user_to_assign.role = 'leader'
             user_to_assign.save()
-            log_action(request.user, f"Назначил {user_to_assign.get_full_name()} руководителем направления '{direction.name}'", target=user_to_assign)
+            log_action(request.user, f"Назначил {user_to_assign.get_full_name()} руководителем направления '{direction.name}'", target=user_to_assign, code='direction.leader_add', obj=direction)
             messages.success(request, f'{user_to_assign.get_full_name()} назначен руководителем направления "{direction.name}".')
             
     return redirect('direction_management')
@@ -576,8 +601,8 @@ def school_create_view(request):
     if request.method == 'POST':
         name = request.POST.get('name')
         if name and not School.objects.filter(name=name).exists():
-            School.objects.create(name=name)
-            AuditLog.objects.create(actor=request.user, action=f"Создал школу: {name}")
+            school = School.objects.create(name=name)
+            audit.record(request.user, f"Создал школу: {name}", code='school.create', obj=school)
             messages.success(request, f'Школа "{name}" создана.')
         else: messages.error(request, 'Школа с таким именем уже существует или имя не указано.')
     return redirect('school_management')
@@ -587,8 +612,8 @@ def school_delete_view(request, pk):
     if not is_admin_or_higher(request.user): return redirect('home')
     school = get_object_or_404(School, pk=pk)
     if request.method == 'POST':
+        audit.record(request.user, f"Удалил школу: {school.name}", code='school.delete', obj=school)
         school.delete()
-        AuditLog.objects.create(actor=request.user, action=f"Удалил школу: {school.name}")
         messages.warning(request, f'Школа "{school.name}" удалена.')
     return redirect('school_management')
 
@@ -601,11 +626,11 @@ def assign_school_leader_view(request, pk):
         leader_to_assign = get_object_or_404(User, pk=leader_id)
         if leader_to_assign in school.leaders.all():
             leader_to_assign.school_leader_of.remove(school)
-            AuditLog.objects.create(actor=request.user, action=f"Снял {leader_to_assign.get_full_name()} с руководства школой '{school.name}'", target_user=leader_to_assign)
+            audit.record(request.user, f"Снял {leader_to_assign.get_full_name()} с руководства школой '{school.name}'", target=leader_to_assign, code='school.leader_remove', obj=school)
             messages.info(request, f'{leader_to_assign.get_full_name()} больше не руководит школой "{school.name}".')
         else:
             leader_to_assign.school_leader_of.add(school)
-            AuditLog.objects.create(actor=request.user, action=f"Назначил {leader_to_assign.get_full_name()} руководителем школы '{school.name}'", target_user=leader_to_assign)
+            audit.record(request.user, f"Назначил {leader_to_assign.get_full_name()} руководителем школы '{school.name}'", target=leader_to_assign, code='school.leader_add', obj=school)
             messages.success(request, f'{leader_to_assign.get_full_name()} назначен руководителем школы "{school.name}".')
     return redirect('school_management')
 
@@ -619,7 +644,7 @@ def about_page_edit_view(request):
         form = AboutPageForm(request.POST, instance=about_page)
         if form.is_valid():
             form.save()
-            log_action(request.user, "Отредактировал страницу 'О нас'")
+            log_action(request.user, "Отредактировал страницу 'О нас'", code='about.edit', obj=about_page)
             messages.success(request, 'Страница обновлена полностью.')
             return redirect('about_page_edit')
     else:
@@ -636,9 +661,7 @@ def notification_list_view(request):
 @login_required
 def mark_notification_as_read_view(request, pk):
     notification = get_object_or_404(Notification, pk=pk, recipient=request.user)
-    if not notification.is_read:
-        notification.is_read = True
-        notification.save()
+    notification.mark_as_read()
     if notification.link: return redirect(notification.link)
     else: return redirect('notification_list')
 
@@ -666,14 +689,14 @@ def admin_edit_user_view(request, pk):
         form = AdminUpdateForm(request.POST, request.FILES, instance=user_to_edit)
         if form.is_valid():
             form.save() # Мгновенное сохранение
-            AuditLog.objects.create(actor=request.user, action=f"Отредактировал профиль: {user_to_edit.get_full_name()}", target_user=user_to_edit)
+            audit.record(request.user, f"Отредактировал профиль: {user_to_edit.get_full_name()}", target=user_to_edit, code='user.edit', obj=user_to_edit)
 
             # Отправляем уведомление волонтеру, если его редактирует кто-то другой
             if request.user != user_to_edit:
-                Notification.objects.create(
-                    recipient=user_to_edit,
-                    message=f'Модератор {request.user.get_full_name()} внес изменения в ваш профиль.',
-                    link=reverse('my_profile')
+                notify(
+                    user_to_edit,
+                    f'Модератор {request.user.get_full_name()} внес изменения в ваш профиль.',
+                    link=reverse('my_profile'),
                 )
 
             messages.success(request, f'Профиль {user_to_edit.get_full_name()} был успешно обновлен.')
@@ -695,14 +718,46 @@ def audit_log_view(request):
         messages.error(request, "У вас нет доступа к этой странице.")
         return redirect('home')
 
-    # Получаем все логи
-    audit_logs = AuditLog.objects.all()
+    # Фильтры + курсорная пагинация, а не весь журнал разом.
+    # Старые записи лежат в архиве — листаются тем же курсором после таблицы.
+    audit_logs = audit.filter_logs(AuditLog.objects.select_related('actor', 'target_user'), request.GET)
+    criteria = audit.parse_filters(request.GET)
+    page = paginate_keyset(
+        audit_logs, request.GET.get('cursor'), get_page_size(request), keys=('-created_at', '-id'),
+        extra=lambda values, forward, limit: audit_archive.archived_rows(criteria, values, forward, limit),
+    )
 
     context = {
-        'audit_logs': audit_logs
+        'audit_logs': page,
+        'page': page,
+        'next_url': page_url(request, page.next_token),
+        'prev_url': page_url(request, page.prev_token),
+        'actors': User.objects.filter(role__in=['moderator', 'president', 'worker', 'head_admin', 'leader']).order_by('last_name', 'id'),
+        'actions': audit.ACTIONS,
+        'object_types': audit.OBJECT_TYPES,
     }
     return render(request, 'users/audit_log.html', context)
 
+
+@login_required
+def slow_query_log_view(request):
+    if not is_admin_or_higher(request.user):
+        messages.error(request, "У вас нет доступа к этой странице.")
+        return redirect('home')
+
+    if request.method == 'POST':
+        slow_queries.clear()
+        messages.success(request, "Журнал медленных запросов очищен.")
+        return redirect('slow_query_log')
+
+    log = slow_queries.entries()
+    return render(request, 'users/slow_query_log.html', {
+        'offenders': slow_queries.top_offenders(log),
+        'entries_count': len(log),
+        'threshold_ms': settings.SLOW_QUERY_THRESHOLD_MS,
+        'log_size': settings.SLOW_QUERY_LOG_SIZE,
+    })
+
 # users/forms.py (Добавьте это в конец)
 
 from .models import AboutPage # Убедитесь, что AboutPage импортирован